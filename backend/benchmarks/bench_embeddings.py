@@ -0,0 +1,70 @@
+"""
+Compare embedding backends on ingest throughput and query latency.
+
+    python -m benchmarks.bench_embeddings --backends hashing openai --chunks 500
+
+Chunks are cut from --source (a local text file) or generated when none is given.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from services.embeddings import EMBEDDING_BACKENDS, create_embeddings
+
+
+def make_chunks(source, count, chunk_size=1000):
+    if source:
+        with open(source, encoding="utf-8") as f:
+            text = f.read()
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        return (chunks * (count // max(len(chunks), 1) + 1))[:count]
+
+    words = ["python", "loop", "variable", "function", "class", "list", "dict", "error",
+             "module", "string", "integer", "return", "import", "while", "for", "if"]
+    rng = random.Random(0)
+    return [" ".join(rng.choice(words) for _ in range(chunk_size // 6)) for _ in range(count)]
+
+
+def bench_backend(backend, chunks, queries):
+    embeddings = create_embeddings(backend)
+
+    start = time.perf_counter()
+    embeddings.embed_documents(chunks)
+    ingest_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    return {
+        "backend": backend,
+        "chunks_per_second": len(chunks) / ingest_seconds if ingest_seconds else float("inf"),
+        "query_p50_ms": statistics.median(latencies),
+        "query_p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["hashing"], choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--source", default=None)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.source, args.chunks)
+    queries = [chunk[:80] for chunk in chunks[:args.queries]]
+
+    print(f"{'backend':<24}{'chunks/s':>12}{'query p50 ms':>16}{'query p95 ms':>16}")
+    for backend in args.backends:
+        result = bench_backend(backend, chunks, queries)
+        print(f"{result['backend']:<24}{result['chunks_per_second']:>12.1f}"
+              f"{result['query_p50_ms']:>16.2f}{result['query_p95_ms']:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
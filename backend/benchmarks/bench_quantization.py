@@ -0,0 +1,68 @@
+"""
+Recall and memory of quantized vector storage against exact float32 search.
+
+    python -m benchmarks.bench_quantization --backend hashing --chunks 5000 --k 10
+
+Recall@k is the share of the exact float32 top-k that each storage mode also
+returns. Chunks are cut from --source or generated, as in bench_embeddings.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_embeddings import make_chunks
+from services.embeddings import EMBEDDING_BACKENDS, create_embeddings
+from services.vectorstore import RESCORE_OVERSAMPLE, approximate_scores, quantize, top_k
+
+
+def bench_mode(dtype, rescore, vectors, queries, exact_top, k):
+    codes, scales = quantize(vectors, dtype)
+    hits, latencies = 0, []
+    for query, expected in zip(queries, exact_top):
+        start = time.perf_counter()
+        scores = approximate_scores(codes, scales, query)
+        found = top_k(scores, k * RESCORE_OVERSAMPLE if rescore else k)
+        if rescore:
+            found = found[np.argsort(-(vectors[found] @ query))[:k]]
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(found.tolist()) & set(expected.tolist()))
+
+    return {
+        "mode": f"{dtype}{' + rescore' if rescore else ''}",
+        "bytes_per_vector": (codes.nbytes + scales.nbytes) / len(vectors),
+        "recall": hits / (len(queries) * k),
+        "query_p50_ms": float(np.median(latencies)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", default="hashing", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--source", default=None)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    embeddings = create_embeddings(args.backend)
+    chunks = make_chunks(args.source, args.chunks)
+    vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    queries = np.asarray(
+        [embeddings.embed_query(chunk[:80]) for chunk in chunks[::max(len(chunks) // args.queries, 1)][:args.queries]],
+        dtype=np.float32,
+    )
+    exact_top = [top_k(vectors @ query, args.k) for query in queries]
+
+    float32_bytes = vectors.nbytes / len(vectors)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, float32 = {float32_bytes:.0f} bytes/vector")
+    print(f"{'mode':<20}{'bytes/vector':>14}{'saving':>10}{'recall@' + str(args.k):>12}{'query p50 ms':>16}")
+    for dtype, rescore in (("float16", False), ("int8", False), ("int8", True)):
+        result = bench_mode(dtype, rescore, vectors, queries, exact_top, args.k)
+        print(f"{result['mode']:<20}{result['bytes_per_vector']:>14.0f}"
+              f"{float32_bytes / result['bytes_per_vector']:>9.1f}x"
+              f"{result['recall']:>12.3f}{result['query_p50_ms']:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
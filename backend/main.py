@@ -8,6 +8,7 @@ from routers.quiz import router as quiz_router
 from routers.contentai import router as newcontent_router 
 from routers.practiceai import router as practiceai_router 
 from routers.exams import router as exams_router
+from routers.jobs import router as jobs_router
 
 app = FastAPI(
     title="DevGenius API",
@@ -33,6 +34,7 @@ app.include_router(quiz_router)
 app.include_router(newcontent_router)
 app.include_router(practiceai_router)
 app.include_router(exams_router)
+app.include_router(jobs_router)
 
 
 if __name__ == "__main__":
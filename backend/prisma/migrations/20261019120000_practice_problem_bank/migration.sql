@@ -0,0 +1,33 @@
+-- CreateTable
+CREATE TABLE "PracticeProblem" (
+    "id" TEXT NOT NULL,
+    "topic" TEXT NOT NULL,
+    "language" TEXT NOT NULL,
+    "difficulty" TEXT NOT NULL,
+    "problem" TEXT NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "PracticeProblem_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "PracticeProblemServe" (
+    "id" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "problemId" TEXT NOT NULL,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "PracticeProblemServe_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "PracticeProblem_topic_language_difficulty_idx" ON "PracticeProblem"("topic", "language", "difficulty");
+
+-- CreateIndex
+CREATE INDEX "PracticeProblemServe_userId_idx" ON "PracticeProblemServe"("userId");
+
+-- CreateIndex
+CREATE UNIQUE INDEX "PracticeProblemServe_userId_problemId_key" ON "PracticeProblemServe"("userId", "problemId");
+
+-- AddForeignKey
+ALTER TABLE "PracticeProblemServe" ADD CONSTRAINT "PracticeProblemServe_problemId_fkey" FOREIGN KEY ("problemId") REFERENCES "PracticeProblem"("id") ON DELETE CASCADE ON UPDATE CASCADE;
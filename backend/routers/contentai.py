@@ -10,19 +10,29 @@ from langchain.chains import create_history_aware_retriever, create_retrieval_ch
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.messages import AIMessage, HumanMessage
 import os
+import json
+from typing import Literal
 
 from fastapi import APIRouter, HTTPException
 
+from services.chains import drop_chains, get_llm, get_rag_chain
+from services.chunking import CodeAwareTextSplitter
+from services.generation import map_reduce_generate, use_map_reduce
+from services.jobs import raise_for_job, start_ingestion_job, start_refresh_job, wait_for_job
+
 # Initialize variables
 global retriever
 retriever = None
+vectorstore = None
+loaded_sources = []
+current_job_id = None
 
 router = APIRouter(prefix="/newcontent", tags=["newcontent"])
 
 
 
-llm = ChatOpenAI(model="gpt-4o")
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+llm = get_llm("gpt-4o")
+text_splitter = CodeAwareTextSplitter(chunk_size=400, chunk_overlap=60)
 
 # Request Models
 class SourceInput(BaseModel):
@@ -51,10 +61,14 @@ class RetakeBody(BaseModel):
 class ContentQuizInput(BaseModel):
     content: str
     topic: str
+    count: int = 15
+    generation_mode: Literal["single", "map_reduce", "auto"] = "auto"
 
 class ShortAnswerQuestionsInput(BaseModel):
     content: str
     topic: str
+    count: int = 10
+    generation_mode: Literal["single", "map_reduce", "auto"] = "auto"
     
 class ShortAnswerEvaluationInput(BaseModel):
     questions: list[dict]
@@ -62,51 +76,135 @@ class ShortAnswerEvaluationInput(BaseModel):
     topic: str
 
 # Helper Functions
-def process_documents(sources):
-    documents = []
-    for source in sources:
-        if source.endswith(".pdf"):
-            loader = PyPDFLoader(source)
+def quiz_prompt(topic, content, count):
+    return f"""
+            Based on the following content about {topic}, create {count} multiple-choice questions with 4 options each.
+            
+            CONTENT:
+            {content}
+            
+            Return the result in the following JSON format:
+            {{
+                "quiz": [
+                    {{
+                        "question": "Question text here",
+                        "options": [
+                            {{
+                                "id": "A",
+                                "text": "Option A text"
+                            }},
+                            {{
+                                "id": "B", 
+                                "text": "Option B text"
+                            }},
+                            {{
+                                "id": "C",
+                                "text": "Option C text"
+                            }},
+                            {{
+                                "id": "D",
+                                "text": "Option D text"
+                            }}
+                        ],
+                        "correctAnswer": "A",
+                        "explanation": "Explanation of why A is correct"
+                    }},
+                    // ... more questions
+                ]
+            }}
+            
+            Make sure the response is valid JSON. Include a variety of difficulty levels. Make sure the answer options are plausible and challenging.
+            """
+
+
+def short_answer_prompt(topic, content, count):
+    return f"""
+            Based on the following content about {topic}, create {count} thoughtful short answer questions that test deep understanding.
+            
+            CONTENT:
+            {content}
+            
+            Return the result in the following JSON format:
+            {{
+                "questions": [
+                    {{
+                        "id": 1,
+                        "question": "Question text here",
+                        "expectedAnswer": "A detailed expected answer that will be used for evaluation",
+                        "difficulty": "easy|medium|hard",
+                        "points": 10
+                    }},
+                    // ... more questions ({count} total)
+                ]
+            }}
+            
+            Make sure the response is valid JSON. Include a variety of difficulty levels (easy, medium, hard).
+            The expectedAnswer should be comprehensive but concise, around 2-3 sentences.
+            Total points should add up to 100, with harder questions worth more points.
+            """
+
+
+def renumber_short_answers(questions):
+    """
+    Sequential ids and points rescaled to add up to 100 after a map-reduce merge
+    """
+    total = sum(question.get("points", 10) for question in questions) or 1
+    remaining = 100
+    for index, question in enumerate(questions):
+        question["id"] = index + 1
+        if index == len(questions) - 1:
+            question["points"] = remaining
         else:
-            loader = WebBaseLoader(source)
-        documents.extend(loader.load())
-
-    document_chunks = text_splitter.split_documents(documents)
-    vectorstore = Chroma.from_documents(document_chunks, OpenAIEmbeddings())
-    return vectorstore.as_retriever()
-
-def get_conversational_rag_chain(retriever):
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "Teach the user on the certain topic based on the context. Also give him a question after each response. If the user is correct move ahead.:\n\n{context}"),
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-    ])
-    stuff_documents_chain = create_stuff_documents_chain(llm, prompt)
-    return create_retrieval_chain(retriever, stuff_documents_chain)
-
-def get_context_retriever_chain(retriever):
-    prompt = ChatPromptTemplate.from_messages([
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-        ("user", "Based on the conversation, generate a search query to get relevant information."),
-    ])
-    return create_history_aware_retriever(llm, retriever, prompt)
+            question["points"] = round(100 * question.get("points", 10) / total)
+            remaining -= question["points"]
+    return questions
+
+def process_documents(sources):
+    """
+    Start a background ingestion job; the retriever is swapped in when it finishes
+    """
+    global current_job_id
+
+    def on_complete(new_vectorstore):
+        global retriever, vectorstore, loaded_sources
+        if vectorstore is not None and vectorstore is not new_vectorstore:
+            drop_chains(vectorstore)
+        vectorstore = new_vectorstore
+        loaded_sources = list(sources)
+        retriever = vectorstore.as_retriever()
+
+    job = start_ingestion_job(sources, text_splitter, on_complete=on_complete)
+    current_job_id = job["id"]
+    return job
+
+async def require_retriever():
+    # Wait briefly for a running ingestion job, then fail fast with its state
+    if current_job_id is not None:
+        job = await wait_for_job(current_job_id)
+        if job is not None and job["status"] != "done":
+            raise_for_job(job)
+    if retriever is None:
+        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
 
 # API Endpoints
 @router.post("/load_sources")
 async def load_sources(input: SourceInput):
-    global retriever
     try:
-        retriever = process_documents(input.sources)
-        return {"message": "Sources processed and retriever initialized successfully."}
+        job = process_documents(input.sources)
+        return {"message": "Sources are being processed in the background.", "job_id": job["id"], "status": job["status"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing sources: {str(e)}")
 
+@router.post("/refresh_sources")
+async def refresh_sources():
+    if vectorstore is None:
+        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    job = start_refresh_job([(source, vectorstore) for source in loaded_sources], text_splitter)
+    return {"message": "Sources are being refreshed in the background.", "job_id": job["id"], "status": job["status"]}
+
 @router.post("/chat")
 async def chat(input: ChatInput):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    await require_retriever()
 
     try:
         # Reconstruct chat history
@@ -116,8 +214,7 @@ async def chat(input: ChatInput):
         ]
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
+        conversation_rag_chain = get_rag_chain(vectorstore, "tutor", "auto", chat_history, profile="tutor")
         response = conversation_rag_chain.invoke({
             "chat_history": chat_history,
             "input": f"Your task is to teach the user the topic {input.topic}. This is the {chat_history}. If the chat history covers concept, programming and example, then the user learnt everything for now. Tell that he learnt the topic. If not.   Teach him slowly. Also after explaining something, ask him 2 or 3 question with multiple choice. Each question will be formatted by ((question?*a) *b) *c) *d))). Analysis the chat history provided to check if the user is answering correct or not. If he answers correct, explain further on the topic. After explaining the concept, move on to code part. and show some example codes. Then ask for output of the code. Later at the end of your chat stream, tell the user to point out error in a code in MCQ. Finally when y think the user has learnt it everything, show a ending message.",
@@ -143,9 +240,7 @@ async def chat(input: ChatInput):
 
 @router.post("/topic_list")
 async def topic(input: TopicInput):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    await require_retriever()
 
     try:
         # Reconstruct chat history
@@ -155,8 +250,7 @@ async def topic(input: TopicInput):
         ]
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
+        conversation_rag_chain = get_rag_chain(vectorstore, "tutor", "auto", chat_history, profile="tutor")
         response = conversation_rag_chain.invoke({
             "chat_history": chat_history,
             "input":f"Generate a topic list on the specific part specified or whole section. Use only bulletin points of number. Dont generate other things. Specified Section: {input.specific_section}",
@@ -180,9 +274,7 @@ async def topic(input: TopicInput):
 
 @router.post("/take_quiz")
 async def quiz(input: QuizBody):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    await require_retriever()
 
     try:
         # Reconstruct chat history
@@ -192,8 +284,7 @@ async def quiz(input: QuizBody):
         ]
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
+        conversation_rag_chain = get_rag_chain(vectorstore, "tutor", "auto", chat_history, profile="tutor")
         response = conversation_rag_chain.invoke({
             "chat_history": chat_history,
             "input":f"Generate 15 Multiple Choice Questions based on the chat history and also the context. Moreover, after each question say the answer too. put the answer in /box() with the number inside. so if question 1's answer is A. then /box(1A)",
@@ -218,46 +309,19 @@ async def quiz(input: QuizBody):
 @router.post("/generate_json_quiz")
 async def generate_json_quiz(input: ContentQuizInput):
     try:
+        if use_map_reduce(input.content, input.generation_mode):
+            quiz = await map_reduce_generate(
+                llm,
+                input.content,
+                input.count,
+                lambda section, count: quiz_prompt(input.topic, section, count),
+                "quiz",
+            )
+            return json.dumps({"quiz": quiz})
+
         # Generate MCQs directly from content without retriever
         response = llm.invoke(
-            f"""
-            Based on the following content about {input.topic}, create 15 multiple-choice questions with 4 options each.
-            
-            CONTENT:
-            {input.content}
-            
-            Return the result in the following JSON format:
-            {{
-                "quiz": [
-                    {{
-                        "question": "Question text here",
-                        "options": [
-                            {{
-                                "id": "A",
-                                "text": "Option A text"
-                            }},
-                            {{
-                                "id": "B", 
-                                "text": "Option B text"
-                            }},
-                            {{
-                                "id": "C",
-                                "text": "Option C text"
-                            }},
-                            {{
-                                "id": "D",
-                                "text": "Option D text"
-                            }}
-                        ],
-                        "correctAnswer": "A",
-                        "explanation": "Explanation of why A is correct"
-                    }},
-                    // ... more questions
-                ]
-            }}
-            
-            Make sure the response is valid JSON. Include a variety of difficulty levels. Make sure the answer options are plausible and challenging.
-            """,
+            quiz_prompt(input.topic, input.content, input.count),
             response_format={ "type": "json_object" }
         )
 
@@ -270,32 +334,19 @@ async def generate_json_quiz(input: ContentQuizInput):
 @router.post("/generate_short_answer_questions")
 async def generate_short_answer_questions(input: ShortAnswerQuestionsInput):
     try:
+        if use_map_reduce(input.content, input.generation_mode):
+            questions = await map_reduce_generate(
+                llm,
+                input.content,
+                input.count,
+                lambda section, count: short_answer_prompt(input.topic, section, count),
+                "questions",
+            )
+            return json.dumps({"questions": renumber_short_answers(questions)})
+
         # Generate short answer questions from content without retriever
         response = llm.invoke(
-            f"""
-            Based on the following content about {input.topic}, create 10 thoughtful short answer questions that test deep understanding.
-            
-            CONTENT:
-            {input.content}
-            
-            Return the result in the following JSON format:
-            {{
-                "questions": [
-                    {{
-                        "id": 1,
-                        "question": "Question text here",
-                        "expectedAnswer": "A detailed expected answer that will be used for evaluation",
-                        "difficulty": "easy|medium|hard",
-                        "points": 10
-                    }},
-                    // ... more questions (10 total)
-                ]
-            }}
-            
-            Make sure the response is valid JSON. Include a variety of difficulty levels (easy, medium, hard).
-            The expectedAnswer should be comprehensive but concise, around 2-3 sentences.
-            Total points should add up to 100, with harder questions worth more points.
-            """,
+            short_answer_prompt(input.topic, input.content, input.count),
             response_format={ "type": "json_object" }
         )
 
@@ -356,9 +407,7 @@ async def evaluate_short_answers(input: ShortAnswerEvaluationInput):
 
 @router.post("/evaluate_quiz")
 async def evaluate(input: QuizResult):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    await require_retriever()
 
     try:
         # Reconstruct chat history
@@ -368,8 +417,7 @@ async def evaluate(input: QuizResult):
         ]
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
+        conversation_rag_chain = get_rag_chain(vectorstore, "tutor", "auto", chat_history, profile="tutor")
         response = conversation_rag_chain.invoke({
             "chat_history": chat_history,
             "input":f"These are the questions i got wrong in the quiz. {input.wrong_text}. Now teach me those questions.",
@@ -395,9 +443,7 @@ async def evaluate(input: QuizResult):
 
 @router.post("/retake_quiz")
 async def retake(input: RetakeBody):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    await require_retriever()
 
     try:
         # Reconstruct chat history
@@ -407,8 +453,7 @@ async def retake(input: RetakeBody):
         ]
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
+        conversation_rag_chain = get_rag_chain(vectorstore, "tutor", "auto", chat_history, profile="tutor")
         response = conversation_rag_chain.invoke({
             "chat_history": chat_history,
             "input":f"Generate me a quiz again on 15 questions but these time generate 70% questions on the topic i got wrong. Moreover, after each question say the answer too. put the answer in /box() with the number inside. so if question 1's answer is A. then /box(1A)",
@@ -17,6 +17,9 @@ from langchain.chains import create_history_aware_retriever, create_retrieval_ch
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.vectorstores import Chroma
 
+from services.chains import get_rag_chain
+from services.chunking import CodeAwareTextSplitter
+from services.jobs import ensure_vectorstore, refresh_cached_vectorstores
 
 ################################ FROM WEB ##########################################################################
 
@@ -32,48 +35,12 @@ class QueryResponse(BaseModel):
     response: str
 
 
-def get_vectorstore_from_url(url):
+text_splitter = CodeAwareTextSplitter(chunk_size=800, chunk_overlap=80)
 
-    loader = WebBaseLoader(url)
-    document = loader.load()
-    text_spliter = RecursiveCharacterTextSplitter()
-    document_chunks = text_spliter.split_documents(document)
-    vectorstore = Chroma.from_documents(document_chunks, OpenAIEmbeddings())
 
-    return vectorstore
+def get_response(user_query, vector_store, retrieval_mode="auto"):
 
-
-def get_context_retriever_chain(vectorstore):
-
-    llm = ChatOpenAI()
-    retriever = vectorstore.as_retriever()
-    prompt = ChatPromptTemplate.from_messages([
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-        ("user", "Given the above conversation, generate a search query to look up in order to get information relevant to the conversation")
-    ])
-    retriever_chain = create_history_aware_retriever(llm, retriever, prompt)
-
-    return retriever_chain
-
-
-def get_conversational_rag_chain(retriever_chain):   
-
-    llm = ChatOpenAI()  
-    prompt = ChatPromptTemplate.from_messages([
-      ("system", "Answer the user's questions based on the below context:\n\n{context}"),
-      MessagesPlaceholder(variable_name="chat_history"),
-      ("user", "{input}"),
-    ])  
-    stuff_documents_chain = create_stuff_documents_chain(llm, prompt)
-    
-    return create_retrieval_chain(retriever_chain, stuff_documents_chain)
-
-
-def get_response(user_query, vector_store):
-
-    retriever_chain = get_context_retriever_chain(vector_store)
-    conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
+    conversation_rag_chain = get_rag_chain(vector_store, "web", retrieval_mode, chat_history, profile="mentor")
     response = conversation_rag_chain.invoke({
             "chat_history": chat_history,
             "input": user_query
@@ -122,14 +89,8 @@ async def chat_with_website(query: QueryRequest):
     if not website_url or not question:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'question' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Load or retrieve vector store (ingested by a background job on first use)
+    vector_store = await ensure_vectorstore(vector_store_cache, website_url, text_splitter)
 
     # Get response from the vector store and model
     try:
@@ -140,6 +101,15 @@ async def chat_with_website(query: QueryRequest):
     return QueryResponse(response=response)
 
 
+@router.post("/refresh_sources")
+async def refresh_sources():
+    """
+    Re-check every cached website with conditional fetches and re-embed only changed chunks
+    """
+    job = refresh_cached_vectorstores(vector_store_cache, text_splitter)
+    return {"message": "Sources are being refreshed in the background.", "job_id": job["id"], "status": job["status"]}
+
+
 @router.post("/create")
 async def create_content(content: CreateContentDto):
     db = Prisma()
@@ -5,6 +5,8 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 import json
 
+from services.grading import grade_exams, total_score
+
 # Models for the exam record
 class MCQOption(BaseModel):
     id: str
@@ -30,6 +32,8 @@ class CodingProblem(BaseModel):
     description: str
     userSolution: str
     codeOutput: Optional[str] = None
+    testResults: Optional[Dict[str, Any]] = None  # summary from /practice/run_tests
+    complexity: Optional[Dict[str, Any]] = None  # estimate from /practice/estimate_complexity
 
 class ScoreSection(BaseModel):
     earned: float
@@ -53,8 +57,9 @@ class ExamRecord(BaseModel):
     mcqQuestions: List[MCQQuestion]
     shortAnswerQuestions: List[ShortAnswerQuestion]
     codingProblems: List[CodingProblem]
-    scores: ScoreRecord
+    scores: Optional[ScoreRecord] = None  # ignored: recomputed from the submitted questions
     feedback: str
+    weights: Optional[Dict[str, float]] = None  # per-section weights, see services/grading.py
 
 class WrongAnswer(BaseModel):
     questionType: str  # "MCQ" or "ShortAnswer"
@@ -71,8 +76,139 @@ class WrongAnswersRequest(BaseModel):
     courseId: Optional[str] = None
     courseName: Optional[str] = None
 
+class ExamSubmission(BaseModel):
+    mcqQuestions: List[MCQQuestion]
+    shortAnswerQuestions: List[ShortAnswerQuestion]
+    codingProblems: List[CodingProblem]
+
+class GradeRequest(BaseModel):
+    exams: List[ExamSubmission]
+    weights: Optional[Dict[str, float]] = None
+
+class AnswerKeyCorrection(BaseModel):
+    question: str  # MCQ question text, as stored with the exam
+    correctAnswer: str
+
+class RegradeRequest(BaseModel):
+    courseId: str
+    corrections: List[AnswerKeyCorrection] = []
+    weights: Optional[Dict[str, float]] = None
+
 router = APIRouter(prefix="/exams", tags=["exams"])
 
+def score_fields(scores):
+    """
+    ExamResult columns for a ScoreRecord dict
+    """
+    return {
+        "mcqScore": scores["mcq"]["earned"],
+        "mcqTotal": scores["mcq"]["total"],
+        "mcqPercentage": scores["mcq"]["percentage"],
+        "shortAnswerScore": scores["shortAnswer"]["earned"],
+        "shortAnswerTotal": scores["shortAnswer"]["total"],
+        "shortAnswerPercentage": scores["shortAnswer"]["percentage"],
+        "codingScore": scores["coding"]["earned"],
+        "codingTotal": scores["coding"]["total"],
+        "codingPercentage": scores["coding"]["percentage"],
+        "totalScore": scores["total"]["earned"],
+        "totalPossible": scores["total"]["total"],
+        "percentage": scores["total"]["percentage"],
+    }
+
+@router.post("/grade")
+async def grade_exam_submissions(request: GradeRequest):
+    """
+    Grade many submissions at once and return a ScoreRecord for each
+    """
+    try:
+        return grade_exams([exam.dict() for exam in request.exams], request.weights)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error grading exams: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to grade exams: {str(e)}")
+
+@router.post("/regrade")
+async def regrade_course_exams(request: RegradeRequest):
+    """
+    Apply MCQ answer key corrections to every stored exam of a course and regrade
+    them all. Stored short answer and coding scores are kept as they are.
+    """
+    try:
+        corrections = {correction.question.strip(): correction.correctAnswer for correction in request.corrections}
+        db = Prisma()
+        await db.connect()
+
+        records = await db.examresult.find_many(where={"courseId": request.courseId})
+        exams = []
+        corrected = []
+        for record in records:
+            mcq_questions = json.loads(record.mcqQuestions)
+            key = [question["correctAnswer"] for question in mcq_questions]
+            for question in mcq_questions:
+                question["correctAnswer"] = corrections.get(question["question"].strip(), question["correctAnswer"])
+            corrected.append(key != [question["correctAnswer"] for question in mcq_questions])
+            exams.append({
+                "mcqQuestions": mcq_questions,
+                "shortAnswerQuestions": json.loads(record.shortAnswerQuestions),
+                "codingProblems": json.loads(record.codingProblems),
+            })
+
+        try:
+            graded = grade_exams(exams, request.weights)
+        except ValueError as e:
+            await db.disconnect()
+            raise HTTPException(status_code=400, detail=str(e))
+
+        changes = []
+        # One transaction for the whole cohort
+        async with db.batch_() as batcher:
+            for record, exam, result, key_changed in zip(records, exams, graded, corrected):
+                for question, correct in zip(exam["mcqQuestions"], result["mcqCorrect"]):
+                    question["isCorrect"] = correct
+                scores = {
+                    "mcq": result["scores"]["mcq"],
+                    "shortAnswer": {
+                        "earned": record.shortAnswerScore,
+                        "total": record.shortAnswerTotal,
+                        "percentage": record.shortAnswerPercentage,
+                    },
+                    "coding": {
+                        "earned": record.codingScore,
+                        "total": record.codingTotal,
+                        "percentage": record.codingPercentage,
+                    },
+                }
+                scores["total"] = total_score(scores, request.weights)
+                fields = score_fields(scores)
+                if not key_changed and all(getattr(record, name) == value for name, value in fields.items()):
+                    continue
+                batcher.examresult.update(
+                    where={"id": record.id},
+                    data={**fields, "mcqQuestions": json.dumps(exam["mcqQuestions"])},
+                )
+                changes.append({
+                    "examId": record.id,
+                    "userId": record.userId,
+                    "previousPercentage": record.percentage,
+                    "percentage": fields["percentage"],
+                })
+
+        await db.disconnect()
+
+        return {
+            "message": f"Regraded {len(records)} exams",
+            "regraded": len(records),
+            "updated": len(changes),
+            "changes": changes,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error regrading exams: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to regrade exams: {str(e)}")
+
 @router.post("/save_result")
 async def save_exam_result(exam_record: ExamRecord):
     """
@@ -83,6 +219,20 @@ async def save_exam_result(exam_record: ExamRecord):
         db = Prisma()
         await db.connect()
         
+        # Recompute the scores from the submitted questions so the sections and total agree
+        exam = {
+            "mcqQuestions": [question.dict() for question in exam_record.mcqQuestions],
+            "shortAnswerQuestions": [question.dict() for question in exam_record.shortAnswerQuestions],
+            "codingProblems": [problem.dict() for problem in exam_record.codingProblems],
+        }
+        try:
+            result = grade_exams([exam], exam_record.weights)[0]
+        except ValueError as e:
+            await db.disconnect()
+            raise HTTPException(status_code=400, detail=str(e))
+        for question, correct in zip(exam["mcqQuestions"], result["mcqCorrect"]):
+            question["isCorrect"] = correct
+
         # Create a new exam record in the database
         # First, prepare the data for storage
         # We need to convert some complex objects to JSON strings
@@ -94,21 +244,10 @@ async def save_exam_result(exam_record: ExamRecord):
             "difficulty": exam_record.difficulty,
             "timeLimit": exam_record.timeLimit,
             "timeSpent": exam_record.timeSpent,
-            "mcqQuestions": json.dumps([question.dict() for question in exam_record.mcqQuestions]),
-            "shortAnswerQuestions": json.dumps([question.dict() for question in exam_record.shortAnswerQuestions]),
-            "codingProblems": json.dumps([problem.dict() for problem in exam_record.codingProblems]),
-            "mcqScore": exam_record.scores.mcq.earned,
-            "mcqTotal": exam_record.scores.mcq.total,
-            "mcqPercentage": exam_record.scores.mcq.percentage,
-            "shortAnswerScore": exam_record.scores.shortAnswer.earned,
-            "shortAnswerTotal": exam_record.scores.shortAnswer.total,
-            "shortAnswerPercentage": exam_record.scores.shortAnswer.percentage,
-            "codingScore": exam_record.scores.coding.earned,
-            "codingTotal": exam_record.scores.coding.total,
-            "codingPercentage": exam_record.scores.coding.percentage,
-            "totalScore": exam_record.scores.total.earned,
-            "totalPossible": exam_record.scores.total.total,
-            "percentage": exam_record.scores.total.percentage,
+            "mcqQuestions": json.dumps(exam["mcqQuestions"]),
+            "shortAnswerQuestions": json.dumps(exam["shortAnswerQuestions"]),
+            "codingProblems": json.dumps(exam["codingProblems"]),
+            **score_fields(result["scores"]),
             "feedback": exam_record.feedback,
         }
         
@@ -121,9 +260,13 @@ async def save_exam_result(exam_record: ExamRecord):
         
         return {
             "message": "Exam result saved successfully",
-            "examId": created_record.id
+            "examId": created_record.id,
+            "scores": result["scores"],
+            "pendingShortAnswers": result["pendingShortAnswers"]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         # Log the error for debugging
         print(f"Error saving exam result: {str(e)}")
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException
+
+from services.jobs import ingestion_jobs
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Get the status, per-source progress and chunk counts of an ingestion job
+    """
+    job = ingestion_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 # from langchain_openai import ChatOpenAI
 # from langchain_chroma import Chroma
 # from langchain_openai import OpenAIEmbeddings
@@ -19,9 +19,20 @@ import uuid
 import time
 from pathlib import Path
 import json
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
 
+from services.complexity import COMPLEXITY_MAX_N, ComplexityError, estimate_complexity, format_complexity
+from services.hints import hint_debouncer
+from services.interactive import run_interactive
+from services.java_runner import java_pool
+from services.problem_bank import is_generic_specification, problem_bank, shifted_difficulty
+from services.result_cache import result_cache
+from services.sandbox import EXECUTION_TIMEOUT, cancel_on_disconnect, execute_code_safely, format_profile, python_pool
+from services.scheduler import ExecutionQueueFull, execution_scheduler, interactive_scheduler
+from services.static_analysis import analyze_code, format_findings, local_hint
+from services.testcases import run_test_cases
 
 router = APIRouter(prefix="/practice", tags=["practice"])
 
@@ -32,6 +43,7 @@ class QueryRequest(BaseModel):
     difficulty: str 
     language: str 
     content: str = None
+    user_id: str = None
   
   
 class QueryRequestModify(BaseModel):
@@ -42,18 +54,83 @@ class QueryRequestModify(BaseModel):
     given_problem: str 
     user_wants: str # easier/harder 
     content: str = None
+    user_id: str = None
   
 
+class ProfileFunction(BaseModel):
+    function: str
+    line: Optional[int] = None  # None outside the submission
+    calls: int
+    own_ms: float
+    cumulative_ms: float
+
+
+class ProfileAllocation(BaseModel):
+    line: int
+    size_kb: float
+    blocks: int
+
+
+class ExecutionProfile(BaseModel):
+    # Shape of the "profile" report from /execute with profile=true
+    wall_ms: float
+    peak_allocated_kb: float
+    allocated_at_exit_kb: Optional[float] = None
+    functions: list[ProfileFunction] = []
+    allocations: list[ProfileAllocation] = []
+
+
+class ComplexityMeasurement(BaseModel):
+    n: int
+    time_ms: float
+
+
+class ComplexityEstimate(BaseModel):
+    # The parts of an /estimate_complexity result the hint prompt uses
+    best_fit: str
+    confidence: float
+    confidence_label: str
+    measurements: list[ComplexityMeasurement] = Field(min_length=1)
+
+
 class LiveRequest(BaseModel):
     given_problem: str 
     topic: str 
     language: str 
     user_code: str 
+    profile: ExecutionProfile = None  # "profile" from a /execute run with profile=true
+    complexity: ComplexityEstimate = None  # result of /estimate_complexity
+    session_id: str = None  # one editor session; hints are debounced per session
 
 
 class ExecuteCodeRequest(BaseModel):
     code: str
     language: str
+    user_id: str = None
+    profile: bool = False  # Python only: cProfile + tracemalloc report
+
+
+class TestCase(BaseModel):
+    stdin: str = ""
+    expected_output: str
+
+
+class RunTestsRequest(BaseModel):
+    code: str
+    language: str
+    cases: list[TestCase]
+    stop_on_first_failure: bool = False
+    timeout_per_case: float = 2.0
+    user_id: str = None
+
+
+class ComplexityRequest(BaseModel):
+    code: str
+    language: str
+    input_format: str = "array"  # n | array | string | custom
+    generator: str = None  # custom: Python code that reads n and prints one input
+    max_n: int = COMPLEXITY_MAX_N
+    user_id: str = None
 
 
 class QueryResponse(BaseModel):
@@ -63,6 +140,11 @@ class QueryResponse(BaseModel):
 class ExecuteCodeResponse(BaseModel):
     output: str
     success: bool
+    execution_time: str = None
+    peak_memory_kb: int = None
+    cpu_time: str = None
+    cached: bool = False
+    profile: dict = None
 
 
 load_dotenv()
@@ -113,194 +195,46 @@ problem_solve_helper = Agent(
 )
 
 
-# Add execution helper function
-def execute_code_safely(code: str, language: str) -> dict:
+@router.on_event("startup")
+async def start_python_pool():
+    # Warm the interpreters before the first Run click
+    await python_pool.start()
+    await problem_bank.start(lambda topic, language, difficulty: generate_problem("", topic, language, difficulty))
+
+
+@router.on_event("shutdown")
+async def stop_python_pool():
+    await python_pool.close()
+    await java_pool.close()
+    await problem_bank.close()
+
+
+def execution_user(user_id, http_request):
+    # Fairness is per learner; anonymous callers are grouped by client address
+    if user_id:
+        return user_id
+    return http_request.client.host if http_request.client else "anonymous"
+
+
+def queue_full(error):
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": "1"})
+
+
+@router.get("/execution_stats")
+async def get_execution_stats():
     """
-    Safely execute code in a controlled environment
+    Execution slots in use, queue depth, rejections, queue-wait percentiles,
+    interactive sessions and result cache hits
     """
-    # Create a unique ID for this execution to avoid conflicts
-    execution_id = str(uuid.uuid4())
-    
-    # Set up execution environment
-    temp_dir = Path(tempfile.gettempdir()) / f"codementor_exec_{execution_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    # Log execution details for debugging
-    debug_info = {
-        "language": language,
-        "execution_id": execution_id,
-        "temp_dir": str(temp_dir),
-        "code_length": len(code)
+    return {
+        **execution_scheduler.stats(),
+        "interactive": interactive_scheduler.stats(),
+        "result_cache": result_cache.stats(),
     }
-    print(f"Debug - Execution request: {json.dumps(debug_info)}")
-    
-    try:
-        if language.lower() == "python":
-            # Create Python file
-            file_path = temp_dir / "code.py"
-            with open(file_path, "w") as f:
-                f.write(code)
-            
-            # Check if Python is available
-            try:
-                # Get Python version for debugging
-                version_result = subprocess.run(
-                    ["python", "--version"],
-                    capture_output=True,
-                    text=True,
-                    timeout=2
-                )
-                print(f"Debug - Python version: {version_result.stdout.strip()}")
-            except Exception as e:
-                print(f"Debug - Python check error: {str(e)}")
-                # Try with python3 instead
-                try:
-                    version_result = subprocess.run(
-                        ["python3", "--version"],
-                        capture_output=True,
-                        text=True,
-                        timeout=2
-                    )
-                    print(f"Debug - Python3 version: {version_result.stdout.strip()}")
-                    # If python3 works, use it instead
-                    python_cmd = "python3"
-                except Exception as e2:
-                    print(f"Debug - Python3 check error: {str(e2)}")
-                    return {
-                        "success": False,
-                        "output": f"Python interpreter not found. Make sure Python is installed and in your PATH.\nError details: {str(e)}\n{str(e2) if 'e2' in locals() else ''}"
-                    }
-            else:
-                python_cmd = "python"
-            
-            # Run with timeout
-            print(f"Debug - Running Python code with command: {python_cmd} {str(file_path)}")
-            start_time = time.time()
-            try:
-                result = subprocess.run(
-                    [python_cmd, str(file_path)],
-                    capture_output=True,
-                    text=True,
-                    timeout=5  # 5 second timeout
-                )
-                execution_time = time.time() - start_time
-                
-                print(f"Debug - Python execution result: returncode={result.returncode}, stdout_length={len(result.stdout)}, stderr_length={len(result.stderr)}")
-                
-                return {
-                    "success": result.returncode == 0,
-                    "output": result.stdout if result.returncode == 0 else f"Error: {result.stderr}",
-                    "execution_time": f"{execution_time:.3f}s"
-                }
-            except Exception as exec_error:
-                print(f"Debug - Python execution error: {str(exec_error)}")
-                return {
-                    "success": False,
-                    "output": f"Error running Python code: {str(exec_error)}"
-                }
-                
-        elif language.lower() == "javascript":
-            # Create JavaScript file
-            file_path = temp_dir / "code.js"
-            with open(file_path, "w") as f:
-                f.write(code)
-            
-            # Run with Node.js if available
-            try:
-                start_time = time.time()
-                result = subprocess.run(
-                    ["node", str(file_path)],
-                    capture_output=True,
-                    text=True,
-                    timeout=5  # 5 second timeout
-                )
-                execution_time = time.time() - start_time
-                
-                return {
-                    "success": result.returncode == 0,
-                    "output": result.stdout if result.returncode == 0 else f"Error: {result.stderr}",
-                    "execution_time": f"{execution_time:.3f}s"
-                }
-            except FileNotFoundError:
-                return {
-                    "success": False,
-                    "output": "Error: Node.js not found. Please install Node.js to execute JavaScript code."
-                }
-                
-        elif language.lower() == "java":
-            # Create Java file - extract class name from code
-            class_name = "Main"  # Default class name
-            
-            # Try to find the class name in the code
-            import re
-            class_match = re.search(r"public\s+class\s+(\w+)", code)
-            if class_match:
-                class_name = class_match.group(1)
-            
-            file_path = temp_dir / f"{class_name}.java"
-            with open(file_path, "w") as f:
-                f.write(code)
-            
-            # Compile Java code
-            compile_result = subprocess.run(
-                ["javac", str(file_path)],
-                capture_output=True,
-                text=True
-            )
-            
-            if compile_result.returncode != 0:
-                return {
-                    "success": False,
-                    "output": f"Compilation Error: {compile_result.stderr}"
-                }
-            
-            # Run Java code
-            try:
-                start_time = time.time()
-                result = subprocess.run(
-                    ["java", "-cp", str(temp_dir), class_name],
-                    capture_output=True,
-                    text=True,
-                    timeout=5  # 5 second timeout
-                )
-                execution_time = time.time() - start_time
-                
-                return {
-                    "success": result.returncode == 0,
-                    "output": result.stdout if result.returncode == 0 else f"Error: {result.stderr}",
-                    "execution_time": f"{execution_time:.3f}s"
-                }
-            except FileNotFoundError:
-                return {
-                    "success": False,
-                    "output": "Error: Java not found. Please install Java to execute Java code."
-                }
-        else:
-            return {
-                "success": False,
-                "output": f"Unsupported language: {language}. Supported languages are Python, JavaScript, and Java."
-            }
-    except subprocess.TimeoutExpired:
-        return {
-            "success": False,
-            "output": "Execution timed out. Your code took too long to run (>5 seconds)."
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "output": f"Execution error: {str(e)}"
-        }
-    finally:
-        # Clean up temp files
-        try:
-            import shutil
-            shutil.rmtree(temp_dir)
-        except Exception:
-            pass
 
 
 @router.post("/execute", response_model=ExecuteCodeResponse)
-async def execute_code(request: ExecuteCodeRequest):
+async def execute_code(request: ExecuteCodeRequest, http_request: Request):
     """
     Execute code in a sandbox environment and return the output
     """
@@ -315,19 +249,37 @@ async def execute_code(request: ExecuteCodeRequest):
         code_sample = request.code[:100] + "..." if len(request.code) > 100 else request.code
         print(f"Debug - Code sample: {code_sample}")
         
-        result = execute_code_safely(request.code, request.language)
+        # Runs as asyncio subprocesses; killed if the client disconnects first
+        result = await cancel_on_disconnect(http_request, execute_code_safely(
+            request.code, request.language, user=execution_user(request.user_id, http_request), profile=request.profile
+        ))
+        if result is None:
+            return ExecuteCodeResponse(output="Execution cancelled.", success=False)
         print(f"Debug - Execution result: {json.dumps(result)}")
         
         # Format the output for readability
         if result["success"] and "execution_time" in result:
             output = f"{result['output']}\n\nExecution completed in {result['execution_time']}"
+            if "peak_memory_kb" in result:
+                output += f" (CPU {result['cpu_time']}, peak memory {result['peak_memory_kb'] / 1024:.1f} MB)"
         else:
             output = result["output"]
+        if "profile" in result:
+            output += f"\n\n{format_profile(result['profile'])}"
         
         return ExecuteCodeResponse(
             output=output,
-            success=result["success"]
+            success=result["success"],
+            execution_time=result.get("execution_time"),
+            peak_memory_kb=result.get("peak_memory_kb"),
+            cpu_time=result.get("cpu_time"),
+            cached=result.get("cached", False),
+            profile=result.get("profile")
         )
+    except ExecutionQueueFull as e:
+        raise queue_full(e)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Debug - Unexpected error in execute_code endpoint: {str(e)}")
         # Return error to client instead of raising an exception
@@ -337,18 +289,156 @@ async def execute_code(request: ExecuteCodeRequest):
         )
 
 
-@router.post("/create")
-async def create_a_problem(request: QueryRequest):
+@router.websocket("/execute/ws")
+async def execute_code_interactive(websocket: WebSocket):
+    """
+    Interactive execution: the first message is {"code", "language", "user_id"};
+    stdout/stderr are streamed back while stdin lines are accepted from the client
+    """
+    await websocket.accept()
+    try:
+        start = await websocket.receive_json()
+        await run_interactive(
+            str(start.get("code", "")),
+            str(start.get("language", "")),
+            websocket.send_json,
+            websocket.receive_json,
+            user=execution_user(start.get("user_id"), websocket),
+        )
+    except WebSocketDisconnect:
+        print("Debug - Interactive session client disconnected")
+        return
+    except ExecutionQueueFull as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1013)  # try again later
+        return
+    except (ValueError, AttributeError) as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1003)
+        return
+    await websocket.close()
+
+
+@router.post("/run_tests")
+async def run_tests(request: RunTestsRequest, http_request: Request):
+    """
+    Run a solution against a list of (stdin, expected output) test cases
+    """
+    if not request.code.strip():
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+    if not request.cases:
+        raise HTTPException(status_code=400, detail="At least one test case is required")
+    if not 0 < request.timeout_per_case <= EXECUTION_TIMEOUT:
+        raise HTTPException(status_code=400, detail=f"timeout_per_case must be between 0 and {EXECUTION_TIMEOUT} seconds")
+
+    try:
+        summary = await cancel_on_disconnect(http_request, run_test_cases(
+            request.code,
+            request.language,
+            [case.dict() for case in request.cases],
+            request.stop_on_first_failure,
+            request.timeout_per_case,
+            execution_user(request.user_id, http_request),
+        ))
+    except ExecutionQueueFull as e:
+        raise queue_full(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running test cases: {str(e)}")
+    if summary is None:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    print(f"Debug - Test run: {summary['passed']}/{summary['total']} passed in {summary['execution_time']}")
+    return summary
+
+
+@router.post("/estimate_complexity")
+async def estimate_solution_complexity(request: ComplexityRequest, http_request: Request):
+    """
+    Measure a solution on inputs of growing size and fit the runtimes to a growth class
+    """
+    if not request.code.strip():
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+    try:
+        estimate = await cancel_on_disconnect(http_request, estimate_complexity(
+            request.code,
+            request.language,
+            request.input_format,
+            request.generator,
+            request.max_n,
+            execution_user(request.user_id, http_request),
+        ))
+    except ExecutionQueueFull as e:
+        raise queue_full(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ComplexityError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error estimating complexity: {str(e)}")
+    if estimate is None:
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    print(f"Debug - {format_complexity(estimate)}")
+    return estimate
+
+
+def generate_problem(user_specification, topic, language, difficulty):
     response = client.run(
             agent=problem_creation_agent,
-            messages=[{"role": "user", "content": f"user specification: {request.user_specification}. Topic and language: {request.topic} {request.language}. Difficulty: {request.difficulty}"}],
+            messages=[{"role": "user", "content": f"user specification: {user_specification}. Topic and language: {topic} {language}. Difficulty: {difficulty}"}],
         )
-
     return response.messages[-1]["content"]
 
 
+async def problem_from_bank(topic, language, difficulty, user):
+    try:
+        return await problem_bank.take(topic, language, difficulty, user)
+    except Exception as e:
+        # The bank is an optimization; without the database, generate live
+        print(f"Debug - Problem bank lookup failed: {str(e)}")
+        return None
+
+
+async def add_to_bank(topic, language, difficulty, problem, user):
+    try:
+        await problem_bank.add(topic, language, difficulty, problem, served_to=user)
+    except Exception as e:
+        print(f"Debug - Problem bank insert failed: {str(e)}")
+
+
+@router.get("/bank/stats")
+async def get_problem_bank_stats():
+    """
+    Problems served from the pre-generated bank vs generated live, and pending refills
+    """
+    return problem_bank.stats()
+
+
+@router.post("/create")
+async def create_a_problem(request: QueryRequest, http_request: Request):
+    if not is_generic_specification(request.user_specification, request.topic, request.difficulty):
+        return generate_problem(request.user_specification, request.topic, request.language, request.difficulty)
+
+    user = execution_user(request.user_id, http_request)
+    problem = await problem_from_bank(request.topic, request.language, request.difficulty, user)
+    if problem is not None:
+        print("Debug - Practice problem served from the bank")
+        return problem
+    problem = generate_problem(request.user_specification, request.topic, request.language, request.difficulty)
+    await add_to_bank(request.topic, request.language, request.difficulty, problem, user)
+    return problem
+
+
 @router.post("/modify")
-async def create_a_problem(request: QueryRequestModify):
+async def create_a_problem(request: QueryRequestModify, http_request: Request):
+    # A plain easier / harder request is a bank problem one difficulty step away
+    difficulty = shifted_difficulty(request.difficulty, request.user_wants)
+    if difficulty and is_generic_specification(request.user_specification, request.topic, request.difficulty):
+        problem = await problem_from_bank(request.topic, request.language, difficulty, execution_user(request.user_id, http_request))
+        if problem is not None:
+            print("Debug - Modified practice problem served from the bank")
+            return problem
+
     response = client.run(
             agent=problem_modifying_agent,
             messages=[{"role": "user", "content": f"user specification: {request.user_specification}. Topic and language: {request.topic} {request.language}. Difficulty: {request.difficulty}. But user wants {request.user_wants} problem"}],
@@ -358,10 +448,45 @@ async def create_a_problem(request: QueryRequestModify):
 
 
 @router.post("/live_tracking")
-async def create_a_problem(request: LiveRequest):
-    response = client.run(
-            agent=problem_solve_helper,
-            messages=[{"role": "user", "content": f"Topic and language: {request.topic} {request.language}.  Given Problem {request.given_problem} user current progress {request.user_code}."}],
-        )
+async def create_a_problem(request: LiveRequest, http_request: Request):
+    # Syntax errors, undefined names and obvious infinite loops are answered locally
+    findings = analyze_code(request.user_code, request.language)
+    hint = local_hint(findings)
+    if hint is not None:
+        hint_debouncer.record_local()
+        print("Debug - Live tracking hint from static analysis")
+        return hint
+
+    content = f"Topic and language: {request.topic} {request.language}.  Given Problem {request.given_problem} user current progress {request.user_code}."
+    if request.profile:
+        # Measured timings instead of guessing the complexity from the source
+        content += f"\n\nMeasured profile of the user's last run (use it for any performance comment):\n{format_profile(request.profile.dict())}"
+    if request.complexity:
+        content += f"\n\n{format_complexity(request.complexity.dict())}. Base any time complexity comment on this measurement."
+    if findings:
+        content += f"\n\nStatic analysis notes:\n{format_findings(findings)}"
+
+    def ask_helper():
+        response = client.run(
+                agent=problem_solve_helper,
+                messages=[{"role": "user", "content": content}],
+            )
+        return response.messages[-1]["content"]
+
+    session_id = request.session_id or f"{execution_user(None, http_request)}:{request.given_problem}"
+    profile = request.profile.dict() if request.profile else None
+    complexity = request.complexity.dict() if request.complexity else None
+    context = json.dumps([request.topic, profile, complexity], sort_keys=True)
+    hint, source = hint_debouncer.hint(
+        session_id, request.given_problem, request.language, request.user_code, ask_helper, context
+    )
+    print(f"Debug - Live tracking hint from {source}")
+    return hint
+
 
-    return response.messages[-1]["content"]
\ No newline at end of file
+@router.get("/live_tracking/stats")
+async def get_live_tracking_stats():
+    """
+    How many live-tracking hints were served by the model, the cache, or debouncing
+    """
+    return hint_debouncer.stats()
\ No newline at end of file
@@ -17,6 +17,9 @@ from langchain.chains import create_history_aware_retriever, create_retrieval_ch
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.vectorstores import Chroma
 
+from services.chains import get_rag_chain
+from services.chunking import CodeAwareTextSplitter
+from services.jobs import ensure_vectorstore, refresh_cached_vectorstores
 
 load_dotenv()
 
@@ -24,48 +27,12 @@ load_dotenv()
 
 chat_history = [AIMessage(content="Hello, I'm a bot. How can I help you today?"), HumanMessage(content="You will create 15 quizes with multiple choices (4 choices). on the topic you are given based on the website. Add 10 informative type question and 5 question that will evaluate if the user understood the topic or not. Only generate questions with number bulletins. dont generate any extra sentences.")]
 vector_store_cache = {}
-def get_vectorstore_from_url(url):
+text_splitter = CodeAwareTextSplitter(chunk_size=800, chunk_overlap=80)
 
-    loader = WebBaseLoader(url)
-    document = loader.load()
-    text_spliter = RecursiveCharacterTextSplitter()
-    document_chunks = text_spliter.split_documents(document)
-    vectorstore = Chroma.from_documents(document_chunks, OpenAIEmbeddings())
 
-    return vectorstore
+def get_response(user_query, vector_store, retrieval_mode="auto"):
 
-
-def get_context_retriever_chain(vectorstore):
-
-    llm = ChatOpenAI()
-    retriever = vectorstore.as_retriever()
-    prompt = ChatPromptTemplate.from_messages([
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-        ("user", "Given the above conversation, generate a search query to look up in order to get information relevant to the conversation")
-    ])
-    retriever_chain = create_history_aware_retriever(llm, retriever, prompt)
-
-    return retriever_chain
-
-
-def get_conversational_rag_chain(retriever_chain):   
-
-    llm = ChatOpenAI()  
-    prompt = ChatPromptTemplate.from_messages([
-      ("system", "Answer the user's questions based on the below context:\n\n{context}"),
-      MessagesPlaceholder(variable_name="chat_history"),
-      ("user", "{input}"),
-    ])  
-    stuff_documents_chain = create_stuff_documents_chain(llm, prompt)
-    
-    return create_retrieval_chain(retriever_chain, stuff_documents_chain)
-
-
-def get_response(user_query, vector_store):
-
-    retriever_chain = get_context_retriever_chain(vector_store)
-    conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
+    conversation_rag_chain = get_rag_chain(vector_store, "web", retrieval_mode, chat_history, profile="quiz")
     response = conversation_rag_chain.invoke({
             "chat_history": chat_history,
             "input": user_query
@@ -112,14 +79,8 @@ async def chat_with_website(query: QueryRequest):
     if not website_url or not topic:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'topic' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Load or retrieve vector store (ingested by a background job on first use)
+    vector_store = await ensure_vectorstore(vector_store_cache, website_url, text_splitter)
 
     # Get response from the vector store and model
     try:
@@ -130,6 +91,15 @@ async def chat_with_website(query: QueryRequest):
     return QueryResponse(response=response)
 
 
+@router.post("/refresh_sources")
+async def refresh_sources():
+    """
+    Re-check every cached website with conditional fetches and re-embed only changed chunks
+    """
+    job = refresh_cached_vectorstores(vector_store_cache, text_splitter)
+    return {"message": "Sources are being refreshed in the background.", "job_id": job["id"], "status": job["status"]}
+
+
 chat_history = [AIMessage(content="Hello, I'm a bot. How can I help you today?"), HumanMessage(content="You will evaluate which area I need to focus on. I will provide you the question I got wrong in the topic. Give me suggestion as a list of points on which area i should focus on.")]
 
 
@@ -145,14 +115,8 @@ async def chat_with_website(query: EvaluationRequest):
     if not website_url or not topic:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'topic' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Load or retrieve vector store (ingested by a background job on first use)
+    vector_store = await ensure_vectorstore(vector_store_cache, website_url, text_splitter)
 
     # Get response from the vector store and model
     try:
@@ -178,14 +142,8 @@ async def chat_with_website(query: EvaluationRequest):
     if not website_url or not topic:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'topic' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Load or retrieve vector store (ingested by a background job on first use)
+    vector_store = await ensure_vectorstore(vector_store_cache, website_url, text_splitter)
 
     # Get response from the vector store and model
     try:
@@ -213,14 +171,8 @@ async def generate_short_answer_questions(query: ShortAnswerRequest):
     if not website_url or not topic:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'topic' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Load or retrieve vector store (ingested by a background job on first use)
+    vector_store = await ensure_vectorstore(vector_store_cache, website_url, text_splitter)
 
     # Get response from the vector store and model using short answer chat history
     try:
@@ -269,14 +221,8 @@ async def evaluate_short_answers(query: ShortAnswerEvalRequest):
     if len(user_answers) != len(questions):
         raise HTTPException(status_code=400, detail="Number of answers must match number of questions.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Load or retrieve vector store (ingested by a background job on first use)
+    vector_store = await ensure_vectorstore(vector_store_cache, website_url, text_splitter)
 
     # Get response from the vector store and model using evaluation chat history
     try:
@@ -0,0 +1,121 @@
+"""
+Shared RAG chain factory.
+
+Chains are built once per (vectorstore, prompt kind, retrieval mode) and reused,
+and every chain for the same model shares one ChatOpenAI client (and its HTTP
+connection pool).
+
+Retrieval modes:
+- "rewrite": an LLM call turns the chat history + input into a search query first
+- "direct": the input itself is embedded for retrieval, saving one LLM round trip
+- "auto": "rewrite" only when the chat history holds a real conversation
+"""
+from functools import lru_cache
+
+from langchain_core.messages import HumanMessage
+
+from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_openai import ChatOpenAI
+
+from services.retrieval import get_retriever
+
+
+PROMPT_KINDS = {
+    # quiz.py, topics.py and contents.py
+    "web": {
+        "model": None,
+        "rewrite": "Given the above conversation, generate a search query to look up in order to get information relevant to the conversation",
+        "system": "Answer the user's questions based on the below context:\n\n{context}",
+    },
+    # contentai.py
+    "tutor": {
+        "model": "gpt-4o",
+        "rewrite": "Based on the conversation, generate a search query to get relevant information.",
+        "system": "Teach the user on the certain topic based on the context. Also give him a question after each response. If the user is correct move ahead.:\n\n{context}",
+    },
+}
+
+RETRIEVAL_MODES = ("rewrite", "direct", "auto")
+
+# id(vectorstore) -> (vectorstore, {(prompt kind, mode, profile): chain}). The chains hold the
+# vectorstore anyway, so keeping it here also stops ids from being reused.
+_chain_cache = {}
+
+
+@lru_cache(maxsize=None)
+def get_llm(model=None):
+    """
+    One ChatOpenAI client per model, shared by every chain and router
+    """
+    if model is None:
+        return ChatOpenAI()
+    return ChatOpenAI(model=model)
+
+
+@lru_cache(maxsize=None)
+def _rewrite_prompt(kind):
+    return ChatPromptTemplate.from_messages([
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("user", "{input}"),
+        ("user", PROMPT_KINDS[kind]["rewrite"]),
+    ])
+
+
+@lru_cache(maxsize=None)
+def _answer_prompt(kind):
+    return ChatPromptTemplate.from_messages([
+        ("system", PROMPT_KINDS[kind]["system"]),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("user", "{input}"),
+    ])
+
+
+def has_conversation(chat_history):
+    """
+    True when the history contains more than one user turn, i.e. something a
+    query rewrite could actually use. A single scripted instruction doesn't count.
+    """
+    return sum(isinstance(message, HumanMessage) for message in chat_history or []) > 1
+
+
+def resolve_retrieval_mode(mode, chat_history=None):
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    if mode == "auto":
+        return "rewrite" if has_conversation(chat_history) else "direct"
+    return mode
+
+
+def build_rag_chain(vectorstore, kind, mode="rewrite", profile="default"):
+    llm = get_llm(PROMPT_KINDS[kind]["model"])
+    retriever = get_retriever(vectorstore, profile)
+    if mode != "direct":
+        retriever = create_history_aware_retriever(llm, retriever, _rewrite_prompt(kind))
+    stuff_documents_chain = create_stuff_documents_chain(llm, _answer_prompt(kind))
+    return create_retrieval_chain(retriever, stuff_documents_chain)
+
+
+def get_rag_chain(vectorstore, kind="web", mode="rewrite", chat_history=None, profile="default"):
+    """
+    Return the memoized retrieval chain for this vectorstore, prompt kind,
+    retrieval mode and retrieval profile (k / token budget, see
+    services/retrieval.py). chat_history is only needed to resolve mode="auto".
+    """
+    if kind not in PROMPT_KINDS:
+        raise ValueError(f"Unknown prompt kind: {kind}")
+    mode = resolve_retrieval_mode(mode, chat_history)
+
+    _, chains = _chain_cache.setdefault(id(vectorstore), (vectorstore, {}))
+    key = (kind, mode, profile)
+    if key not in chains:
+        chains[key] = build_rag_chain(vectorstore, kind, mode, profile)
+    return chains[key]
+
+
+def drop_chains(vectorstore):
+    """
+    Forget the chains built for a vectorstore that is being replaced
+    """
+    _chain_cache.pop(id(vectorstore), None)
@@ -0,0 +1,209 @@
+"""
+Preprocessing and chunking for ingested sources.
+
+- extract_main_content: drops scripts, navigation, footers, cookie banners etc.
+  and turns <pre> blocks into fenced code blocks
+- strip_site_boilerplate / strip_repeated_page_lines: drops lines that repeat
+  across pages of the same site (or pages of the same PDF)
+- CodeAwareTextSplitter: token-sized chunks that never cut a fenced code block
+  unless the block alone is larger than a chunk
+"""
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import tiktoken
+from bs4 import BeautifulSoup, NavigableString
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+
+
+BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg", "button"]
+BOILERPLATE_HINT = re.compile(r"cookie|consent|banner|navbar|nav-|menu|footer|sidebar|breadcrumb|advert|promo|newsletter|share|social", re.I)
+
+_fence_pattern = re.compile(r"^```[^\n]*\n.*?^```[ \t]*$", re.M | re.S)
+_digits_pattern = re.compile(r"\d+")
+_blank_lines_pattern = re.compile(r"\n\s*\n\s*\n+")
+
+# host -> {url: set of normalised lines on that page}
+_site_pages = defaultdict(dict)
+# host -> normalised line -> number of pages it appears on
+_site_line_counts = defaultdict(Counter)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Offline without a cached BPE file: fall back to ~4 characters per token
+        print(f"Debug - tiktoken unavailable, estimating token counts: {str(e)}")
+        return None
+
+
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _normalise_line(line):
+    # "Page 3 of 10" and "Page 4 of 10" should count as the same line
+    return _digits_pattern.sub("#", " ".join(line.split()).lower())
+
+
+def _is_boilerplate_element(element):
+    hints = " ".join(element.get("class", [])) + " " + (element.get("id") or "") + " " + (element.get("role") or "")
+    return bool(BOILERPLATE_HINT.search(hints)) and element.name not in ("main", "article", "body", "html")
+
+
+def extract_main_content(html):
+    """
+    Main readable text of an HTML page, code blocks fenced with ```
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text().strip() if soup.title else None
+
+    for element in soup(BOILERPLATE_TAGS) + soup.find_all(_is_boilerplate_element):
+        # Nested matches may already be gone with their parent
+        if not element.decomposed:
+            element.decompose()
+
+    for pre in soup.find_all("pre"):
+        code = pre.get_text().strip("\n")
+        language = ""
+        code_tag = pre.find("code")
+        for css_class in (code_tag.get("class", []) if code_tag else []) + pre.get("class", []):
+            if css_class.startswith("language-"):
+                language = css_class[len("language-"):]
+                break
+        pre.replace_with(NavigableString(f"\n```{language}\n{code}\n```\n"))
+
+    root = soup.find("main") or soup.find("article") or soup.find(attrs={"role": "main"}) or soup.body or soup
+    text = _blank_lines_pattern.sub("\n\n", root.get_text("\n"))
+    return text.strip(), title
+
+
+def _outside_fences(lines):
+    # Yields (index, line) for lines that are not inside a fenced code block
+    in_fence = False
+    for index, line in enumerate(lines):
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+            continue
+        if not in_fence:
+            yield index, line
+
+
+def strip_site_boilerplate(url, text, min_other_pages=2, ratio=0.5):
+    """
+    Drop lines that also appear on most other pages ingested from the same host
+    """
+    host = urlparse(url).netloc
+    pages = _site_pages[host]
+    counts = _site_line_counts[host]
+
+    previous = pages.pop(url, None)
+    if previous:
+        counts.subtract(previous)
+
+    lines = text.splitlines()
+    keys = {}
+    for index, line in _outside_fences(lines):
+        key = _normalise_line(line)
+        if key:
+            keys[index] = key
+
+    other_pages = len(pages)
+    drop = set()
+    if other_pages >= min_other_pages:
+        threshold = max(2, ratio * other_pages)
+        drop = {index for index, key in keys.items() if counts[key] >= threshold}
+
+    page_keys = set(keys.values())
+    pages[url] = page_keys
+    counts.update(page_keys)
+
+    return "\n".join(line for index, line in enumerate(lines) if index not in drop)
+
+
+def _edge_lines(lines, edge):
+    # Indices of the first / last `edge` non-empty lines: where running headers and footers live
+    indices = [index for index, line in _outside_fences(lines) if line.strip()]
+    return set(indices[:edge] + indices[-edge:])
+
+
+def strip_repeated_page_lines(documents, min_pages=3, ratio=0.5, edge=3):
+    """
+    Drop running headers / footers: edge lines that repeat on most pages of one PDF
+    """
+    if len(documents) < min_pages:
+        return documents
+
+    counts = Counter()
+    for document in documents:
+        lines = document.page_content.splitlines()
+        counts.update({_normalise_line(lines[index]) for index in _edge_lines(lines, edge)})
+
+    threshold = ratio * len(documents)
+    repeated = {key for key, count in counts.items() if count >= threshold}
+    if not repeated:
+        return documents
+
+    for document in documents:
+        lines = document.page_content.splitlines()
+        drop = {index for index in _edge_lines(lines, edge) if _normalise_line(lines[index]) in repeated}
+        document.page_content = "\n".join(line for index, line in enumerate(lines) if index not in drop)
+    return documents
+
+
+class CodeAwareTextSplitter(TextSplitter):
+    """
+    Token-sized splitter that keeps fenced code blocks whole.
+
+    Prose is split recursively (paragraphs, lines, sentences, words); code blocks
+    are kept as single pieces and only split on line boundaries, re-fenced, when
+    one block alone exceeds chunk_size. Pieces are then merged up to chunk_size
+    tokens with chunk_overlap tokens of overlap.
+    """
+
+    def __init__(self, chunk_size=800, chunk_overlap=80, **kwargs):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=count_tokens, **kwargs)
+        self._prose_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=0,
+            length_function=count_tokens,
+        )
+
+    def _split_code(self, block):
+        lines = block.splitlines()
+        opening, body = lines[0], lines[1:-1]
+        budget = self._chunk_size - count_tokens(opening) - 2
+        pieces, current, used = [], [], 0
+        for line in body:
+            tokens = count_tokens(line) + 1
+            if current and used + tokens > budget:
+                pieces.append("\n".join([opening] + current + ["```"]))
+                current, used = [], 0
+            current.append(line)
+            used += tokens
+        if current:
+            pieces.append("\n".join([opening] + current + ["```"]))
+        return pieces
+
+    def split_text(self, text):
+        pieces = []
+        position = 0
+        for match in _fence_pattern.finditer(text):
+            pieces.extend(self._prose_splitter.split_text(text[position:match.start()]))
+            block = match.group(0)
+            if count_tokens(block) <= self._chunk_size:
+                pieces.append(block)
+            else:
+                pieces.extend(self._split_code(block))
+            position = match.end()
+        pieces.extend(self._prose_splitter.split_text(text[position:]))
+
+        pieces = [piece.strip() for piece in pieces if piece.strip()]
+        return self._merge_splits(pieces, "\n\n")
@@ -0,0 +1,302 @@
+"""
+Empirical time-complexity estimates for practice solutions.
+
+The solution is run in the sandbox on generated inputs of doubling size
+(each size a few times, keeping the fastest run). The measured runtimes are
+fitted to t = a + b * f(n) for the usual growth classes, weighted by relative
+error so small and large inputs count alike, and the simplest class that fits
+about as well as the best one is reported together with a confidence.
+
+Every run is paired with a baseline program that only reads and parses the
+same input (the plain way for the format), and the fastest baseline time is
+subtracted from the fastest solution time for that size: the O(n) read would
+otherwise dominate small algorithms and fit O(1) and O(log n) solutions as
+O(n). Python runs every size inside one pooled worker, the baseline just
+before each case in the same process, using the times measured in the worker,
+so interpreter startup is not part of the timings. JavaScript and Java are
+timed per process, alternating baseline and solution runs; the subtraction
+also removes their startup cost.
+"""
+import math
+import os
+import random
+import string
+import time
+
+import numpy as np
+
+from services.java_runner import run_java_submission
+from services.sandbox import python_pool, run_javascript
+from services.scheduler import execution_scheduler
+
+
+COMPLEXITY_MIN_N = 64
+COMPLEXITY_MAX_N = int(os.getenv("COMPLEXITY_MAX_N", str(2 ** 16)))
+COMPLEXITY_REPEATS = 3
+# A size slower than this ends the series; larger sizes would only be slower
+COMPLEXITY_CASE_TIMEOUT = 1.0
+# Below this, what is left after subtracting the input baseline is timer noise
+COMPLEXITY_NOISE_MS = 0.05
+INPUT_FORMATS = ("n", "array", "string", "custom")
+
+# Programs that read the input like a solution would and do nothing else
+_JAVA_BASELINE = """
+import java.io.*;
+import java.util.*;
+
+public class Main {
+    public static void main(String[] args) throws IOException {
+        BufferedReader reader = new BufferedReader(new InputStreamReader(System.in));
+        List<String> tokens = new ArrayList<>();
+        for (String line = reader.readLine(); line != null; line = reader.readLine()) {
+            StringTokenizer tokenizer = new StringTokenizer(line);
+            while (tokenizer.hasMoreTokens()) {
+                tokens.add(tokenizer.nextToken());
+            }
+        }
+        %s
+    }
+}
+"""
+BASELINE_PROGRAMS = {
+    "python": {
+        "n": "n = int(input())\n",
+        "array": "n = int(input())\nvalues = list(map(int, input().split()))\n",
+        "string": "text = input()\n",
+        "custom": "import sys\ntokens = sys.stdin.read().split()\n",
+    },
+    "javascript": {
+        "n": "const n = Number(require('fs').readFileSync(0, 'utf8').trim());\n",
+        "array": "const values = require('fs').readFileSync(0, 'utf8').trim().split(/\\s+/).map(Number);\n",
+        "string": "const text = require('fs').readFileSync(0, 'utf8').trim();\n",
+        "custom": "const tokens = require('fs').readFileSync(0, 'utf8').trim().split(/\\s+/);\n",
+    },
+    "java": {
+        "n": _JAVA_BASELINE % "int n = Integer.parseInt(tokens.get(0));",
+        "array": _JAVA_BASELINE % "int[] values = tokens.stream().skip(1).mapToInt(Integer::parseInt).toArray();",
+        "string": _JAVA_BASELINE % "String text = tokens.get(0);",
+        "custom": _JAVA_BASELINE % "int count = tokens.size();",
+    },
+}
+
+GROWTH_CLASSES = [
+    ("O(1)", lambda n: np.zeros_like(n)),
+    ("O(log n)", np.log2),
+    ("O(n)", lambda n: n),
+    ("O(n log n)", lambda n: n * np.log2(n)),
+    ("O(n^2)", lambda n: n ** 2),
+    ("O(n^3)", lambda n: n ** 3),
+]
+# Prefer the simpler class when its error is within this of the best fit
+FIT_TOLERANCE = 1.05
+FIT_SLACK = 0.01
+
+
+class ComplexityError(Exception):
+    pass
+
+
+def input_sizes(max_n=COMPLEXITY_MAX_N):
+    sizes, n = [], COMPLEXITY_MIN_N
+    while n <= max_n:
+        sizes.append(n)
+        n *= 2
+    return sizes
+
+
+def generate_input(input_format, n):
+    """
+    Built-in input families: "n" (just the number), "array" (n, then n
+    integers) and "string" (a lowercase string of length n). Seeded by n, so
+    the same size always gets the same input.
+    """
+    rng = random.Random(n)
+    if input_format == "n":
+        return f"{n}\n"
+    if input_format == "array":
+        return f"{n}\n" + " ".join(str(rng.randint(-10 ** 9, 10 ** 9)) for _ in range(n)) + "\n"
+    if input_format == "string":
+        return "".join(rng.choice(string.ascii_lowercase) for _ in range(n)) + "\n"
+    raise ValueError(f"Unknown input format: {input_format}. Use one of {', '.join(INPUT_FORMATS)}.")
+
+
+async def _custom_inputs(generator, sizes):
+    # The generator is user code too: it runs in the sandbox, reading n on stdin
+    inputs = []
+    for n in sizes:
+        result = await python_pool.run(generator, f"{n}\n")
+        if not result["success"] or result.get("truncated"):
+            if not inputs:
+                raise ComplexityError(f"Input generator failed for n={n}: {result['output']}")
+            # Inputs past the output limit cannot be generated; use the sizes we have
+            break
+        inputs.append(result["output"])
+    return inputs
+
+
+def subtract_baseline(timings, baseline):
+    """
+    Solution time minus input-reading time per size
+    """
+    return {n: max(COMPLEXITY_NOISE_MS, t - baseline[n]) for n, t in timings.items()}
+
+
+async def _time_python(code, baseline, sizes, inputs):
+    timings, baselines = {}, {}
+    failure = None
+
+    async def on_result(raw):
+        nonlocal failure
+        n = sizes[raw["index"] // COMPLEXITY_REPEATS]
+        if raw["truncated"]:
+            # Output past the sandbox limit: larger sizes would be cut short too
+            return False
+        if raw["returncode"] != 0:
+            failure = f"Solution failed for n={n}: {raw['stderr'][-500:]}"
+            return False
+        timings[n] = min(timings.get(n, math.inf), raw["time_ms"])
+        baselines[n] = min(baselines.get(n, math.inf), raw["baseline_ms"])
+        return True
+
+    cases = [case_input for case_input in inputs for _ in range(COMPLEXITY_REPEATS)]
+    await python_pool.run_batch(code, cases, COMPLEXITY_CASE_TIMEOUT, on_result, settle=True, baseline=baseline)
+    if failure and len(timings) < 2:
+        raise ComplexityError(failure)
+    return subtract_baseline(timings, baselines)
+
+
+async def _time_run(run, code, case_input):
+    start_time = time.perf_counter()
+    result = await run(code, case_input, COMPLEXITY_CASE_TIMEOUT)
+    return result, (time.perf_counter() - start_time) * 1000
+
+
+async def _time_process(run, code, baseline, sizes, inputs):
+    timings, baselines = {}, {}
+    for n, case_input in zip(sizes, inputs):
+        for _ in range(COMPLEXITY_REPEATS):
+            _, baseline_elapsed = await _time_run(run, baseline, case_input)
+            result, elapsed = await _time_run(run, code, case_input)
+            if result.get("timed_out") or result.get("truncated"):
+                return subtract_baseline(timings, baselines)
+            if not result["success"]:
+                if len(timings) < 2:
+                    raise ComplexityError(f"Solution failed for n={n}: {result['output'][-500:]}")
+                return subtract_baseline(timings, baselines)
+            timings[n] = min(timings.get(n, math.inf), elapsed)
+            baselines[n] = min(baselines.get(n, math.inf), baseline_elapsed)
+    return subtract_baseline(timings, baselines)
+
+
+def _fit(n, t, f):
+    """
+    Relative-error least squares of t = a + b * f with a, b >= 0. Returns the
+    RMS relative error and the share of the largest runtime explained by b * f.
+    """
+    weights = 1 / t
+    scale = f.max() or 1.0
+    columns = [np.ones_like(n), f / scale] if f.any() else [np.ones_like(n)]
+    for design in (columns, columns[1:]):
+        if not design:
+            continue
+        matrix = np.stack(design, axis=1)
+        coefficients, *_ = np.linalg.lstsq(matrix * weights[:, None], t * weights, rcond=None)
+        if (coefficients >= 0).all():
+            predicted = matrix @ coefficients
+            growth = coefficients[-1] * matrix[-1, -1] / predicted[-1] if f.any() else 0.0
+            return float(np.sqrt(np.mean(((t - predicted) / t) ** 2))), float(growth)
+    # Negative slope: the data does not grow, which is the constant model
+    return float(np.sqrt(np.mean(((t - t.mean()) / t) ** 2))), 0.0
+
+
+def fit_growth(timings):
+    """
+    Best growth class for {n: time_ms}, with a 0-1 confidence and every class's error
+    """
+    n = np.array(sorted(timings), dtype=float)
+    t = np.maximum(np.array([timings[size] for size in sorted(timings)], dtype=float), 1e-3)
+    fits = [(name, *_fit(n, t, f(n))) for name, f in GROWTH_CLASSES]
+    errors = [(name, error) for name, error, _ in fits]
+    best_error = min(error for _, error in errors)
+    chosen, chosen_error = next((name, error) for name, error in errors if error <= best_error * FIT_TOLERANCE + FIT_SLACK)
+    # Classes whose fit is essentially flat are the constant model again, not an alternative
+    alternatives = [error for name, error, growth in fits if name != chosen and (name == "O(1)" or growth >= 0.05)]
+    runner_up = min(alternatives) if alternatives else 0.0
+
+    # Log-log slope over the larger half of the sizes
+    half = len(n) // 2
+    exponent = float(np.polyfit(np.log2(n[half:]), np.log2(t[half:]), 1)[0]) if len(n) - half >= 2 else None
+
+    separation = max(0.0, 1 - chosen_error / runner_up) if runner_up > 0 else 0.0
+    quality = max(0.0, 1 - 2 * chosen_error)
+    # Six doublings or more count as a full range
+    size_range = min(1.0, math.log2(n[-1] / n[0]) / 6)
+    # Sub-millisecond series are mostly timer noise, unless nothing grows at all
+    signal = 1.0 if chosen == "O(1)" else min(1.0, t[-1] / 10)
+    confidence = quality * size_range * signal * (0.5 + 0.5 * separation)
+    return {
+        "best_fit": chosen,
+        "confidence": round(confidence, 2),
+        "confidence_label": "high" if confidence >= 0.75 else "medium" if confidence >= 0.5 else "low",
+        "exponent": round(exponent, 2) if exponent is not None else None,
+        "fits": [{"class": name, "error": round(error, 4)} for name, error in errors],
+    }
+
+
+async def estimate_complexity(code, language, input_format="array", generator=None, max_n=COMPLEXITY_MAX_N, user=None):
+    """
+    Run code on inputs of doubling size and fit the runtimes to growth classes.
+    Raises ValueError for bad arguments and ComplexityError when the solution
+    (or the generator) fails or too few sizes could be measured.
+    """
+    language = language.lower()
+    if language not in ("python", "javascript", "java"):
+        raise ValueError(f"Unsupported language: {language}. Supported languages are Python, JavaScript, and Java.")
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Unknown input format: {input_format}. Use one of {', '.join(INPUT_FORMATS)}.")
+    if input_format == "custom" and not generator:
+        raise ValueError("A custom input format needs a generator (Python code that reads n and prints one input).")
+    sizes = input_sizes(min(max_n, COMPLEXITY_MAX_N))
+    if len(sizes) < 3:
+        raise ValueError(f"max_n must be at least {COMPLEXITY_MIN_N * 4}.")
+
+    start_time = time.time()
+    async with execution_scheduler.slot(user):
+        if input_format == "custom":
+            inputs = await _custom_inputs(generator, sizes)
+        else:
+            inputs = [generate_input(input_format, n) for n in sizes]
+        sizes = sizes[:len(inputs)]
+        baseline = BASELINE_PROGRAMS[language][input_format]
+        if language == "python":
+            timings = await _time_python(code, baseline, sizes, inputs)
+        elif language == "java":
+            timings = await _time_process(run_java_submission, code, baseline, sizes, inputs)
+        else:
+            timings = await _time_process(run_javascript, code, baseline, sizes, inputs)
+
+    if len(timings) < 3:
+        raise ComplexityError(
+            f"Only {len(timings)} input sizes finished within {COMPLEXITY_CASE_TIMEOUT:g}s each; "
+            "the solution is too slow to estimate (or exponential)."
+        )
+    estimate = fit_growth(timings)
+    estimate.update({
+        "input_format": input_format,
+        "measurements": [{"n": n, "time_ms": round(timings[n], 3)} for n in sorted(timings)],
+        "stopped_at_n": None if len(timings) == len(sizes) else sizes[len(timings)],
+        "estimation_time": f"{time.time() - start_time:.3f}s",
+    })
+    return estimate
+
+
+def format_complexity(estimate):
+    """
+    One-line summary of an estimate (for prompts and feedback)
+    """
+    sizes = estimate["measurements"]
+    return (
+        f"Measured time complexity: {estimate['best_fit']} (confidence {estimate['confidence']:.2f}, "
+        f"{estimate['confidence_label']}), from n={sizes[0]['n']} ({sizes[0]['time_ms']:.2f} ms) "
+        f"to n={sizes[-1]['n']} ({sizes[-1]['time_ms']:.2f} ms)"
+    )
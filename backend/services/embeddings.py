@@ -0,0 +1,135 @@
+"""
+Embedding providers for the vector stores.
+
+The backend is picked per deployment with the EMBEDDING_BACKEND env var:
+- "openai" (default): OpenAIEmbeddings, remote
+- "hashing": signed feature hashing of word unigrams/bigrams, pure NumPy, no network
+- "sentence-transformers": a small local model (EMBEDDING_MODEL, default all-MiniLM-L6-v2)
+
+Vectors from different backends are not comparable, so the backend name is
+part of every collection name (see services/ingestion.py).
+"""
+import os
+import re
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+EMBEDDING_BACKENDS = ("openai", "hashing", "sentence-transformers")
+DEFAULT_BATCH_SIZE = 256
+
+_token_pattern = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=200_000)
+def _hash_feature(feature, dimensions):
+    # crc32 is stable across processes, unlike hash()
+    value = zlib.crc32(feature.encode("utf-8"))
+    return value % dimensions, 1.0 if (value >> 31) & 1 else -1.0
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Local CPU embeddings via the hashing trick.
+
+    Each batch is turned into flat (row, column, sign) arrays and scattered into
+    one dense matrix with np.add.at, then L2-normalised in a single pass.
+    """
+
+    def __init__(self, dimensions=1024, batch_size=DEFAULT_BATCH_SIZE, ngram_range=(1, 2)):
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.ngram_range = ngram_range
+
+    def _features(self, text):
+        tokens = _token_pattern.findall(text.lower())
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(tokens) - n + 1):
+                yield " ".join(tokens[i:i + n])
+
+    def _embed_batch(self, texts):
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                column, sign = _hash_feature(feature, self.dimensions)
+                rows.append(row)
+                columns.append(column)
+                signs.append(sign)
+
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        if rows:
+            np.add.at(matrix, (np.asarray(rows), np.asarray(columns)), np.asarray(signs, dtype=np.float32))
+        # Sublinear term frequency, then unit length so dot product == cosine
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_array(self, texts):
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return np.vstack([
+            self._embed_batch(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ])
+
+    def embed_documents(self, texts):
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    Local CPU embeddings from a small sentence-transformers model, batched
+    """
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def embed_array(self, texts):
+        return self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype(np.float32)
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+
+def embedding_backend():
+    backend = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}. Expected one of {', '.join(EMBEDDING_BACKENDS)}")
+    return backend
+
+
+@lru_cache(maxsize=None)
+def create_embeddings(backend):
+    if backend == "hashing":
+        return HashingEmbeddings(dimensions=int(os.getenv("EMBEDDING_DIMENSIONS", "1024")))
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbeddings(os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings()
+
+
+def get_embeddings():
+    """
+    The shared embeddings instance for the configured backend
+    """
+    return create_embeddings(embedding_backend())
@@ -0,0 +1,196 @@
+"""
+Shared HTTP fetch layer for ingestion.
+
+All source downloads go through one pooled httpx.AsyncClient (keep-alive,
+timeouts, a concurrency limit per host) running on a dedicated event loop
+thread, so both the async routers and the sync ingestion code in worker threads
+share the same connections.
+
+Raw responses are kept gzip-compressed on disk (FETCH_CACHE_DIR). A response
+younger than FETCH_CACHE_TTL seconds is served without touching the network;
+older ones are revalidated with a conditional GET.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import httpx
+
+
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "codementor_fetch_cache"))
+FETCH_CACHE_TTL = float(os.getenv("FETCH_CACHE_TTL", "3600"))
+FETCH_CACHE_MAX_BYTES = int(os.getenv("FETCH_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+PER_HOST_CONCURRENCY = int(os.getenv("FETCH_PER_HOST_CONCURRENCY", "4"))
+FETCH_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+FETCH_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+BLOCK_SIZE = 1 << 16
+USER_AGENT = "Mozilla/5.0 (compatible; CodeMentorIngest/1.0)"
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+# Only touched from the fetcher loop
+_host_limits = defaultdict(lambda: asyncio.Semaphore(PER_HOST_CONCURRENCY))
+
+
+def _fetch_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="fetcher-loop", daemon=True).start()
+    return _loop
+
+
+def _http_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT,
+            limits=FETCH_LIMITS,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+        )
+    return _client
+
+
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(FETCH_CACHE_DIR, f"{key}.gz"), os.path.join(FETCH_CACHE_DIR, f"{key}.json")
+
+
+def _read_meta(url):
+    body_path, meta_path = _cache_paths(url)
+    if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(url, meta):
+    _, meta_path = _cache_paths(url)
+    tmp_path = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _prune_cache():
+    # Drop least recently fetched bodies until the cache fits its byte budget
+    entries, total = [], 0
+    for name in os.listdir(FETCH_CACHE_DIR):
+        if name.endswith(".gz"):
+            path = os.path.join(FETCH_CACHE_DIR, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    for _, size, path in sorted(entries):
+        if total <= FETCH_CACHE_MAX_BYTES:
+            break
+        for stale in (path, path[:-len(".gz")] + ".json"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        total -= size
+
+
+def _result(meta, body_path, from_cache):
+    return {**meta, "path": body_path, "from_cache": from_cache}
+
+
+async def _fetch(url, max_age):
+    os.makedirs(FETCH_CACHE_DIR, exist_ok=True)
+    body_path, _ = _cache_paths(url)
+    meta = _read_meta(url)
+    if meta and time.time() - meta["fetched_at"] <= max_age:
+        return _result(meta, body_path, True)
+
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    async with _host_limits[urlparse(url).netloc]:
+        async with _http_client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and meta:
+                meta["fetched_at"] = time.time()
+                _write_meta(url, meta)
+                os.utime(body_path)
+                return _result(meta, body_path, True)
+            response.raise_for_status()
+
+            tmp_path = f"{body_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+                    async for block in response.aiter_bytes(BLOCK_SIZE):
+                        f.write(block)
+                os.replace(tmp_path, body_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            meta = {
+                "url": url,
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", ""),
+                "encoding": response.charset_encoding,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+            }
+
+    _write_meta(url, meta)
+    _prune_cache()
+    return _result(meta, body_path, False)
+
+
+def fetch_url(url, max_age=None):
+    """
+    Fetch a URL through the shared pool and disk cache (blocking; safe from any thread).
+
+    max_age: serve the cached copy without any request if it is younger than
+    this many seconds (defaults to FETCH_CACHE_TTL; 0 always revalidates).
+    Returns the cached response metadata plus "path" (the gzip body) and "from_cache".
+    """
+    max_age = FETCH_CACHE_TTL if max_age is None else max_age
+    return asyncio.run_coroutine_threadsafe(_fetch(url, max_age), _fetch_loop()).result()
+
+
+async def fetch_url_async(url, max_age=None):
+    max_age = FETCH_CACHE_TTL if max_age is None else max_age
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_fetch(url, max_age), _fetch_loop()))
+
+
+async def prefetch(urls, max_age=None):
+    """
+    Warm the cache for several URLs concurrently (per-host limits still apply)
+    """
+    return await asyncio.gather(*(fetch_url_async(url, max_age) for url in urls), return_exceptions=True)
+
+
+def read_text(result):
+    with gzip.open(result["path"], "rb") as f:
+        raw = f.read()
+    return raw.decode(result.get("encoding") or "utf-8", errors="replace")
+
+
+def copy_body(result, destination):
+    """
+    Decompress the cached body into an open binary file in blocks
+    """
+    with gzip.open(result["path"], "rb") as f:
+        shutil.copyfileobj(f, destination, BLOCK_SIZE)
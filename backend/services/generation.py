@@ -0,0 +1,117 @@
+"""
+Map-reduce question generation for content larger than one prompt.
+
+The content is split into token-sized sections, each section gets its own
+JSON generation call (all running concurrently), and a cheap local merge drops
+near-duplicate questions and picks them round-robin across sections so every
+part of the content is covered. Latency then follows the largest section
+instead of the total content size.
+"""
+import asyncio
+import json
+import math
+import os
+import re
+
+from services.chunking import CodeAwareTextSplitter, count_tokens
+
+
+GENERATION_MODES = ("single", "map_reduce", "auto")
+# Sections are cut to this many tokens; "auto" only maps content larger than one section
+SECTION_TOKENS = int(os.getenv("GENERATION_SECTION_TOKENS", "6000"))
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "8"))
+# Extra questions asked per section so deduplication still leaves enough
+OVERGENERATE = 1.5
+DUPLICATE_SIMILARITY = 0.8
+
+_word_pattern = re.compile(r"\w+")
+
+_section_splitter = CodeAwareTextSplitter(chunk_size=SECTION_TOKENS, chunk_overlap=0)
+
+
+def use_map_reduce(content, mode="auto"):
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode: {mode}")
+    if mode == "auto":
+        return count_tokens(content) > SECTION_TOKENS
+    return mode == "map_reduce"
+
+
+def split_sections(content):
+    return _section_splitter.split_text(content) or [content]
+
+
+def section_counts(sections, count):
+    """
+    Questions to request from each section: proportional to its size, at least one
+    """
+    sizes = [count_tokens(section) for section in sections]
+    total = sum(sizes) or 1
+    return [max(1, math.ceil(count * OVERGENERATE * size / total)) for size in sizes]
+
+
+def _words(text):
+    return frozenset(_word_pattern.findall(text.lower()))
+
+
+def _is_duplicate(words, kept_words):
+    for other in kept_words:
+        union = len(words | other)
+        if union and len(words & other) / union >= DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+def merge_questions(section_questions, count, text_key="question"):
+    """
+    Drop near-duplicates (word Jaccard) and pick up to count questions
+    round-robin across sections, keeping each section's own order
+    """
+    merged, kept_words = [], []
+    queues = [list(questions) for questions in section_questions]
+    while len(merged) < count and any(queues):
+        for queue in queues:
+            while queue:
+                question = queue.pop(0)
+                words = _words(str(question.get(text_key, "")))
+                if words and not _is_duplicate(words, kept_words):
+                    merged.append(question)
+                    kept_words.append(words)
+                    break
+            if len(merged) >= count:
+                break
+    return merged
+
+
+async def map_reduce_generate(llm, content, count, build_prompt, result_key, text_key="question"):
+    """
+    Generate count items for content section by section.
+
+    build_prompt(section, section_count) returns the prompt for one section; the
+    model must answer with a JSON object holding the items under result_key.
+    Sections whose call fails are skipped unless every section fails.
+    """
+    sections = split_sections(content)
+    counts = section_counts(sections, count)
+    limit = asyncio.Semaphore(GENERATION_CONCURRENCY)
+
+    async def generate(section, section_count):
+        async with limit:
+            response = await llm.ainvoke(
+                build_prompt(section, section_count),
+                response_format={"type": "json_object"},
+            )
+        return json.loads(response.content).get(result_key, [])
+
+    results = await asyncio.gather(
+        *(generate(section, section_count) for section, section_count in zip(sections, counts)),
+        return_exceptions=True,
+    )
+    failures = [result for result in results if isinstance(result, Exception)]
+    for failure in failures:
+        print(f"Debug - Section generation failed: {str(failure)}")
+    if len(failures) == len(results):
+        raise failures[0]
+
+    section_questions = [result for result in results if not isinstance(result, Exception)]
+    return merge_questions(section_questions, count, text_key)
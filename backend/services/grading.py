@@ -0,0 +1,204 @@
+"""
+Server-side exam grading.
+
+Grades many submissions at once: every section is laid out as a padded
+(submissions x questions) array, so MCQs are one vectorized comparison
+against the answer key and the section and weighted totals are array sums.
+The result for each submission is the ScoreRecord structure stored with exam
+results (mcq / shortAnswer / coding / total, each earned / total / percentage).
+
+- MCQ: one point per question whose answer equals the key.
+- Short answer: one point per question, like the exam page has always
+  counted them. Blank answers score 0 and answers that match the reference
+  answer (ignoring case, whitespace and punctuation) score the full point
+  without a model call; the rest score the pointsEarned of their model
+  evaluation out of SHORT_ANSWER_EVALUATION_POINTS (what the exam page asks
+  the evaluation to grade each question out of).
+- Coding: a fraction of CODING_POINTS equal to the share of test cases passed
+  when testResults is present, otherwise the exam page's heuristic (enough
+  code, and output without an error). Blank solutions score 0.
+
+Section weights scale each section's earned and total points before they are
+summed into the total, so the default (all 1) is the plain sum of points.
+
+The answer key, evaluations and test results are graded as submitted: this
+keeps the sections and the total consistent, it does not verify them.
+"""
+import os
+import re
+
+import numpy as np
+
+
+SHORT_ANSWER_POINTS = 1.0
+SHORT_ANSWER_EVALUATION_POINTS = float(os.getenv("EXAM_SHORT_ANSWER_EVALUATION_POINTS", "10"))
+CODING_POINTS = 1.0
+# A solution shorter than this gets at most half the coding points without test results
+CODING_MIN_LENGTH = 100
+SECTIONS = ("mcq", "shortAnswer", "coding")
+DEFAULT_WEIGHTS = {section: 1.0 for section in SECTIONS}
+
+_punctuation = re.compile(r"[^\w\s]")
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_answer(text):
+    return _whitespace.sub(" ", _punctuation.sub(" ", (text or "").lower())).strip()
+
+
+def _padded(rows, fill, dtype):
+    """
+    Ragged rows as a (len(rows) x longest row) array plus a mask of real entries
+    """
+    width = max((len(row) for row in rows), default=0)
+    values = np.full((len(rows), width), fill, dtype=dtype)
+    mask = np.zeros((len(rows), width), dtype=bool)
+    for index, row in enumerate(rows):
+        values[index, :len(row)] = row
+        mask[index, :len(row)] = True
+    return values, mask
+
+
+def grade_mcq(answers, keys):
+    """
+    answers / keys: one list of option ids per submission.
+    Returns the (submissions x questions) correctness matrix and its mask.
+    """
+    answers, mask = _padded([[answer or "" for answer in row] for row in answers], "", object)
+    keys, _ = _padded([[key or "" for key in row] for row in keys], "", object)
+    # Fixed-width unicode arrays compare element-wise in C
+    answers = answers.astype(str)
+    keys = keys.astype(str)
+    correct = (answers == keys) & (answers != "") & mask
+    return correct, mask
+
+
+def grade_short_answers(questions):
+    """
+    questions: one list of {"userAnswer", "referenceAnswer", "pointsEarned"} per submission.
+    Returns the points matrix, its mask, and a matrix of answers that still
+    need a model evaluation (scored 0 until they have one).
+    """
+    evaluated, mask = _padded([[q.get("pointsEarned") for q in row] for row in questions], np.nan, float)
+    earned = evaluated / SHORT_ANSWER_EVALUATION_POINTS * SHORT_ANSWER_POINTS
+    answers, _ = _padded([[normalize_answer(q.get("userAnswer")) for q in row] for row in questions], "", object)
+    references, _ = _padded([[normalize_answer(q.get("referenceAnswer")) for q in row] for row in questions], "", object)
+    answers = answers.astype(str)
+    references = references.astype(str)
+
+    blank = (answers == "") & mask
+    exact = (answers == references) & ~blank & mask
+    earned = np.where(blank, 0.0, np.where(exact, SHORT_ANSWER_POINTS, earned))
+    pending = np.isnan(earned) & mask
+    earned = np.clip(np.nan_to_num(earned, nan=0.0), 0.0, SHORT_ANSWER_POINTS)
+    return np.where(mask, earned, 0.0), mask, pending
+
+
+def grade_coding(problems):
+    """
+    problems: one list of {"userSolution", "codeOutput", "testResults"} per submission.
+    Returns the points matrix and its mask.
+    """
+    rows = [
+        [
+            (
+                len(p.get("userSolution") or ""),
+                # A blank solution has no error in its output either, but never ran
+                bool((p.get("userSolution") or "").strip()) and "Error" not in (p.get("codeOutput") or ""),
+                (p.get("testResults") or {}).get("passed", np.nan),
+                (p.get("testResults") or {}).get("total", np.nan),
+            )
+            for p in row
+        ]
+        for row in problems
+    ]
+    lengths, mask = _padded([[r[0] for r in row] for row in rows], 0, float)
+    ran, _ = _padded([[r[1] for r in row] for row in rows], False, bool)
+    passed, _ = _padded([[r[2] for r in row] for row in rows], np.nan, float)
+    total, _ = _padded([[r[3] for r in row] for row in rows], np.nan, float)
+
+    heuristic = ((lengths > CODING_MIN_LENGTH).astype(float) + ran) / 2
+    tested = total > 0
+    share = np.divide(passed, total, out=np.zeros_like(passed), where=tested)
+    earned = np.where(tested, share, heuristic) * CODING_POINTS
+    return np.where(mask, earned, 0.0), mask
+
+
+def _sections(earned, possible):
+    percentage = np.divide(earned * 100, possible, out=np.zeros_like(earned), where=possible > 0)
+    return earned, possible, np.round(percentage)
+
+
+def _check_weights(weights):
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    unknown = set(weights) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown section weights: {', '.join(sorted(unknown))}. Use {', '.join(SECTIONS)}.")
+    if any(weight < 0 for weight in weights.values()):
+        raise ValueError("Section weights must not be negative.")
+    return weights
+
+
+def total_score(scores, weights=None):
+    """
+    The weighted "total" ScoreSection for the mcq / shortAnswer / coding sections of a ScoreRecord dict
+    """
+    weights = _check_weights(weights)
+    earned = sum(scores[section]["earned"] * weights[section] for section in SECTIONS)
+    possible = sum(scores[section]["total"] * weights[section] for section in SECTIONS)
+    return {
+        "earned": round(earned, 2),
+        "total": round(possible, 2),
+        "percentage": float(round(earned * 100 / possible)) if possible > 0 else 0.0,
+    }
+
+
+def grade_exams(exams, weights=None):
+    """
+    Grade a cohort of exams given as dicts with mcqQuestions, shortAnswerQuestions
+    and codingProblems (the ExamRecord fields). Returns one
+    {"scores": ScoreRecord dict, "mcqCorrect": [...], "pendingShortAnswers": [...]}
+    per exam, in order.
+    """
+    weights = _check_weights(weights)
+
+    mcq_rows = [exam.get("mcqQuestions") or [] for exam in exams]
+    correct, mcq_mask = grade_mcq(
+        [[q.get("userAnswer") for q in row] for row in mcq_rows],
+        [[q.get("correctAnswer") for q in row] for row in mcq_rows],
+    )
+    short_points, short_mask, pending = grade_short_answers([exam.get("shortAnswerQuestions") or [] for exam in exams])
+    coding_points, coding_mask = grade_coding([exam.get("codingProblems") or [] for exam in exams])
+
+    # (submissions x sections) earned and possible points
+    earned = np.stack([correct.sum(axis=1), short_points.sum(axis=1), coding_points.sum(axis=1)], axis=1).astype(float)
+    possible = np.stack([
+        mcq_mask.sum(axis=1),
+        short_mask.sum(axis=1) * SHORT_ANSWER_POINTS,
+        coding_mask.sum(axis=1) * CODING_POINTS,
+    ], axis=1).astype(float)
+    section_weights = np.array([weights[section] for section in SECTIONS], dtype=float)
+    section_earned, section_possible, section_percentage = _sections(earned, possible)
+    total_earned, total_possible, total_percentage = _sections(earned @ section_weights, possible @ section_weights)
+
+    results = []
+    for index, exam in enumerate(exams):
+        scores = {
+            section: {
+                "earned": round(float(section_earned[index, column]), 2),
+                "total": float(section_possible[index, column]),
+                "percentage": float(section_percentage[index, column]),
+            }
+            for column, section in enumerate(SECTIONS)
+        }
+        scores["total"] = {
+            "earned": round(float(total_earned[index]), 2),
+            "total": round(float(total_possible[index]), 2),
+            "percentage": float(total_percentage[index]),
+        }
+        results.append({
+            "scores": scores,
+            "mcqCorrect": correct[index, :len(mcq_rows[index])].tolist(),
+            "pendingShortAnswers": np.flatnonzero(pending[index]).tolist(),
+        })
+    return results
@@ -0,0 +1,121 @@
+"""
+Change-aware debouncing for /practice/live_tracking.
+
+The frontend asks for a hint as the learner types. The code is reduced to a
+fingerprint that ignores formatting and comments (the AST for Python, a
+comment- and whitespace-stripped token stream otherwise), and the model is
+only called when the fingerprint changed:
+
+- same fingerprint as this session's last hint: the last hint is returned
+- a hint already generated for (problem, fingerprint): returned from the cache
+- otherwise, within MIN_REHINT_SECONDS of the session's last model call: the
+  last hint is returned and the model is not called
+"""
+import ast
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+
+
+MIN_REHINT_SECONDS = float(os.getenv("LIVE_TRACKING_MIN_REHINT_SECONDS", "10"))
+HINT_CACHE_SIZE = int(os.getenv("LIVE_TRACKING_HINT_CACHE_SIZE", "4096"))
+# Sessions idle for longer than this are forgotten, and past MAX_SESSIONS the least recently seen go first
+SESSION_TTL_SECONDS = 3600
+MAX_SESSIONS = int(os.getenv("LIVE_TRACKING_MAX_SESSIONS", "10000"))
+
+# String literals and comments first, so comment markers inside strings survive
+_c_like_tokens = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`|//[^\n]*|/\*.*?\*/|\w+|\S', re.S)
+_python_tokens = re.compile(r'"""(?:\\.|.)*?"""|\'\'\'(?:\\.|.)*?\'\'\'|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|#[^\n]*|\w+|\S', re.S)
+
+
+def _tokens(code, pattern, comment_prefixes):
+    return "\0".join(token for token in pattern.findall(code) if not token.startswith(comment_prefixes))
+
+
+def code_fingerprint(code, language):
+    """
+    Hash of the code that ignores whitespace, comments and formatting
+    """
+    if language.lower() == "python":
+        try:
+            normalized = ast.dump(ast.parse(code))
+        except (SyntaxError, ValueError):
+            # Mid-edit code that does not parse: fall back to the token stream
+            normalized = _tokens(code, _python_tokens, ("#",))
+    else:
+        normalized = _tokens(code, _c_like_tokens, ("//", "/*"))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class HintDebouncer:
+    def __init__(self, min_interval=MIN_REHINT_SECONDS, cache_size=HINT_CACHE_SIZE):
+        self.min_interval = min_interval
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        # session_id -> {"key", "hint", "hinted_at", "seen_at"}, least recently seen first
+        self._sessions = OrderedDict()
+        self.counts = {"model": 0, "unchanged": 0, "cache": 0, "throttled": 0, "local": 0}
+
+    def _prune_sessions(self, now):
+        # Every request moves its session to the end, so the oldest are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if len(self._sessions) <= MAX_SESSIONS and now - session["seen_at"] <= SESSION_TTL_SECONDS:
+                return
+            self._sessions.popitem(last=False)
+
+    def hint(self, session_id, problem, language, code, generate, context=""):
+        """
+        Hint for the learner's current code; generate() is only called when
+        the code changed meaningfully and the session is not throttled.
+        context holds anything else the hint depends on (profile, complexity).
+        Returns (hint, source) with source model, unchanged, cache or throttled.
+        """
+        now = time.time()
+        fingerprint = code_fingerprint(code, language)
+        key = hashlib.sha256(f"{problem}\0{language.lower()}\0{fingerprint}\0{context}".encode("utf-8")).hexdigest()
+        session = self._sessions.get(session_id)
+
+        if session and session["key"] == key:
+            source, hint = "unchanged", session["hint"]
+        elif key in self._cache:
+            self._cache.move_to_end(key)
+            source, hint = "cache", self._cache[key]
+        elif session and now - session["hinted_at"] < self.min_interval:
+            # Keep showing the previous hint; the next request after the interval gets a fresh one
+            self.counts["throttled"] += 1
+            session["seen_at"] = now
+            self._sessions.move_to_end(session_id)
+            return session["hint"], "throttled"
+        else:
+            source, hint = "model", generate()
+            self._cache[key] = hint
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        self.counts[source] += 1
+        hinted_at = now if source == "model" else session["hinted_at"] if session else 0.0
+        self._sessions[session_id] = {"key": key, "hint": hint, "hinted_at": hinted_at, "seen_at": now}
+        self._sessions.move_to_end(session_id)
+        self._prune_sessions(now)
+        return hint, source
+
+    def record_local(self):
+        # Answered by the static checks without reaching the debouncer
+        self.counts["local"] += 1
+
+    def stats(self):
+        requests = sum(self.counts.values())
+        return {
+            **self.counts,
+            "requests": requests,
+            "model_call_rate": round(self.counts["model"] / requests, 4) if requests else 0.0,
+            "cached_hints": len(self._cache),
+            "sessions": len(self._sessions),
+            "min_rehint_seconds": self.min_interval,
+        }
+
+
+hint_debouncer = HintDebouncer()
@@ -0,0 +1,259 @@
+"""
+Source ingestion for the RAG routers.
+
+Every source that goes into a vector store is tracked with its HTTP validators
+(ETag / Last-Modified), a hash of its content and the ids of the chunks
+that were embedded for it. A refresh then uses conditional GETs and only
+upserts / deletes the chunks that actually changed.
+
+PDFs are read from disk and ingested in page windows (PDF_PAGE_WINDOW), so
+memory use does not grow with the size of the document.
+
+VECTOR_STORE_DTYPE picks the store: "float32" is Chroma, "float16" / "int8"
+the quantized NumPy store in services/vectorstore.py.
+"""
+import hashlib
+import os
+import tempfile
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from services.chunking import extract_main_content, strip_repeated_page_lines, strip_site_boilerplate
+from services.embeddings import embedding_backend, get_embeddings
+from services.fetcher import copy_body, fetch_url, read_text
+from services.vectorstore import QUANTIZED_DTYPES, QuantizedVectorStore
+
+
+HASH_BLOCK_SIZE = 1 << 16
+# Pages extracted, split and embedded together when ingesting a PDF
+PDF_PAGE_WINDOW = int(os.getenv("PDF_PAGE_WINDOW", "16"))
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+# Keep float32 vectors on disk to re-score the quantized top candidates exactly
+VECTOR_STORE_RESCORE = os.getenv("VECTOR_STORE_RESCORE", "0") == "1"
+
+# (collection_name, source) -> {"etag", "last_modified", "content_hash", "chunk_ids"}
+source_states = {}
+
+# collection_name -> counter bumped whenever chunks are added or deleted
+collection_versions = {}
+
+
+def splitter_fingerprint(text_splitter):
+    return f"{type(text_splitter).__name__}:{text_splitter._chunk_size}:{text_splitter._chunk_overlap}"
+
+
+def collection_name_for(sources, text_splitter):
+    """
+    Stable collection name for a set of sources, splitter config and embedding
+    backend, so stores (and their source_states) never share a collection
+    """
+    key = "\n".join([splitter_fingerprint(text_splitter)] + sorted(sources))
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return f"sources_{embedding_backend().replace('-', '_')}_{digest}"
+
+
+def _hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _chunk_id(source, text):
+    return _hash_text(f"{source}\n{text}")
+
+
+def _is_remote(source):
+    return source.startswith(("http://", "https://"))
+
+
+def _html_to_documents(url, text, title):
+    # Same shape WebBaseLoader produces, minus navigation / footers / repeated site chrome
+    metadata = {"source": url}
+    if title:
+        metadata["title"] = title
+    return [Document(page_content=strip_site_boilerplate(url, text), metadata=metadata)]
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _body_to_temp(result):
+    # Decompressed copy of a cached PDF for pypdf, which needs a seekable file
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        copy_body(result, tmp)
+    return tmp.name
+
+
+def iter_pdf_windows(path, source, window=None):
+    """
+    Yield the PDF's pages as lists of at most `window` Documents.
+
+    A fresh PdfReader is opened per window so pypdf's object cache is dropped
+    with it, which keeps peak memory flat regardless of page count.
+    """
+    window = window or PDF_PAGE_WINDOW
+    with open(path, "rb") as f:
+        page_count = len(PdfReader(f).pages)
+
+    for start in range(0, page_count, window):
+        with open(path, "rb") as f:
+            reader = PdfReader(f)
+            documents = [
+                Document(
+                    page_content=reader.pages[page].extract_text() or "",
+                    metadata={"source": source, "page": page},
+                )
+                for page in range(start, min(start + window, page_count))
+            ]
+        yield strip_repeated_page_lines(documents)
+
+
+def fetch_source(source, state=None, max_age=None):
+    """
+    Open a source for ingestion. Remote sources go through services/fetcher.py
+    (shared connection pool + disk cache; max_age is passed through to it).
+
+    Returns a dict with the new "validators", the "content_hash" (of the raw PDF
+    bytes, or of the extracted main text for HTML) and "windows", an iterator of
+    Document lists. "windows" is None when the source is known to be unchanged
+    (same ETag / Last-Modified as last time, or an untouched local file). "temp_path" must be removed by the
+    caller once the windows are consumed.
+    """
+    state = state or {}
+
+    if not _is_remote(source):
+        mtime = str(os.path.getmtime(source))
+        loaded = {"validators": {"etag": None, "last_modified": mtime}, "windows": None, "temp_path": None}
+        if state.get("last_modified") != mtime:
+            loaded["content_hash"] = _hash_file(source)
+            loaded["windows"] = iter_pdf_windows(source, source)
+        return loaded
+
+    result = fetch_url(source, max_age=max_age)
+    validators = {"etag": result.get("etag"), "last_modified": result.get("last_modified")}
+    loaded = {"validators": validators, "windows": None, "temp_path": None}
+
+    # Same validators as last ingestion: the server (or a fresh cache entry) says nothing changed
+    if any(validators.values()) and validators == {"etag": state.get("etag"), "last_modified": state.get("last_modified")}:
+        return loaded
+
+    if source.endswith(".pdf") or "application/pdf" in result.get("content_type", ""):
+        loaded["temp_path"] = _body_to_temp(result)
+        loaded["content_hash"] = _hash_file(loaded["temp_path"])
+        loaded["windows"] = iter_pdf_windows(loaded["temp_path"], source)
+    else:
+        text, title = extract_main_content(read_text(result))
+        # Hashed before strip_site_boilerplate: what that drops depends on which other pages
+        # of the site were ingested, so an unchanged page would otherwise look changed
+        loaded["content_hash"] = _hash_text(text)
+        loaded["windows"] = iter([_html_to_documents(source, text, title)])
+    return loaded
+
+
+def _split_unique(source, documents, text_splitter):
+    chunks = {}
+    for chunk in text_splitter.split_documents(documents):
+        chunks.setdefault(_chunk_id(source, chunk.page_content), chunk)
+    return chunks
+
+
+def sync_source(vectorstore, source, text_splitter, force=False, on_progress=None, max_age=None):
+    """
+    Bring one source in the vector store up to date.
+
+    The source is processed one window at a time (a page window for PDFs, the
+    whole page for HTML): each window is split and its new chunks are embedded
+    and flushed to the store before the next one is read. Chunks that disappeared
+    from the source are deleted at the end. on_progress(chunk_count) is called
+    after every window. Returns a small stats dict.
+    """
+    collection_name = collection_name_of(vectorstore)
+    key = (collection_name, source)
+    state = source_states.get(key, {})
+    if force:
+        state = {"chunk_ids": state.get("chunk_ids", [])}
+    old_ids = set(state.get("chunk_ids", []))
+
+    loaded = fetch_source(source, state, max_age)
+    try:
+        if loaded["windows"] is None:
+            return {"source": source, "status": "not_modified", "chunks": len(old_ids), "added": 0, "removed": 0}
+
+        if not force and state.get("content_hash") == loaded["content_hash"]:
+            source_states[key] = {**state, **loaded["validators"]}
+            return {"source": source, "status": "unchanged", "chunks": len(old_ids), "added": 0, "removed": 0}
+
+        # Only chunk ids are kept across windows, never the chunks themselves
+        seen_ids = {}
+        added = 0
+        for documents in loaded["windows"]:
+            chunks = _split_unique(source, documents, text_splitter)
+            added_ids = [chunk_id for chunk_id in chunks if chunk_id not in old_ids and chunk_id not in seen_ids]
+            seen_ids.update(dict.fromkeys(chunks))
+            if added_ids:
+                vectorstore.add_documents([chunks[chunk_id] for chunk_id in added_ids], ids=added_ids)
+                added += len(added_ids)
+            if on_progress is not None:
+                on_progress(len(seen_ids))
+    finally:
+        if loaded.get("temp_path"):
+            os.remove(loaded["temp_path"])
+
+    removed_ids = list(old_ids - seen_ids.keys())
+    if removed_ids:
+        vectorstore.delete(ids=removed_ids)
+    if added or removed_ids:
+        collection_versions[collection_name] = collection_versions.get(collection_name, 0) + 1
+
+    source_states[key] = {
+        **loaded["validators"],
+        "content_hash": loaded["content_hash"],
+        "chunk_ids": list(seen_ids),
+    }
+    return {
+        "source": source,
+        "status": "updated" if old_ids else "created",
+        "chunks": len(seen_ids),
+        "added": added,
+        "removed": len(removed_ids),
+    }
+
+
+def create_vectorstore(sources, text_splitter):
+    """
+    Empty vector store whose collection belongs to the given sources and splitter
+    """
+    if VECTOR_STORE_DTYPE in QUANTIZED_DTYPES:
+        return QuantizedVectorStore(
+            collection_name=collection_name_for(sources, text_splitter),
+            embedding_function=get_embeddings(),
+            dtype=VECTOR_STORE_DTYPE,
+            rescore=VECTOR_STORE_RESCORE,
+        )
+    if VECTOR_STORE_DTYPE != "float32":
+        raise ValueError(f"Unsupported VECTOR_STORE_DTYPE: {VECTOR_STORE_DTYPE}")
+    return Chroma(
+        collection_name=collection_name_for(sources, text_splitter),
+        embedding_function=get_embeddings(),
+    )
+
+
+def collection_name_of(vectorstore):
+    if isinstance(vectorstore, QuantizedVectorStore):
+        return vectorstore.collection_name
+    return vectorstore._collection.name
+
+
+def build_vectorstore(sources, text_splitter):
+    """
+    Create a vector store for the given sources and ingest all of them
+    """
+    vectorstore = create_vectorstore(sources, text_splitter)
+    for source in sources:
+        sync_source(vectorstore, source, text_splitter, force=True)
+    return vectorstore
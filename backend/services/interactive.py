@@ -0,0 +1,234 @@
+"""
+Interactive execution sessions for /practice (the WebSocket endpoint).
+
+The program runs under the same sandbox as /practice/execute: the Python worker
+pool, the limiting launcher for node / java, rlimits, scrubbed environment and
+capped output. But stdin stays open, and stdout/stderr are forwarded as they
+are produced instead of being collected at the end. A session holds one of the
+INTERACTIVE_SESSIONS slots of interactive_scheduler (not an execution slot)
+while it runs, so it is killed after INTERACTIVE_IDLE_TIMEOUT seconds without
+input or output and after INTERACTIVE_MAX_SECONDS in total.
+
+Client -> server: {"type": "stdin", "data": "..."}, {"type": "eof"}, {"type": "kill"}
+Server -> client: {"type": "stdout" | "stderr", "data": "..."}, then one
+{"type": "exit", "returncode", "reason", "execution_time", ...}
+"""
+import asyncio
+import codecs
+import json
+import os
+import shutil
+import time
+
+from services.java_runner import _javac, compiled_classes, java_class_name
+from services.sandbox import (
+    JAVA_CMD,
+    JAVAC_CMD,
+    NODE_CMD,
+    OUTPUT_LIMIT_BYTES,
+    READ_BLOCK_SIZE,
+    SANDBOX_LIMITS,
+    _kill_group,
+    _make_temp_dir,
+    _read_usage,
+    _signal_message,
+    launch_process,
+    limits_for,
+    python_pool,
+)
+from services.scheduler import interactive_scheduler
+
+
+INTERACTIVE_IDLE_TIMEOUT = float(os.getenv("INTERACTIVE_IDLE_TIMEOUT", "30"))
+INTERACTIVE_MAX_SECONDS = float(os.getenv("INTERACTIVE_MAX_SECONDS", "300"))
+INPUT_LIMIT_BYTES = OUTPUT_LIMIT_BYTES
+
+EXIT_MESSAGES = {
+    "session_limit": f"Session closed after {INTERACTIVE_MAX_SECONDS:g} seconds.",
+    "output_limit": f"Output truncated (limit {OUTPUT_LIMIT_BYTES // 1024} KB per stream); program stopped.",
+    "input_limit": f"Input limit exceeded ({INPUT_LIMIT_BYTES // 1024} KB); program stopped.",
+    "killed": "Program stopped.",
+}
+
+
+class InteractiveStartError(Exception):
+    pass
+
+
+async def _start_python(code):
+    process, temp_dir, usage_fd = await python_pool.acquire()
+    source = code.encode("utf-8")
+    header = json.dumps({"code_length": len(source), "limits": limits_for("python")})
+    # Unlike run(), stdin is left open: the rest of it is the program's input
+    process.stdin.write(header.encode("utf-8") + b"\n" + source)
+    await process.stdin.drain()
+    return process, temp_dir, usage_fd
+
+
+async def _start_javascript(code):
+    if NODE_CMD is None:
+        raise InteractiveStartError("Error: Node.js not found. Please install Node.js to execute JavaScript code.")
+    temp_dir = _make_temp_dir()
+    try:
+        file_path = temp_dir / "code.js"
+        with open(file_path, "w") as f:
+            f.write(code)
+        command = [NODE_CMD, f"--max-old-space-size={SANDBOX_LIMITS['memory_mb']}", str(file_path)]
+        process, usage_fd = await launch_process(command, temp_dir, limits_for("javascript"))
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return process, temp_dir, usage_fd
+
+
+async def _start_java(code):
+    if JAVA_CMD is None or JAVAC_CMD is None:
+        raise InteractiveStartError("Error: Java not found. Please install Java to execute Java code.")
+    class_name = java_class_name(code)
+    class_dir, error = await compiled_classes(code, class_name, _javac)
+    if error is not None:
+        raise InteractiveStartError(f"Compilation Error: {error}")
+    temp_dir = _make_temp_dir()
+    try:
+        command = [JAVA_CMD, f"-Xmx{SANDBOX_LIMITS['memory_mb']}m", "-XX:+UseSerialGC", "-cp", class_dir, class_name]
+        process, usage_fd = await launch_process(command, temp_dir, limits_for("java"))
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return process, temp_dir, usage_fd
+
+
+STARTERS = {
+    "python": _start_python,
+    "javascript": _start_javascript,
+    "java": _start_java,
+}
+
+
+async def run_interactive(code, language, send, receive, user=None, idle_timeout=INTERACTIVE_IDLE_TIMEOUT):
+    """
+    Run code as an interactive session.
+
+    send(message) is awaited for every message to the client and receive()
+    returns the client's next message. An exception from receive() (e.g. the
+    client disconnecting) kills the program and is re-raised after cleanup.
+    Raises ValueError for empty code or an unsupported language and
+    ExecutionQueueFull when no interactive session slot is free.
+    """
+    if not code.strip():
+        raise ValueError("Code cannot be empty")
+    starter = STARTERS.get(language.lower())
+    if starter is None:
+        raise ValueError(f"Unsupported language: {language}. Supported languages are Python, JavaScript, and Java.")
+
+    async with interactive_scheduler.slot(user):
+        try:
+            process, temp_dir, usage_fd = await starter(code)
+        except InteractiveStartError as e:
+            await send({"type": "exit", "returncode": None, "reason": "start_failed", "message": str(e)})
+            return
+
+        start_time = time.monotonic()
+        last_activity = start_time
+        reason = None
+        client_error = None
+
+        def stop(why):
+            nonlocal reason
+            reason = reason or why
+            _kill_group(process)
+
+        async def forward(stream, kind):
+            nonlocal last_activity
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            sent = 0
+            while True:
+                block = await stream.read(READ_BLOCK_SIZE)
+                if not block:
+                    text = decoder.decode(b"", final=True)
+                    if text:
+                        await send({"type": kind, "data": text})
+                    return
+                if sent + len(block) > OUTPUT_LIMIT_BYTES:
+                    block = block[:OUTPUT_LIMIT_BYTES - sent]
+                    stop("output_limit")
+                sent += len(block)
+                last_activity = time.monotonic()
+                text = decoder.decode(block)
+                if text:
+                    await send({"type": kind, "data": text})
+                if reason == "output_limit":
+                    return
+
+        async def feed():
+            nonlocal last_activity, client_error
+            received = 0
+            try:
+                while True:
+                    message = await receive()
+                    kind = message.get("type") if isinstance(message, dict) else None
+                    if kind == "stdin":
+                        data = str(message.get("data", "")).encode("utf-8")
+                        received += len(data)
+                        if received > INPUT_LIMIT_BYTES:
+                            stop("input_limit")
+                            return
+                        last_activity = time.monotonic()
+                        if not process.stdin.is_closing():
+                            process.stdin.write(data)
+                            await process.stdin.drain()
+                    elif kind == "eof":
+                        process.stdin.close()
+                    elif kind == "kill":
+                        stop("killed")
+                        return
+            except (BrokenPipeError, ConnectionResetError):
+                # The program exited before reading everything
+                return
+            except Exception as e:
+                client_error = e
+                stop("disconnected")
+
+        async def watchdog():
+            while True:
+                await asyncio.sleep(min(1.0, idle_timeout))
+                now = time.monotonic()
+                if now - last_activity > idle_timeout:
+                    stop("idle_timeout")
+                elif now - start_time > INTERACTIVE_MAX_SECONDS:
+                    stop("session_limit")
+
+        feeder = asyncio.create_task(feed())
+        guard = asyncio.create_task(watchdog())
+        try:
+            await asyncio.gather(forward(process.stdout, "stdout"), forward(process.stderr, "stderr"))
+            await process.wait()
+        finally:
+            feeder.cancel()
+            guard.cancel()
+            if process.returncode is None:
+                _kill_group(process)
+                await process.wait()
+            usage = _read_usage(usage_fd)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        if client_error is not None:
+            raise client_error
+        returncode = process.returncode
+        if reason == "idle_timeout":
+            message = f"Session closed after {idle_timeout:g} seconds without input or output."
+        else:
+            message = EXIT_MESSAGES.get(reason) or (returncode and _signal_message(returncode)) or None
+        exit_message = {
+            "type": "exit",
+            "returncode": returncode,
+            "reason": reason or "exited",
+            "message": message,
+            "execution_time": f"{time.monotonic() - start_time:.3f}s",
+        }
+        if usage:
+            if usage.get("peak_memory_kb") is not None:
+                exit_message["peak_memory_kb"] = usage["peak_memory_kb"]
+            exit_message["cpu_time"] = f"{usage['cpu_time']:.3f}s"
+        print(f"Debug - Interactive session ended: {reason or 'exited'} (exit code {returncode})")
+        await send(exit_message)
@@ -0,0 +1,215 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.management.ManagementFactory;
+import java.lang.management.ThreadMXBean;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Paths;
+import java.util.Arrays;
+import java.util.Base64;
+import java.util.Locale;
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+/**
+ * Long-lived JVM for /practice Java submissions, driven by services/sandbox.py.
+ *
+ * One tab-separated request per line on stdin, one response line on stdout:
+ *   nonce COMPILE source-file output-dir
+ *       -> nonce OK | nonce ERROR b64-diagnostics
+ *   nonce RUN class-dir class-name timeout-ms b64-stdin
+ *       -> nonce DONE exit-code cpu-ns truncated dirty b64-stdout b64-stderr | nonce TIMEOUT
+ *
+ * Every run loads the submission through its own class loader. If user code
+ * calls System.exit, the run's shutdown hook answers nonce EXIT truncated
+ * b64-stdout b64-stderr and the JVM exits with the user's status.
+ *
+ * User code can still write to file descriptor 1, so every response starts
+ * with the request's nonce. The nonce only lives in locals and in the run's
+ * shutdown hook, neither of which user code can reach; a line without it is
+ * a forged response and the caller kills this JVM.
+ */
+public class JavaRunner {
+    static final int OUTPUT_LIMIT = Integer.getInteger("sandbox.outputLimit", 64 * 1024);
+    static final PrintStream protocol =
+        new PrintStream(new FileOutputStream(FileDescriptor.out), true, StandardCharsets.UTF_8);
+    static final PrintStream sink = new PrintStream(OutputStream.nullOutputStream());
+
+    /** Thrown into user code once it has printed more than OUTPUT_LIMIT bytes. */
+    static class OutputLimitExceeded extends Error {
+        OutputLimitExceeded() {
+            super("output limit exceeded", null, false, false);
+        }
+    }
+
+    static class CappedBuffer extends OutputStream {
+        final ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+        volatile boolean truncated = false;
+
+        @Override
+        public synchronized void write(int b) {
+            write(new byte[] {(byte) b}, 0, 1);
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            int room = OUTPUT_LIMIT - bytes.size();
+            if (len > room) {
+                bytes.write(b, off, Math.max(room, 0));
+                truncated = true;
+                throw new OutputLimitExceeded();
+            }
+            bytes.write(b, off, len);
+        }
+
+        synchronized String encoded() {
+            return Base64.getEncoder().encodeToString(bytes.toByteArray());
+        }
+    }
+
+    static String encode(String text) {
+        return Base64.getEncoder().encodeToString(text.getBytes(StandardCharsets.UTF_8));
+    }
+
+    static String flag(boolean value) {
+        return value ? "1" : "0";
+    }
+
+    static String compile(String source, String outputDir) throws IOException {
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            return "ERROR\t" + encode("No Java compiler available in this JVM.");
+        }
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        try (StandardJavaFileManager files =
+                 compiler.getStandardFileManager(diagnostics, Locale.ROOT, StandardCharsets.UTF_8)) {
+            boolean compiled = compiler.getTask(
+                null, files, diagnostics,
+                Arrays.asList("-d", outputDir, "-proc:none", "-encoding", "UTF-8"),
+                null, files.getJavaFileObjects(source)
+            ).call();
+            if (compiled) {
+                return "OK";
+            }
+            // Same shape as javac's own output: File.java:3: error: message
+            StringBuilder report = new StringBuilder();
+            for (Diagnostic<? extends JavaFileObject> diagnostic : diagnostics.getDiagnostics()) {
+                if (diagnostic.getSource() != null) {
+                    report.append(Paths.get(diagnostic.getSource().toUri()).getFileName())
+                        .append(':').append(diagnostic.getLineNumber()).append(": ");
+                }
+                report.append(diagnostic.getKind().toString().toLowerCase(Locale.ROOT)).append(": ")
+                    .append(diagnostic.getMessage(Locale.ROOT)).append('\n');
+            }
+            return "ERROR\t" + encode(report.toString());
+        }
+    }
+
+    static void reply(String nonce, String response) {
+        synchronized (protocol) {
+            protocol.println(nonce + "\t" + response);
+        }
+    }
+
+    static String run(String nonce, String classDir, String className, long timeoutMs, String stdin) throws Exception {
+        CappedBuffer out = new CappedBuffer();
+        CappedBuffer err = new CappedBuffer();
+        PrintStream userOut = new PrintStream(out, true, StandardCharsets.UTF_8);
+        PrintStream userErr = new PrintStream(err, true, StandardCharsets.UTF_8);
+        int[] exitCode = {0};
+        long[] cpuNanos = {0};
+
+        URLClassLoader loader = new URLClassLoader(
+            new URL[] {Paths.get(classDir).toUri().toURL()}, ClassLoader.getPlatformClassLoader());
+        ThreadGroup group = new ThreadGroup("submission");
+        Thread main = new Thread(group, () -> {
+            ThreadMXBean threads = ManagementFactory.getThreadMXBean();
+            long start = threads.getCurrentThreadCpuTime();
+            try {
+                Method entry = Class.forName(className, true, loader).getMethod("main", String[].class);
+                entry.invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException error) {
+                if (!(error.getCause() instanceof OutputLimitExceeded)) {
+                    userErr.print("Exception in thread \"main\" ");
+                    error.getCause().printStackTrace(userErr);
+                    exitCode[0] = 1;
+                }
+            } catch (OutputLimitExceeded error) {
+                // Reported through the truncated flag
+            } catch (Throwable error) {
+                userErr.println("Error: " + error);
+                exitCode[0] = 1;
+            } finally {
+                cpuNanos[0] = threads.getCurrentThreadCpuTime() - start;
+            }
+        }, "main");
+        main.setContextClassLoader(loader);
+        Thread exitHook = new Thread(() -> reply(nonce,
+            String.join("\t", "EXIT", flag(out.truncated || err.truncated), out.encoded(), err.encoded())));
+
+        Runtime.getRuntime().addShutdownHook(exitHook);
+        System.setIn(new ByteArrayInputStream(Base64.getDecoder().decode(stdin)));
+        System.setOut(userOut);
+        System.setErr(userErr);
+        try {
+            main.start();
+            main.join(timeoutMs);
+        } finally {
+            System.setOut(sink);
+            System.setErr(sink);
+            try {
+                Runtime.getRuntime().removeShutdownHook(exitHook);
+            } catch (IllegalStateException shuttingDown) {
+                // System.exit from a leftover thread: the hook answers for this run
+            }
+        }
+        if (main.isAlive()) {
+            // The thread cannot be stopped safely: the caller kills this JVM
+            return "TIMEOUT";
+        }
+        // Threads the submission left running would outlive the run
+        boolean dirty = group.activeCount() > 0;
+        loader.close();
+
+        return String.join("\t", "DONE", Integer.toString(exitCode[0]), Long.toString(cpuNanos[0]),
+            flag(out.truncated || err.truncated), flag(dirty), out.encoded(), err.encoded());
+    }
+
+    public static void main(String[] args) throws IOException {
+        BufferedReader requests = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        System.setOut(sink);
+
+        String line;
+        while ((line = requests.readLine()) != null) {
+            String[] parts = line.split("\t", -1);
+            String nonce = parts[0];
+            String response;
+            try {
+                if ("COMPILE".equals(parts[1])) {
+                    response = compile(parts[2], parts[3]);
+                } else if ("RUN".equals(parts[1])) {
+                    response = run(nonce, parts[2], parts[3], Long.parseLong(parts[4]), parts[5]);
+                } else {
+                    response = "ERROR\t" + encode("Unknown request: " + parts[1]);
+                }
+            } catch (Throwable error) {
+                response = "ERROR\t" + encode(error.toString());
+            }
+            reply(nonce, response);
+        }
+    }
+}
@@ -0,0 +1,408 @@
+"""
+Java execution for /practice: compiled-class cache and warm JVM workers.
+
+Compiled classes are cached on disk by a hash of the source, so running the
+same submission again (Run, then Submit, then a test case run) skips
+compilation entirely.
+
+With JAVA_EXECUTION_MODE=warm (the default) submissions run in long-lived JVMs
+(services/java/JavaRunner.java). The runner compiles in-process through
+javax.tools, loads every submission with its own class loader, captures its
+output in capped buffers, and runs it on a watchdog-timed thread. A worker is
+replaced after JAVA_WORKER_MAX_RUNS runs, after a timeout, when user code calls
+System.exit, and when a submission leaves threads running. Every response
+carries the request's random nonce, so output that user code writes straight
+to file descriptor 1 cannot pass for a response; a worker that sends one is
+killed. The worker's working directory is emptied after every run. If no
+worker can be started (or compile), runs fall back to cold javac + java
+processes; once user code has run, its result is reported and never retried.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from services.sandbox import (
+    EXECUTION_TIMEOUT,
+    JAVA_CMD,
+    JAVAC_CMD,
+    JAVAC_TIMEOUT,
+    OUTPUT_LIMIT_BYTES,
+    SANDBOX_LIMITS,
+    _kill_group,
+    _make_temp_dir,
+    execution_result,
+    launch_process,
+    limits_for,
+    run_process,
+)
+
+
+JAVA_EXECUTION_MODE = os.getenv("JAVA_EXECUTION_MODE", "warm")  # warm | cold
+JAVA_CLASS_CACHE_DIR = os.getenv("JAVA_CLASS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "codementor_java_classes"))
+JAVA_CLASS_CACHE_MAX_ENTRIES = int(os.getenv("JAVA_CLASS_CACHE_MAX_ENTRIES", "1000"))
+JAVA_WORKERS = int(os.getenv("JAVA_WORKERS", "2"))
+JAVA_WORKER_MAX_RUNS = int(os.getenv("JAVA_WORKER_MAX_RUNS", "100"))
+JAVA_WORKER_HEAP_MB = int(os.getenv("JAVA_WORKER_HEAP_MB", "512"))
+# A worker serves many runs, so its CPU rlimit is a backstop, not a per-run limit
+JAVA_WORKER_CPU_SECONDS = 3600
+JAVA_WORKER_START_TIMEOUT = 30
+
+RUNNER_SOURCE = Path(__file__).parent / "java" / "JavaRunner.java"
+
+_runner_lock = None
+_runner_dir = None
+
+
+class JavaWorkerError(Exception):
+    pass
+
+
+class JavaWorkerExited(JavaWorkerError):
+    pass
+
+
+def _clear_dir(path):
+    # The JVM's working directory cannot change, so it is emptied instead of replaced
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+def java_class_name(code):
+    class_match = re.search(r"public\s+class\s+(\w+)", code)
+    return class_match.group(1) if class_match else "Main"
+
+
+def _b64(text):
+    return base64.b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def _unb64(text):
+    return base64.b64decode(text).decode("utf-8", errors="replace")
+
+
+def _prune_class_cache():
+    entries = sorted(
+        (entry.stat().st_mtime, entry.path)
+        for entry in os.scandir(JAVA_CLASS_CACHE_DIR)
+        if entry.is_dir() and not entry.name.startswith(("tmp-", "runner-"))
+    )
+    for _, path in entries[:max(0, len(entries) - JAVA_CLASS_CACHE_MAX_ENTRIES)]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+async def compiled_classes(code, class_name, compile_source):
+    """
+    Directory with the compiled classes for code, compiling on a cache miss.
+
+    compile_source(source_path, output_dir) returns None on success or the
+    compiler's error text. Returns (class_dir, error).
+    """
+    key = hashlib.sha256(f"{class_name}\0{code}".encode("utf-8")).hexdigest()
+    class_dir = os.path.join(JAVA_CLASS_CACHE_DIR, key)
+    if os.path.isdir(class_dir):
+        os.utime(class_dir)
+        return class_dir, None
+
+    os.makedirs(JAVA_CLASS_CACHE_DIR, exist_ok=True)
+    work_dir = os.path.join(JAVA_CLASS_CACHE_DIR, f"tmp-{uuid.uuid4().hex}")
+    source_dir, output_dir = os.path.join(work_dir, "src"), os.path.join(work_dir, "classes")
+    os.makedirs(source_dir)
+    os.makedirs(output_dir)
+    try:
+        source_path = os.path.join(source_dir, f"{class_name}.java")
+        with open(source_path, "w") as f:
+            f.write(code)
+        error = await compile_source(source_path, output_dir)
+        if error is not None:
+            return None, error
+        try:
+            os.rename(output_dir, class_dir)
+        except OSError:
+            # Another request compiled the same source first
+            pass
+        _prune_class_cache()
+        return class_dir, None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def _javac(source_path, output_dir):
+    compile_limits = {**limits_for("java"), "cpu_seconds": JAVAC_TIMEOUT}
+    # javac runs no user code, and its output goes to the shared class cache,
+    # which sandboxed programs must not be able to write to
+    compiled = await run_process(
+        [JAVAC_CMD, "-encoding", "UTF-8", "-d", output_dir, source_path],
+        os.path.dirname(source_path), "", JAVAC_TIMEOUT, compile_limits, drop_privileges=False,
+    )
+    if compiled["timed_out"]:
+        return f"Compilation timed out (>{JAVAC_TIMEOUT} seconds)."
+    if compiled["returncode"] != 0:
+        return compiled["stderr"] or compiled["stdout"]
+    return None
+
+
+async def _runner_classes():
+    """
+    Compile JavaRunner.java once (cold javac) into the class cache
+    """
+    global _runner_lock, _runner_dir
+    if _runner_dir is not None:
+        return _runner_dir
+    if _runner_lock is None:
+        _runner_lock = asyncio.Lock()
+    async with _runner_lock:
+        if _runner_dir is None:
+            source = RUNNER_SOURCE.read_text()
+            digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+            runner_dir = os.path.join(JAVA_CLASS_CACHE_DIR, f"runner-{digest}")
+            if not os.path.isdir(runner_dir):
+                os.makedirs(JAVA_CLASS_CACHE_DIR, exist_ok=True)
+                work_dir = os.path.join(JAVA_CLASS_CACHE_DIR, f"tmp-{uuid.uuid4().hex}")
+                os.makedirs(work_dir)
+                try:
+                    error = await _javac(str(RUNNER_SOURCE), work_dir)
+                    if error is not None:
+                        raise JavaWorkerError(f"Could not compile JavaRunner: {error}")
+                    try:
+                        os.rename(work_dir, runner_dir)
+                    except OSError:
+                        pass
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+            _runner_dir = runner_dir
+    return _runner_dir
+
+
+class JavaWorker:
+    """
+    One long-lived JavaRunner JVM; serves one request at a time
+    """
+
+    def __init__(self):
+        self.process = None
+        self.runs = 0
+        self._usage_fd = None
+        self._temp_dir = None
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        runner_dir = await _runner_classes()
+        self._temp_dir = _make_temp_dir()
+        limits = {**limits_for("java"), "cpu_seconds": JAVA_WORKER_CPU_SECONDS}
+        self.process, self._usage_fd = await launch_process(
+            [
+                JAVA_CMD, f"-Xmx{JAVA_WORKER_HEAP_MB}m", "-XX:+UseSerialGC", "-Xshare:auto",
+                f"-Dsandbox.outputLimit={OUTPUT_LIMIT_BYTES}", "-cp", runner_dir, "JavaRunner",
+            ],
+            self._temp_dir, limits,
+            stderr=asyncio.subprocess.DEVNULL,
+            # One response line carries both output buffers, base64 encoded
+            limit=4 * OUTPUT_LIMIT_BYTES + 4096,
+        )
+
+    async def stop(self):
+        if self.process is not None and self.process.returncode is None:
+            _kill_group(self.process)
+            await self.process.wait()
+        if self._usage_fd is not None:
+            os.close(self._usage_fd)
+            self._usage_fd = None
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    async def request(self, *fields, timeout):
+        nonce = secrets.token_hex(16)
+        self.process.stdin.write(("\t".join((nonce, *fields)) + "\n").encode("utf-8"))
+        await self.process.stdin.drain()
+        line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        if not line:
+            raise JavaWorkerExited("Java worker exited unexpectedly.")
+        response = line.decode("utf-8", errors="replace").rstrip("\n").split("\t")
+        if not secrets.compare_digest(response[0], nonce):
+            # Written by user code, not the runner: the real response would answer the next request
+            raise JavaWorkerError("Invalid response from Java worker.")
+        return response[1:]
+
+    async def compile(self, source_path, output_dir):
+        response = await self.request("COMPILE", source_path, output_dir, timeout=JAVAC_TIMEOUT)
+        if response[0] == "OK":
+            return None
+        return _unb64(response[1])
+
+    async def run(self, class_dir, class_name, stdin, timeout):
+        """
+        Run a compiled submission; returns a collect_process-style dict
+        """
+        self.runs += 1
+        run = {"returncode": 0, "stdout": "", "stderr": "", "timed_out": False, "truncated": False, "usage": None}
+        try:
+            response = await self.request(
+                "RUN", class_dir, class_name, str(int(timeout * 1000)), _b64(stdin),
+                timeout=timeout + 2,
+            )
+        except asyncio.TimeoutError:
+            response = ["TIMEOUT"]
+        except JavaWorkerExited:
+            # Runtime.halt or similar in user code: that is this run's exit, not a worker failure
+            await self.process.wait()
+            run.update(
+                returncode=self.process.returncode or 1,
+                stderr="The program stopped the Java runtime before its output could be collected.",
+            )
+            await self.stop()
+            return run
+        except JavaWorkerError as e:
+            # Forged response from user code
+            await self.stop()
+            run.update(returncode=1, stderr=str(e))
+            return run
+        finally:
+            if self._temp_dir is not None:
+                _clear_dir(self._temp_dir)
+
+        if response[0] == "TIMEOUT":
+            await self.stop()
+            run["timed_out"] = True
+        elif response[0] == "EXIT":
+            # System.exit in user code: the JVM is going away with the user's status
+            truncated, stdout, stderr = response[1:4]
+            await self.process.wait()
+            run.update(
+                returncode=self.process.returncode,
+                stdout=_unb64(stdout),
+                stderr=_unb64(stderr),
+                truncated=truncated == "1",
+            )
+            await self.stop()
+        elif response[0] == "DONE":
+            exit_code, cpu_nanos, truncated, dirty, stdout, stderr = response[1:7]
+            run.update(
+                returncode=int(exit_code),
+                stdout=_unb64(stdout),
+                stderr=_unb64(stderr),
+                truncated=truncated == "1",
+                usage={"cpu_time": int(cpu_nanos) / 1e9},
+            )
+            if dirty == "1":
+                await self.stop()
+        else:
+            await self.stop()
+            run.update(returncode=1, stderr=_unb64(response[1]) if len(response) > 1 else "Invalid response from Java worker.")
+        return run
+
+
+class JavaWorkerPool:
+    def __init__(self, size=JAVA_WORKERS):
+        self.size = size
+        self._idle = None
+
+    async def start(self):
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(JavaWorker())
+
+    async def acquire(self):
+        await self.start()
+        worker = await self._idle.get()
+        if not worker.alive:
+            try:
+                await asyncio.wait_for(worker.start(), JAVA_WORKER_START_TIMEOUT)
+            except BaseException:
+                await worker.stop()
+                self._idle.put_nowait(JavaWorker())
+                raise
+        return worker
+
+    def release(self, worker):
+        if worker.alive and worker.runs < JAVA_WORKER_MAX_RUNS:
+            self._idle.put_nowait(worker)
+            return
+        # Recycled: stop it and hand a fresh worker (started lazily) back to the pool
+        asyncio.create_task(worker.stop())
+        self._idle.put_nowait(JavaWorker())
+
+    async def close(self):
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            await self._idle.get_nowait().stop()
+        self._idle = None
+
+
+java_pool = JavaWorkerPool()
+
+
+def _compile_error(error):
+    return {
+        "success": False,
+        "output": f"Compilation Error: {error}",
+    }
+
+
+async def run_java_cold(code, stdin="", timeout=EXECUTION_TIMEOUT):
+    class_name = java_class_name(code)
+    class_dir, error = await compiled_classes(code, class_name, _javac)
+    if error is not None:
+        return _compile_error(error)
+
+    temp_dir = _make_temp_dir()
+    try:
+        command = [JAVA_CMD, f"-Xmx{SANDBOX_LIMITS['memory_mb']}m", "-XX:+UseSerialGC", "-cp", class_dir, class_name]
+        start_time = time.time()
+        run = await run_process(command, temp_dir, stdin, timeout, limits_for("java"))
+        return execution_result(run, time.time() - start_time, timeout)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+async def run_java_warm(code, stdin="", timeout=EXECUTION_TIMEOUT):
+    class_name = java_class_name(code)
+    worker = await java_pool.acquire()
+    try:
+        class_dir, error = await compiled_classes(code, class_name, worker.compile)
+        if error is not None:
+            return _compile_error(error)
+        start_time = time.time()
+        run = await worker.run(class_dir, class_name, stdin, timeout)
+        return execution_result(run, time.time() - start_time, timeout)
+    except BaseException:
+        # Timed out, cancelled (client went away) or broken: never reuse it
+        await worker.stop()
+        raise
+    finally:
+        java_pool.release(worker)
+
+
+async def run_java_submission(code, stdin="", timeout=EXECUTION_TIMEOUT):
+    if JAVA_CMD is None or JAVAC_CMD is None:
+        return {
+            "success": False,
+            "output": "Error: Java not found. Please install Java to execute Java code.",
+        }
+    if JAVA_EXECUTION_MODE == "warm":
+        # Only raised before user code ran (worker start or compile), so nothing runs twice
+        try:
+            return await run_java_warm(code, stdin, timeout)
+        except (JavaWorkerError, OSError, asyncio.TimeoutError) as e:
+            print(f"Debug - Java worker unavailable, running cold: {str(e)}")
+    return await run_java_cold(code, stdin, timeout)
@@ -0,0 +1,210 @@
+"""
+Background ingestion jobs.
+
+Downloading, splitting and embedding runs in a worker thread behind an asyncio
+task, so the request that triggered it can return a job id right away. Jobs
+report per-source progress and chunk counts, and concurrent requests for the
+same sources share one job. Refreshes of already ingested sources (conditional
+fetches, re-embedding only changed chunks) run as jobs the same way.
+"""
+import asyncio
+import os
+import time
+import uuid
+
+from fastapi import HTTPException
+
+from services.fetcher import prefetch
+from services.ingestion import collection_name_for, collection_name_of, create_vectorstore, sync_source
+
+
+# How long a dependent endpoint waits for a running job before failing fast
+JOB_WAIT_SECONDS = float(os.getenv("INGESTION_JOB_WAIT_SECONDS", "20"))
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION_SECONDS = 3600
+
+# job_id -> public job record (what GET /jobs/{job_id} returns)
+ingestion_jobs = {}
+_job_tasks = {}
+_job_callbacks = {}
+# sources key -> job_id, only while the job is queued or running
+_active_jobs = {}
+
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id, job in list(ingestion_jobs.items()):
+        if job["finished_at"] and job["finished_at"] < cutoff:
+            ingestion_jobs.pop(job_id, None)
+            _job_tasks.pop(job_id, None)
+
+
+def _new_job(sources):
+    _prune_jobs()
+    job_id = str(uuid.uuid4())
+    ingestion_jobs[job_id] = {
+        "id": job_id,
+        "status": "queued",
+        "sources": [
+            {"source": source, "status": "pending", "chunks": 0, "added": 0, "removed": 0}
+            for source in sources
+        ],
+        "error": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+    return ingestion_jobs[job_id]
+
+
+async def _sync_sources(job, vectorstores, text_splitter, force, max_age=None):
+    """
+    Sync every source of the job, in order, into its vector store (vectorstores[i] for job["sources"][i])
+    """
+    for entry, vectorstore in zip(job["sources"], vectorstores):
+        entry["status"] = "running"
+        try:
+            stats = await asyncio.to_thread(
+                sync_source, vectorstore, entry["source"], text_splitter, force,
+                lambda chunk_count, entry=entry: entry.update(chunks=chunk_count), max_age,
+            )
+        except Exception:
+            entry["status"] = "failed"
+            raise
+        entry.update(
+            status="done",
+            # created / updated / unchanged / not_modified
+            result=stats["status"],
+            chunks=stats["chunks"],
+            added=stats["added"],
+            removed=stats["removed"],
+        )
+
+
+async def _run_job(job, key, sources, text_splitter):
+    job["status"] = "running"
+    job["started_at"] = time.time()
+    try:
+        # Download every web source concurrently up front; the sequential
+        # split/embed below then reads them from the fetch cache
+        await prefetch([source for source in sources if source.startswith(("http://", "https://"))])
+        vectorstore = await asyncio.to_thread(create_vectorstore, sources, text_splitter)
+        await _sync_sources(job, [vectorstore] * len(sources), text_splitter, True)
+
+        for callback in _job_callbacks.pop(job["id"], []):
+            callback(vectorstore)
+        job["status"] = "done"
+        return vectorstore
+    except Exception as e:
+        print(f"Debug - Ingestion job {job['id']} failed: {str(e)}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+        _job_callbacks.pop(job["id"], None)
+    finally:
+        job["finished_at"] = time.time()
+        _active_jobs.pop(key, None)
+
+
+async def _run_refresh_job(job, key, vectorstores, text_splitter):
+    job["status"] = "running"
+    job["started_at"] = time.time()
+    try:
+        await _sync_sources(job, vectorstores, text_splitter, False, max_age=0)
+        job["status"] = "done"
+    except Exception as e:
+        print(f"Debug - Refresh job {job['id']} failed: {str(e)}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        job["finished_at"] = time.time()
+        _active_jobs.pop(key, None)
+
+
+def start_ingestion_job(sources, text_splitter, on_complete=None):
+    """
+    Start (or join) an ingestion job for the sources and return its record.
+
+    on_complete(vectorstore) runs once the job succeeds; callers joining an
+    already running job get their callback run too.
+    """
+    # Same sources split differently are a different collection, so a different job
+    key = collection_name_for(sources, text_splitter)
+
+    job_id = _active_jobs.get(key)
+    if job_id is None:
+        job_id = _new_job(sources)["id"]
+        _active_jobs[key] = job_id
+        _job_callbacks[job_id] = []
+        _job_tasks[job_id] = asyncio.create_task(_run_job(ingestion_jobs[job_id], key, sources, text_splitter))
+
+    if on_complete is not None:
+        _job_callbacks[job_id].append(on_complete)
+    return ingestion_jobs[job_id]
+
+
+def start_refresh_job(stores, text_splitter):
+    """
+    Start (or join) a job re-checking already ingested sources, given as
+    (source, vectorstore) pairs, and return its record
+    """
+    key = "refresh:" + "\n".join(sorted(f"{collection_name_of(vectorstore)}\t{source}" for source, vectorstore in stores))
+
+    job_id = _active_jobs.get(key)
+    if job_id is None:
+        job = _new_job([source for source, _ in stores])
+        job_id = job["id"]
+        _active_jobs[key] = job_id
+        _job_tasks[job_id] = asyncio.create_task(
+            _run_refresh_job(job, key, [vectorstore for _, vectorstore in stores], text_splitter)
+        )
+    return ingestion_jobs[job_id]
+
+
+async def wait_for_job(job_id, timeout=JOB_WAIT_SECONDS):
+    """
+    Wait up to timeout seconds for a job to finish and return its record
+    """
+    task = _job_tasks.get(job_id)
+    if task is not None and not task.done() and timeout > 0:
+        await asyncio.wait({task}, timeout=timeout)
+    return ingestion_jobs.get(job_id)
+
+
+def raise_for_job(job):
+    """
+    HTTP error for a dependent endpoint whose sources are not ready
+    """
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found.")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Failed to process sources: {job['error']}")
+    raise HTTPException(
+        status_code=503,
+        detail={"message": "Sources are still being processed.", "job": job},
+        headers={"Retry-After": "5"},
+    )
+
+
+async def ensure_vectorstore(cache, url, text_splitter):
+    """
+    Vector store for a website from the router's cache, ingesting it in the
+    background on first use. Raises via raise_for_job when it isn't ready in time.
+    """
+    if url in cache:
+        return cache[url]
+
+    def on_complete(vectorstore):
+        cache[url] = vectorstore
+
+    job = start_ingestion_job([url], text_splitter, on_complete=on_complete)
+    job = await wait_for_job(job["id"])
+    if url not in cache:
+        raise_for_job(job)
+    return cache[url]
+
+
+def refresh_cached_vectorstores(cache, text_splitter):
+    """
+    Refresh job for every website in a router's {url: vectorstore} cache
+    """
+    return start_refresh_job(list(cache.items()), text_splitter)
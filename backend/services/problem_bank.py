@@ -0,0 +1,196 @@
+"""
+Pre-generated practice problems for /practice/create and /practice/modify.
+
+The (topic, language, difficulty) space is small, so problems are generated
+ahead of time into the PracticeProblem table and served from there in a few
+milliseconds. PracticeProblemServe remembers which user got which problem, so
+nobody is given the same problem twice. Whenever a user has BANK_LOW_WATERMARK
+or fewer unseen problems left for a key, the key is queued for a background
+refill; a miss falls back to live generation, and the live problem is added to
+the bank for everyone else.
+"""
+import asyncio
+import os
+import re
+
+from prisma import Prisma
+from prisma.errors import UniqueViolationError
+
+
+BANK_LOW_WATERMARK = int(os.getenv("PROBLEM_BANK_LOW_WATERMARK", "3"))
+BANK_REFILL_BATCH = int(os.getenv("PROBLEM_BANK_REFILL_BATCH", "5"))
+BANK_MAX_PER_KEY = int(os.getenv("PROBLEM_BANK_MAX_PER_KEY", "200"))
+BANK_WORKERS = int(os.getenv("PROBLEM_BANK_WORKERS", "2"))
+# Keys filled at startup: "topic|language|difficulty;topic|language|difficulty"
+BANK_PREFILL = os.getenv("PROBLEM_BANK_PREFILL", "")
+
+DIFFICULTIES = ["Easy", "Medium", "Difficult"]
+# Words a specification may use and still be a plain "a problem on this topic" request
+_generic_words = {
+    "a", "an", "the", "create", "generate", "give", "me", "make", "new", "problem", "problems",
+    "question", "exercise", "practice", "coding", "programming", "on", "about", "for", "in", "level",
+}
+_word_pattern = re.compile(r"\w+")
+_difficulty_steps = {"easier": -1, "easy": -1, "simpler": -1, "harder": 1, "hard": 1, "tougher": 1, "more difficult": 1}
+# Words a user_wants may add to "easier" / "harder" and still be a plain difficulty change
+_shift_filler_words = {"a", "an", "the", "make", "it", "bit", "little", "slightly", "much", "please", "give", "me", "one", "problem", "question"}
+
+
+def bank_key(topic, language, difficulty):
+    return topic.strip(), language.strip().lower(), difficulty.strip().capitalize()
+
+
+def is_generic_specification(specification, topic, difficulty):
+    """
+    Whether the request asks for nothing beyond topic and difficulty (so a bank problem fits)
+    """
+    allowed = _generic_words | set(_word_pattern.findall(f"{topic} {difficulty}".lower()))
+    return set(_word_pattern.findall((specification or "").lower())) <= allowed
+
+
+def shifted_difficulty(difficulty, user_wants):
+    """
+    Difficulty one step easier / harder, or None past either end and when
+    user_wants is anything but a plain easier / harder request
+    """
+    difficulty = difficulty.strip().capitalize()
+    wants = " ".join(word for word in _word_pattern.findall(user_wants.lower()) if word not in _shift_filler_words)
+    step = _difficulty_steps.get(wants)
+    if difficulty not in DIFFICULTIES or step is None:
+        return None
+    index = DIFFICULTIES.index(difficulty) + step
+    return DIFFICULTIES[index] if 0 <= index < len(DIFFICULTIES) else None
+
+
+class ProblemBank:
+    def __init__(self):
+        self._db = None
+        self._connect_lock = asyncio.Lock()
+        self._generate = None
+        self._queue = None
+        self._queued = set()
+        self._workers = []
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failed_refills = 0
+
+    async def _client(self):
+        # One long-lived connection: a per-request connect would cost more than the lookup.
+        # Locked so concurrent first requests do not each connect (and leak) a client
+        if self._db is None:
+            async with self._connect_lock:
+                if self._db is None:
+                    db = Prisma()
+                    await db.connect()
+                    self._db = db
+        return self._db
+
+    async def start(self, generate):
+        """
+        Start the refill workers; generate(topic, language, difficulty) is a
+        blocking call returning the problem text
+        """
+        if self._queue is not None:
+            return
+        self._generate = generate
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._refill_worker()) for _ in range(BANK_WORKERS)]
+        for entry in filter(None, BANK_PREFILL.split(";")):
+            topic, language, difficulty = entry.split("|")
+            self.request_refill(*bank_key(topic, language, difficulty))
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._queue = None
+        self._queued.clear()
+        async with self._connect_lock:
+            if self._db is not None:
+                await self._db.disconnect()
+                self._db = None
+
+    def request_refill(self, topic, language, difficulty):
+        key = (topic, language, difficulty)
+        if self._queue is None or key in self._queued:
+            return
+        self._queued.add(key)
+        self._queue.put_nowait(key)
+
+    async def _refill_worker(self):
+        while True:
+            key = await self._queue.get()
+            try:
+                await self._refill(*key)
+            except Exception as e:
+                self.failed_refills += 1
+                print(f"Debug - Problem bank refill failed for {key}: {str(e)}")
+            finally:
+                self._queued.discard(key)
+
+    async def _refill(self, topic, language, difficulty):
+        db = await self._client()
+        where = {"topic": topic, "language": language, "difficulty": difficulty}
+        room = BANK_MAX_PER_KEY - await db.practiceproblem.count(where=where)
+        for _ in range(min(BANK_REFILL_BATCH, room)):
+            problem = await asyncio.to_thread(self._generate, topic, language, difficulty)
+            await db.practiceproblem.create(data={**where, "problem": problem})
+            self.generated += 1
+        print(f"Debug - Problem bank refilled {topic} / {language} / {difficulty}")
+
+    async def take(self, topic, language, difficulty, user):
+        """
+        An unseen bank problem for user (marked as served), or None on a miss
+        """
+        key = bank_key(topic, language, difficulty)
+        db = await self._client()
+        candidates = await db.practiceproblem.find_many(
+            where={
+                "topic": key[0],
+                "language": key[1],
+                "difficulty": key[2],
+                "servedTo": {"none": {"userId": user}},
+            },
+            order={"createdAt": "asc"},
+            take=BANK_LOW_WATERMARK + 1,
+        )
+        if len(candidates) <= BANK_LOW_WATERMARK:
+            self.request_refill(*key)
+        for candidate in candidates:
+            try:
+                await db.practiceproblemserve.create(data={"userId": user, "problemId": candidate.id})
+            except UniqueViolationError:
+                # A concurrent request from the same user took it first
+                continue
+            self.hits += 1
+            return candidate.problem
+        self.misses += 1
+        return None
+
+    async def add(self, topic, language, difficulty, problem, served_to=None):
+        """
+        Store a live-generated problem, optionally as already served to a user
+        """
+        topic, language, difficulty = bank_key(topic, language, difficulty)
+        db = await self._client()
+        created = await db.practiceproblem.create(
+            data={"topic": topic, "language": language, "difficulty": difficulty, "problem": problem}
+        )
+        if served_to:
+            await db.practiceproblemserve.create(data={"userId": served_to, "problemId": created.id})
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "generated": self.generated,
+            "failed_refills": self.failed_refills,
+            "queued_refills": len(self._queued),
+            "low_watermark": BANK_LOW_WATERMARK,
+        }
+
+
+problem_bank = ProblemBank()
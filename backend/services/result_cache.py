@@ -0,0 +1,264 @@
+"""
+Result cache for deterministic sandbox runs.
+
+Students re-run unchanged code and the same content examples get executed by
+many users, so results are cached in a bounded LRU keyed by (language, runtime
+version, code hash, stdin hash). Only runs that cannot depend on anything but
+their input are cached: a cheap static check rejects code that touches the
+clock, randomness, the network, files, processes or threads (or that can
+reach them indirectly through eval / exec / dynamic imports). Python code may
+only import modules from an allowlist of pure ones. Timeouts and runs killed
+by a resource limit are never cached, as they depend on load.
+"""
+import ast
+import functools
+import hashlib
+import importlib
+import os
+import re
+import subprocess
+import types
+from collections import OrderedDict
+
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "2048"))
+
+# The only modules a cached Python run may use: their results depend on nothing but their arguments
+PYTHON_DETERMINISTIC_MODULES = {
+    "__future__", "abc", "array", "base64", "binascii", "bisect", "cmath", "collections", "collections.abc",
+    "copy", "dataclasses", "decimal", "difflib", "enum", "fractions", "functools", "graphlib", "hashlib",
+    "heapq", "itertools", "json", "keyword", "math", "numbers", "operator", "pprint", "re", "statistics",
+    "string", "struct", "sys", "textwrap", "typing", "unicodedata",
+}
+# sys is limited to the standard streams and a few constants
+PYTHON_SYS_ATTRIBUTES = {
+    "stdin", "stdout", "stderr", "exit", "maxsize", "maxunicode", "float_info", "int_info",
+    "setrecursionlimit", "getrecursionlimit", "set_int_max_str_digits",
+}
+PYTHON_NONDETERMINISTIC_CALLS = {
+    "open", "id", "eval", "exec", "compile", "__import__", "globals", "vars", "breakpoint", "help",
+}
+# Frame and code attributes (generator.gi_frame.f_builtins, ...) reach the builtins and globals
+PYTHON_INTROSPECTION_PREFIXES = ("f_", "gi_", "cr_", "ag_", "tb_", "co_")
+# Only allowed as a direct call with a constant, harmless attribute name
+PYTHON_DYNAMIC_ATTRIBUTE_CALLS = {"getattr", "setattr", "delattr", "hasattr"}
+
+JAVASCRIPT_NONDETERMINISTIC = re.compile(
+    r"\b(Date|Math\.random|performance|fetch|XMLHttpRequest|WebSocket|setTimeout|setInterval|setImmediate"
+    r"|crypto|eval|Function|Worker|process\.(hrtime|env|argv|pid|uptime|memoryUsage|cpuUsage|exit))\b|\bimport\s*\("
+)
+JAVASCRIPT_MODULE = re.compile(r"""\brequire\s*\(\s*['"`]([^'"`]+)['"`]\s*\)|\bfrom\s*['"]([^'"]+)['"]""")
+JAVASCRIPT_DETERMINISTIC_MODULES = {"readline", "util", "assert", "events", "string_decoder", "fs"}
+# fs is only allowed for the usual read-all-of-stdin idiom
+JAVASCRIPT_STDIN_READ = re.compile(r"""readFileSync\s*\(\s*(0|['"]/dev/stdin['"]|process\.stdin\.fd)\s*[,)]""")
+JAVASCRIPT_FS_CALL = re.compile(r"""\b(readFileSync|readFile|writeFile\w*|appendFile\w*|open\w*|readdir\w*|stat\w*"""
+                                r"""|exists\w*|unlink\w*|mkdir\w*|rm\w*|create\w*Stream|promises)\b""")
+JAVA_NONDETERMINISTIC = re.compile(
+    r"\b(System\.(currentTimeMillis|nanoTime|getenv|getProperty|identityHashCode)|Random|ThreadLocalRandom"
+    r"|SecureRandom|Math\.random|UUID|Instant|LocalDate|LocalDateTime|LocalTime|ZonedDateTime|Clock"
+    r"|Thread|Executor\w*|CompletableFuture|Runtime|ProcessBuilder|File\w*|Files|Paths?|Socket\w*"
+    r"|URL\w*|HttpClient|reflect)\b|java\.(io\.File|net|nio\.file)"
+)
+# Default object reprs (Python "at 0x7f...", Java "Node@1b6d3586") change between runs
+OBJECT_ADDRESS = re.compile(r"\b0x[0-9a-fA-F]{6,}\b|@[0-9a-f]{5,}\b")
+
+
+def _module_path_allowed(module, attributes):
+    """
+    Whether module.attribute.attribute... stays inside PYTHON_DETERMINISTIC_MODULES
+    (typing.sys.modules would reach os), resolved on the real modules
+    """
+    if module not in PYTHON_DETERMINISTIC_MODULES:
+        return False
+    value = importlib.import_module(module)
+    for attribute in attributes:
+        if value.__name__ == "sys" and attribute not in PYTHON_SYS_ATTRIBUTES:
+            return False
+        value = getattr(value, attribute, None)
+        if not isinstance(value, types.ModuleType):
+            # Not a module (or unknown, which fails at run time): the other checks take over
+            return True
+        if value.__name__ not in PYTHON_DETERMINISTIC_MODULES:
+            return False
+    return True
+
+
+def _attribute_chain(node):
+    """
+    (root name, [attributes]) of a.b.c, or (None, []) when the chain does not start at a name
+    """
+    attributes = []
+    while isinstance(node, ast.Attribute):
+        attributes.append(node.attr)
+        node = node.value
+    return (node.id, attributes[::-1]) if isinstance(node, ast.Name) else (None, [])
+
+
+def _python_imports_are_pure(tree):
+    # name bound by an import -> the module it refers to
+    modules = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if not _module_path_allowed(alias.name, []):
+                    return False
+                if alias.asname:
+                    modules[alias.asname] = alias.name
+                else:
+                    modules[alias.name.split(".")[0]] = alias.name.split(".")[0]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or not _module_path_allowed(node.module, []):
+                return False
+            for alias in node.names:
+                if alias.name == "*":
+                    if node.module == "sys":
+                        return False
+                    continue
+                if not _module_path_allowed(node.module, [alias.name]):
+                    return False
+                value = getattr(importlib.import_module(node.module), alias.name, None)
+                if isinstance(value, types.ModuleType):
+                    modules[alias.asname or alias.name] = value.__name__
+
+    roots = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            roots.add(id(node.value))
+            name, attributes = _attribute_chain(node)
+            if name in modules and not _module_path_allowed(modules[name], attributes):
+                return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in modules and isinstance(node.ctx, ast.Load) and id(node) not in roots:
+            # m = sys: attributes of the alias could no longer be checked
+            return False
+    return True
+
+
+def _python_is_deterministic(code):
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        # The result is the syntax error itself
+        return True
+    if not _python_imports_are_pure(tree):
+        return False
+    checked_calls = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in PYTHON_DYNAMIC_ATTRIBUTE_CALLS:
+            # getattr(__builtins__, "op" + "en") reaches anything the name checks below reject
+            name = node.args[1] if len(node.args) > 1 else None
+            if not (isinstance(name, ast.Constant) and isinstance(name.value, str)):
+                return False
+            if name.value in PYTHON_NONDETERMINISTIC_CALLS or name.value.startswith("__"):
+                return False
+            checked_calls.add(node.func)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and (node.id in PYTHON_NONDETERMINISTIC_CALLS or node.id == "__builtins__"):
+            return False
+        elif isinstance(node, ast.Name) and node.id in PYTHON_DYNAMIC_ATTRIBUTE_CALLS and node not in checked_calls:
+            # Aliased or passed around (g = getattr), so its arguments cannot be checked
+            return False
+        elif isinstance(node, ast.Attribute) and (node.attr.startswith("__") or node.attr.startswith(PYTHON_INTROSPECTION_PREFIXES)):
+            # Dunder access (__builtins__, __subclasses__, ...) can reach anything
+            return False
+    return True
+
+
+def _javascript_is_deterministic(code):
+    if JAVASCRIPT_NONDETERMINISTIC.search(code):
+        return False
+    modules = {(match.group(1) or match.group(2)).removeprefix("node:") for match in JAVASCRIPT_MODULE.finditer(code)}
+    if not modules <= JAVASCRIPT_DETERMINISTIC_MODULES:
+        return False
+    if "fs" in modules:
+        return len(JAVASCRIPT_FS_CALL.findall(code)) == len(JAVASCRIPT_STDIN_READ.findall(code))
+    return True
+
+
+def is_deterministic(code, language):
+    """
+    Whether a run's result can only depend on (code, stdin)
+    """
+    language = language.lower()
+    if language == "python":
+        return _python_is_deterministic(code)
+    if language == "javascript":
+        return _javascript_is_deterministic(code)
+    if language == "java":
+        return not JAVA_NONDETERMINISTIC.search(code)
+    return False
+
+
+@functools.lru_cache(maxsize=None)
+def runtime_version(command):
+    """
+    Version string of a runtime binary, probed once per command
+    """
+    if command is None:
+        return None
+    flag = "-version" if os.path.basename(command) == "java" else "--version"
+    try:
+        version = subprocess.run([command, flag], capture_output=True, text=True, timeout=5)
+    except Exception as e:
+        print(f"Debug - Runtime version check failed for {command}: {str(e)}")
+        return None
+    return (version.stdout or version.stderr).strip().splitlines()[0] if version.returncode == 0 else None
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cacheable_result(result):
+    if "execution_time" not in result or result.get("timed_out") or result.get("resource_limit"):
+        return False
+    return not OBJECT_ADDRESS.search(result["output"])
+
+
+class ExecutionResultCache:
+    """
+    Bounded LRU of execution results with hit / miss counters
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(language, version, code, stdin):
+        return (language.lower(), version, _digest(code), _digest(stdin))
+
+    def get(self, key):
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return {**result, "cached": True}
+
+    def put(self, key, result):
+        self._entries[key] = dict(result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "uncacheable": self.uncacheable,
+            "evictions": self.evictions,
+        }
+
+
+result_cache = ExecutionResultCache()
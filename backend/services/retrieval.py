@@ -0,0 +1,154 @@
+"""
+Hybrid BM25 + vector retrieval with a token budget on the stuffed context.
+
+The vector store returns fetch_k candidates by similarity, a local BM25 index
+over the same collection returns fetch_k by keyword score, and the two rankings
+are fused with reciprocal rank fusion. The top k fused chunks are then cut down
+to the profile's token budget before they reach create_stuff_documents_chain.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, List
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from services.chunking import count_tokens
+from services.ingestion import collection_name_of, collection_versions
+
+
+# Per-endpoint trade-off between recall and speed
+RETRIEVAL_PROFILES = {
+    "default": {"k": 4, "fetch_k": 20, "token_budget": 2000},
+    "quiz": {"k": 8, "fetch_k": 30, "token_budget": 4000},
+    "topics": {"k": 8, "fetch_k": 30, "token_budget": 4000},
+    "mentor": {"k": 3, "fetch_k": 15, "token_budget": 1500},
+    "tutor": {"k": 4, "fetch_k": 20, "token_budget": 2500},
+}
+
+RRF_K = 60
+
+_token_pattern = re.compile(r"\w+")
+
+# collection name -> (collection version, BM25Index)
+_bm25_cache = {}
+
+
+def tokenize(text):
+    return _token_pattern.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of documents.
+
+    Per-term weights are precomputed at build time, so a query is just a few
+    vectorised scatter-adds into one score array.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = documents
+        tokenized = [tokenize(document.page_content) for document in documents]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        length_norm = k1 * (1 - b + b * lengths / average_length)
+
+        postings = defaultdict(lambda: ([], []))
+        for doc_index, tokens in enumerate(tokenized):
+            for term, frequency in Counter(tokens).items():
+                postings[term][0].append(doc_index)
+                postings[term][1].append(frequency)
+
+        total = len(documents)
+        self.postings = {}
+        for term, (doc_indices, frequencies) in postings.items():
+            doc_indices = np.array(doc_indices, dtype=np.int64)
+            frequencies = np.array(frequencies, dtype=np.float32)
+            idf = math.log(1 + (total - len(doc_indices) + 0.5) / (len(doc_indices) + 0.5))
+            weights = idf * frequencies * (k1 + 1) / (frequencies + length_norm[doc_indices])
+            self.postings[term] = (doc_indices, weights)
+
+    def search(self, query, k):
+        if not self.documents:
+            return []
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self.postings:
+                doc_indices, weights = self.postings[term]
+                scores[doc_indices] += weights
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def get_bm25_index(vectorstore):
+    """
+    BM25 index for the vectorstore's collection, rebuilt only after ingestion changed it
+    """
+    name = collection_name_of(vectorstore)
+    version = collection_versions.get(name, 0)
+    cached = _bm25_cache.get(name)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    stored = vectorstore.get(include=["documents", "metadatas"])
+    documents = [
+        Document(page_content=text, metadata=metadata or {})
+        for text, metadata in zip(stored["documents"], stored["metadatas"])
+    ]
+    index = BM25Index(documents)
+    _bm25_cache[name] = (version, index)
+    return index
+
+
+def _document_key(document):
+    return (document.metadata.get("source"), document.page_content)
+
+
+def fit_token_budget(documents, token_budget):
+    """
+    Keep documents in rank order until the budget is used up (always keep the first)
+    """
+    kept, used = [], 0
+    for document in documents:
+        tokens = count_tokens(document.page_content)
+        if kept and used + tokens > token_budget:
+            break
+        kept.append(document)
+        used += tokens
+    return kept
+
+
+class HybridRetriever(BaseRetriever):
+    vectorstore: Any
+    k: int = 4
+    fetch_k: int = 20
+    token_budget: int = 2000
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vector_hits = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        keyword_hits = [document for document, _ in get_bm25_index(self.vectorstore).search(query, self.fetch_k)]
+
+        # Reciprocal rank fusion: robust to the two score scales being incomparable
+        fused, documents = defaultdict(float), {}
+        for ranking in (vector_hits, keyword_hits):
+            for rank, document in enumerate(ranking):
+                key = _document_key(document)
+                fused[key] += 1.0 / (RRF_K + rank + 1)
+                documents.setdefault(key, document)
+
+        ranked = sorted(fused, key=fused.get, reverse=True)[:self.k]
+        return fit_token_budget([documents[key] for key in ranked], self.token_budget)
+
+
+def get_retriever(vectorstore, profile="default"):
+    if profile not in RETRIEVAL_PROFILES:
+        raise ValueError(f"Unknown retrieval profile: {profile}")
+    return HybridRetriever(vectorstore=vectorstore, **RETRIEVAL_PROFILES[profile])
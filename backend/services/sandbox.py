@@ -0,0 +1,859 @@
+"""
+Code execution sandbox for /practice.
+
+Everything here is asyncio-native: programs run as asyncio subprocesses, so a
+slow submission never blocks the event loop, and cancelling the awaiting task
+(e.g. when the client disconnects) kills the process.
+
+Python submissions run in a pool of pre-started interpreters: each worker
+boots, preloads the commonly used stdlib modules and then blocks on stdin
+waiting for a submission. Running code is just writing it to an idle worker,
+so interpreter startup is off the request path. Every worker runs exactly one
+submission in its own temp directory and exits; the pool starts a replacement
+in the background.
+
+Every run gets rlimits (CPU seconds, address space, file size, processes, open
+files), a scrubbed environment, and stdout/stderr capped while they are read:
+a run that prints past OUTPUT_LIMIT_BYTES is killed and its output truncated.
+When the API runs as root, user code runs as SANDBOX_USER instead, so it cannot
+raise its hard limits again and is held to RLIMIT_NPROC. Peak memory and CPU
+time are reported back over a pipe by a trusted parent that wait4()s the user
+program (the Python worker forks one, the launcher runs node / java); the user
+program never holds the pipe.
+"""
+import asyncio
+import json
+import os
+import pwd
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from services.result_cache import cacheable_result, is_deterministic, result_cache, runtime_version
+from services.scheduler import ExecutionQueueFull, execution_scheduler
+
+
+EXECUTION_TIMEOUT = 5
+JAVAC_TIMEOUT = 15
+PYTHON_POOL_SIZE = int(os.getenv("PYTHON_POOL_SIZE", "4"))
+
+# Per-run resource limits. RLIMIT_NPROC counts every process of the user the
+# code runs as (SANDBOX_USER when the API is root), across concurrent runs.
+SANDBOX_LIMITS = {
+    "cpu_seconds": int(os.getenv("SANDBOX_CPU_SECONDS", str(EXECUTION_TIMEOUT))),
+    "memory_mb": int(os.getenv("SANDBOX_MEMORY_MB", "256")),
+    "file_size_mb": int(os.getenv("SANDBOX_FILE_SIZE_MB", "8")),
+    "processes": int(os.getenv("SANDBOX_MAX_PROCESSES", "256")),
+    "open_files": 64,
+}
+# Per stream (stdout and stderr each)
+OUTPUT_LIMIT_BYTES = int(os.getenv("SANDBOX_OUTPUT_LIMIT_BYTES", str(64 * 1024)))
+READ_BLOCK_SIZE = 4096
+# Rows in the profile=true hot-function and allocation tables
+PROFILE_TOP = 10
+SANDBOX_USER = os.getenv("SANDBOX_USER", "nobody")
+
+
+def sandbox_ids():
+    """
+    [uid, gid] user code runs as, or None when the API is not root (it then runs as the API's user)
+    """
+    if os.geteuid() != 0:
+        return None
+    try:
+        entry = pwd.getpwnam(SANDBOX_USER)
+    except KeyError:
+        print(f"Debug - Sandbox user {SANDBOX_USER} not found; user code will run as root")
+        return None
+    return [entry.pw_uid, entry.pw_gid]
+
+
+SANDBOX_IDS = sandbox_ids()
+
+# Shared by the Python worker and the launcher (both run in the child process)
+_LIMITS_SOURCE = r"""
+import os, resource
+
+def apply_limits(limits):
+    def cap(kind, soft, hard=None):
+        hard = soft if hard is None else hard
+        _, current_hard = resource.getrlimit(kind)
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        resource.setrlimit(kind, (soft, hard))
+
+    # SIGXCPU at the soft limit, SIGKILL one second later
+    cap(resource.RLIMIT_CPU, limits["cpu_seconds"], limits["cpu_seconds"] + 1)
+    if limits.get("memory_mb"):
+        cap(resource.RLIMIT_AS, limits["memory_mb"] * 1024 * 1024)
+    cap(resource.RLIMIT_FSIZE, limits["file_size_mb"] * 1024 * 1024)
+    cap(resource.RLIMIT_NPROC, limits["processes"])
+    cap(resource.RLIMIT_NOFILE, limits["open_files"])
+    cap(resource.RLIMIT_CORE, 0)
+
+def drop_privileges(run_as):
+    # Root could raise its own hard limits again (CAP_SYS_RESOURCE) and ignores RLIMIT_NPROC
+    if run_as:
+        os.setgroups([])
+        os.setgid(run_as[1])
+        os.setuid(run_as[0])
+
+def report_usage(usage_fd, pid, extra_fd=None):
+    # Parent side: the user program's own rusage, from the kernel rather than from the program.
+    # extra_fd (the profile report) is read to EOF first so the child never blocks writing it
+    extra = None
+    if extra_fd is not None:
+        chunks = []
+        while True:
+            chunk = os.read(extra_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        try:
+            extra = json.loads(b"".join(chunks) or b"null")
+        except ValueError:
+            pass
+    _, status, usage = os.wait4(pid, 0)
+    try:
+        os.write(usage_fd, json.dumps({
+            "cpu_time": usage.ru_utime + usage.ru_stime,
+            "peak_memory_kb": usage.ru_maxrss,
+            "profile": extra,
+        }).encode())
+    except OSError:
+        pass
+    code = os.waitstatus_to_exitcode(status)
+    os._exit(code if code >= 0 else 128 - code)
+"""
+
+# Runs inside each pooled interpreter (argv[1]: fd to report usage on, argv[2]:
+# the JSON [uid, gid] to run user code as). Protocol on stdin: one JSON header
+# line with the code length and limits, the code itself, then whatever the
+# program reads as input. With "cases" in the header the code instead runs once
+# per case input (see run_batch), optionally after a "baseline" program whose
+# source follows the code. The submission runs in a forked child; this
+# process only waits for it and reports its usage.
+PYTHON_WORKER_BOOTSTRAP = r"""
+import json
+""" + _LIMITS_SOURCE + r"""
+import builtins, io, os, sys, time, traceback, linecache
+import bisect, collections, functools, heapq, itertools, math, random, re, string
+import cProfile, pstats, tracemalloc
+
+usage_fd = int(sys.argv.pop(1))
+run_as = json.loads(sys.argv.pop(1))
+header = json.loads(sys.stdin.buffer.readline())
+source = sys.stdin.buffer.read(header["code_length"]).decode("utf-8")
+baseline = sys.stdin.buffer.read(header.get("baseline_length", 0)).decode("utf-8") or None
+profile_read, profile_write = os.pipe() if header.get("profile") else (None, None)
+pid = os.fork()
+if pid:
+    if profile_write is not None:
+        os.close(profile_write)
+    report_usage(usage_fd, pid, profile_read)
+os.close(usage_fd)
+if profile_read is not None:
+    os.close(profile_read)
+apply_limits(header["limits"])
+drop_privileges(run_as)
+del run_as
+cases, nonce, output_limit = header.get("cases"), header.get("nonce"), header.get("output_limit")
+profile = header.get("profile")
+del header
+linecache.cache["code.py"] = (len(source), None, source.splitlines(True), "code.py")
+
+
+class OutputLimitExceeded(BaseException):
+    pass
+
+
+class CappedText(io.StringIO):
+    truncated = False
+
+    def write(self, text):
+        if self.tell() + len(text) > output_limit:
+            super().write(text[:max(0, output_limit - self.tell())])
+            self.truncated = True
+            raise OutputLimitExceeded()
+        return super().write(text)
+
+
+def run_source(namespace=None, profiler=None, code=None):
+    if namespace is None:
+        namespace = {}
+    namespace.update({"__name__": "__main__", "__builtins__": builtins, "__file__": "code.py"})
+    try:
+        program = compile(source if code is None else code, "code.py", "exec")
+        if profiler is not None:
+            profiler.enable()
+        try:
+            exec(program, namespace)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+    except SystemExit as error:
+        if error.code is not None and not isinstance(error.code, int):
+            print(error.code, file=sys.stderr)
+        return error.code if isinstance(error.code, int) else int(error.code is not None)
+    except OutputLimitExceeded:
+        return 1
+    except BaseException as error:
+        # Drop the bootstrap frame so the traceback starts at the user's code
+        traceback.print_exception(type(error), error, error.__traceback__.tb_next)
+        return 1
+    return 0
+
+
+def profile_source(top):
+    # cProfile + tracemalloc around the run; the namespace is kept alive so the
+    # allocation snapshot still sees what the program built
+    namespace = {}
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    began = time.perf_counter()
+    status = run_source(namespace, profiler)
+    elapsed = time.perf_counter() - began
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, "code.py")])
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    functions = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in pstats.Stats(profiler).stats.items():
+        if filename == "<string>" or name in ("<method 'disable' of '_lsprof.Profiler' objects>", "<built-in method builtins.exec>"):
+            continue
+        if filename == "code.py":
+            label = name
+        elif filename == "~":
+            label = name.strip("<>")
+        else:
+            label = f"{os.path.basename(filename)}:{name}"
+        functions.append({
+            "function": label,
+            "line": line if filename == "code.py" else None,
+            "calls": calls,
+            "own_ms": round(total * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        })
+    functions.sort(key=lambda row: row["own_ms"], reverse=True)
+    return status, {
+        "wall_ms": round(elapsed * 1000, 3),
+        "functions": functions[:top],
+        "peak_allocated_kb": round(peak / 1024, 1),
+        "allocated_at_exit_kb": round(current / 1024, 1),
+        "allocations": [
+            {"line": stat.traceback[0].lineno, "size_kb": round(stat.size / 1024, 1), "blocks": stat.count}
+            for stat in snapshot.statistics("lineno")[:top]
+            if stat.traceback[0].lineno > 0
+        ],
+    }
+
+
+def run_case(case_input, report, code=None):
+    # One run in a fresh namespace with its own stdin and captured output
+    stdin = io.TextIOWrapper(io.BytesIO(case_input.encode("utf-8")), encoding="utf-8")
+    sys.stdin, sys.stdout, sys.stderr = stdin, CappedText(), CappedText()
+    began = time.perf_counter()
+    try:
+        case_status = run_source(code=code)
+    except OutputLimitExceeded:
+        case_status = 1
+    elapsed = time.perf_counter() - began
+    out, err = sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = sys.__stdin__, report, sys.__stderr__
+    return case_status, out, err, elapsed
+
+
+def run_batch(cases, nonce, baseline):
+    # Batch mode: one result line per case, prefixed with the run's nonce. The
+    # baseline runs just before each case on the same input, in this process,
+    # so both times see the same interpreter state
+    report = sys.stdout
+    for index, case_input in enumerate(cases):
+        result = {"index": index}
+        if baseline is not None:
+            result["baseline_ms"] = run_case(case_input, report, baseline)[3] * 1000
+        case_status, out, err, elapsed = run_case(case_input, report)
+        report.write(nonce + json.dumps({
+            **result,
+            "returncode": case_status,
+            "stdout": out.getvalue(),
+            "stderr": err.getvalue(),
+            "truncated": out.truncated or err.truncated,
+            "time_ms": elapsed * 1000,
+        }) + "\n")
+        report.flush()
+    return 0
+
+
+profile_report = None
+if cases is None and profile:
+    status, profile_report = profile_source(profile)
+elif cases is None:
+    status = run_source()
+else:
+    # The nonce and the cases leave the module globals (which user code can
+    # reach with "import __main__") before any case runs
+    status = run_batch(*[globals().pop(name) for name in ("cases", "nonce", "baseline")])
+
+# The worker is thrown away: skip interpreter finalization
+sys.stdout.flush()
+sys.stderr.flush()
+if profile_write is not None:
+    try:
+        os.write(profile_write, json.dumps(profile_report).encode())
+    except OSError:
+        pass
+os._exit(status)
+"""
+
+# argv: usage fd, [uid, gid] JSON, limits JSON, command. Applies the limits,
+# runs the command as a child and reports its rusage on the usage fd
+LAUNCHER_SOURCE = r"""
+import json, sys
+""" + _LIMITS_SOURCE + r"""
+usage_fd = int(sys.argv[1])
+run_as = json.loads(sys.argv[2])
+apply_limits(json.loads(sys.argv[3]))
+command = sys.argv[4:]
+pid = os.fork()
+if pid == 0:
+    os.close(usage_fd)
+    try:
+        drop_privileges(run_as)
+        os.execv(command[0], command)
+    except OSError as error:
+        os.write(2, f"{command[0]}: {error.strerror}\n".encode())
+        os._exit(127)
+
+report_usage(usage_fd, pid)
+"""
+
+
+def detect_python():
+    """
+    Interpreter used for submissions, probed once when the module loads
+    """
+    for command in ("python", "python3", sys.executable):
+        path = shutil.which(command) or (command if os.path.isabs(command) else None)
+        if not path:
+            continue
+        try:
+            version = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=2)
+        except Exception as e:
+            print(f"Debug - Python check error for {command}: {str(e)}")
+            continue
+        if version.returncode == 0:
+            print(f"Debug - Python version: {(version.stdout or version.stderr).strip()} ({path})")
+            return path
+    return None
+
+
+PYTHON_CMD = detect_python()
+NODE_CMD = shutil.which("node")
+JAVA_CMD = shutil.which("java")
+JAVAC_CMD = shutil.which("javac")
+
+
+def limits_for(language):
+    limits = dict(SANDBOX_LIMITS)
+    if language in ("javascript", "java"):
+        # V8 and the JVM reserve far more address space than they use; their
+        # heaps are capped with runtime flags instead of RLIMIT_AS
+        limits["memory_mb"] = None
+        limits["open_files"] = 256
+    return limits
+
+
+def sandbox_env(temp_dir):
+    # Nothing from the API's environment (API keys, database URL) reaches user code
+    return {
+        "PATH": os.environ.get("PATH", os.defpath),
+        "HOME": str(temp_dir),
+        "TMPDIR": str(temp_dir),
+        "LANG": "C.UTF-8",
+        "PYTHONIOENCODING": "utf-8",
+        "PYTHONDONTWRITEBYTECODE": "1",
+        # Same str hashes on every run, so set / dict-of-set output order is reproducible
+        "PYTHONHASHSEED": "0",
+    }
+
+
+def _usage_pipe():
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    return read_fd, write_fd
+
+
+def _read_usage(read_fd):
+    chunks = []
+    try:
+        while True:
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except BlockingIOError:
+        pass
+    except OSError:
+        return None
+    finally:
+        os.close(read_fd)
+    try:
+        return json.loads(b"".join(chunks))
+    except ValueError:
+        return None
+
+
+def _kill_group(process):
+    # Each run is its own session, so this also takes out anything it spawned
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _read_capped(stream, limit, on_overflow):
+    chunks, size = [], 0
+    while True:
+        block = await stream.read(READ_BLOCK_SIZE)
+        if not block:
+            return b"".join(chunks), False
+        if size + len(block) > limit:
+            chunks.append(block[:limit - size])
+            on_overflow()
+            return b"".join(chunks), True
+        chunks.append(block)
+        size += len(block)
+
+
+async def collect_process(process, timeout=EXECUTION_TIMEOUT, usage_fd=None):
+    """
+    Wait for a started process, reading stdout and stderr concurrently with
+    the output cap applied. The process group is killed on timeout, on output
+    overflow and on cancellation.
+
+    Returns {"returncode", "stdout", "stderr", "timed_out", "truncated", "usage"}.
+    """
+    def overflow():
+        _kill_group(process)
+
+    reads = asyncio.gather(
+        _read_capped(process.stdout, OUTPUT_LIMIT_BYTES, overflow),
+        _read_capped(process.stderr, OUTPUT_LIMIT_BYTES, overflow),
+    )
+    # Retrieve the reads' error when the run is abandoned (timeout / cancellation)
+    reads.add_done_callback(lambda future: future.cancelled() or future.exception())
+    try:
+        (stdout, stdout_truncated), (stderr, stderr_truncated) = await asyncio.wait_for(reads, timeout)
+        await process.wait()
+        timed_out = False
+    except asyncio.TimeoutError:
+        stdout, stderr, stdout_truncated, stderr_truncated, timed_out = b"", b"", False, False, True
+    finally:
+        if process.returncode is None:
+            _kill_group(process)
+            await process.wait()
+        usage = _read_usage(usage_fd) if usage_fd is not None else None
+    return {
+        "returncode": process.returncode,
+        "stdout": stdout.decode("utf-8", errors="replace"),
+        "stderr": stderr.decode("utf-8", errors="replace"),
+        "timed_out": timed_out,
+        "truncated": stdout_truncated or stderr_truncated,
+        "usage": usage,
+    }
+
+
+async def launch_process(command, cwd, limits=None, stderr=asyncio.subprocess.PIPE, drop_privileges=True, **kwargs):
+    """
+    Start a command in cwd through the limiting launcher (extra kwargs go to
+    create_subprocess_exec). The command runs as SANDBOX_USER unless
+    drop_privileges is False. Returns (process, usage_fd); the caller owns usage_fd.
+    """
+    if PYTHON_CMD is None:
+        raise RuntimeError("Python interpreter not found; it is needed to launch sandboxed programs.")
+    usage_read, usage_write = _usage_pipe()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            PYTHON_CMD, "-I", "-S", "-c", LAUNCHER_SOURCE,
+            str(usage_write), json.dumps(SANDBOX_IDS if drop_privileges else None),
+            json.dumps(limits or SANDBOX_LIMITS), *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=stderr,
+            cwd=str(cwd),
+            env=sandbox_env(cwd),
+            pass_fds=(usage_write,),
+            start_new_session=True,
+            **kwargs,
+        )
+    except Exception:
+        os.close(usage_read)
+        raise
+    finally:
+        os.close(usage_write)
+    return process, usage_read
+
+
+async def run_process(command, cwd, stdin="", timeout=EXECUTION_TIMEOUT, limits=None, drop_privileges=True):
+    """
+    Run a command through launch_process, feed it stdin and collect it like collect_process
+    """
+    process, usage_fd = await launch_process(command, cwd, limits, drop_privileges=drop_privileges)
+    process.stdin.write(stdin.encode("utf-8"))
+    await process.stdin.drain()
+    process.stdin.close()
+    return await collect_process(process, timeout, usage_fd)
+
+
+def _signal_message(returncode):
+    # Negative: killed by a signal; 128+n: the launcher relaying one
+    number = -returncode if returncode < 0 else returncode - 128 if returncode > 128 else None
+    if number == signal.SIGXCPU:
+        return "CPU time limit exceeded."
+    if number == signal.SIGXFSZ:
+        return "File size limit exceeded."
+    if number == signal.SIGKILL:
+        return "Killed (resource limit exceeded)."
+    return None
+
+
+def execution_result(run, execution_time, timeout=EXECUTION_TIMEOUT):
+    if run["timed_out"]:
+        return {
+            "success": False,
+            "output": f"Execution timed out. Your code took too long to run (>{timeout:g} seconds).",
+            "timed_out": True,
+        }
+    returncode = run["returncode"]
+    if run["truncated"]:
+        output = f"{run['stdout']}{run['stderr']}\n... output truncated (limit {OUTPUT_LIMIT_BYTES // 1024} KB per stream)"
+    elif returncode == 0:
+        output = run["stdout"]
+    else:
+        output = f"Error: {run['stderr'] or _signal_message(returncode) or f'exit code {returncode}'}"
+
+    result = {
+        "success": returncode == 0 and not run["truncated"],
+        "output": output,
+        "execution_time": f"{execution_time:.3f}s",
+    }
+    if run["truncated"]:
+        result["truncated"] = True
+    if returncode != 0 and _signal_message(returncode):
+        result["resource_limit"] = True
+    if run["usage"]:
+        if run["usage"].get("peak_memory_kb") is not None:
+            result["peak_memory_kb"] = run["usage"]["peak_memory_kb"]
+        result["cpu_time"] = f"{run['usage']['cpu_time']:.3f}s"
+        if run["usage"].get("profile"):
+            result["profile"] = run["usage"]["profile"]
+    return result
+
+
+def format_profile(profile):
+    """
+    Compact text version of a profile=true report (for output and prompts)
+    """
+    lines = [f"Profile ({profile['wall_ms']:.1f} ms wall, peak traced memory {profile['peak_allocated_kb']:.1f} KB)"]
+    if profile["functions"]:
+        lines.append("Hot functions (own time):")
+        for row in profile["functions"]:
+            where = f" (line {row['line']})" if row["line"] else ""
+            lines.append(
+                f"  {row['function']}{where}: {row['calls']} calls, "
+                f"{row['own_ms']:.2f} ms own, {row['cumulative_ms']:.2f} ms cumulative"
+            )
+    if profile["allocations"]:
+        lines.append("Memory still allocated at exit, by line:")
+        for row in profile["allocations"]:
+            lines.append(f"  line {row['line']}: {row['size_kb']:.1f} KB in {row['blocks']} blocks")
+    return "\n".join(lines)
+
+
+def _make_temp_dir():
+    temp_dir = Path(tempfile.gettempdir()) / f"codementor_exec_{uuid.uuid4()}"
+    os.makedirs(temp_dir, exist_ok=True)
+    if SANDBOX_IDS:
+        # The run's working directory (and HOME / TMPDIR) must be writable by the sandbox user
+        os.chown(temp_dir, *SANDBOX_IDS)
+    return temp_dir
+
+
+class PythonWorkerPool:
+    """
+    Pre-started single-use Python interpreters
+    """
+
+    def __init__(self, size=PYTHON_POOL_SIZE):
+        self.size = size
+        self._idle = None
+        self._refills = set()
+
+    async def _spawn(self):
+        temp_dir = _make_temp_dir()
+        usage_read, usage_write = _usage_pipe()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                PYTHON_CMD, "-u", "-c", PYTHON_WORKER_BOOTSTRAP, str(usage_write), json.dumps(SANDBOX_IDS),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=str(temp_dir),
+                env=sandbox_env(temp_dir),
+                pass_fds=(usage_write,),
+                start_new_session=True,
+                # Batch result lines carry a case's captured output
+                limit=8 * OUTPUT_LIMIT_BYTES + 4096,
+            )
+        except Exception:
+            os.close(usage_read)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        finally:
+            os.close(usage_write)
+        await self._idle.put((process, temp_dir, usage_read))
+
+    def _refill(self):
+        task = asyncio.create_task(self._spawn())
+        self._refills.add(task)
+        task.add_done_callback(self._refills.discard)
+
+    async def start(self):
+        if self._idle is not None:
+            return
+        if PYTHON_CMD is None:
+            raise RuntimeError("Python interpreter not found. Make sure Python is installed and in your PATH.")
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._refill()
+
+    async def close(self):
+        """
+        Kill idle workers and remove their temp dirs
+        """
+        if self._idle is None:
+            return
+        for task in list(self._refills):
+            task.cancel()
+        while not self._idle.empty():
+            process, temp_dir, usage_fd = self._idle.get_nowait()
+            if process.returncode is None:
+                _kill_group(process)
+                await process.wait()
+            os.close(usage_fd)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self._idle = None
+
+    async def acquire(self):
+        """
+        Take an idle worker (process, temp_dir, usage_fd) and start its replacement
+        """
+        await self.start()
+        while True:
+            process, temp_dir, usage_fd = await self._idle.get()
+            self._refill()
+            if process.returncode is None:
+                return process, temp_dir, usage_fd
+            os.close(usage_fd)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    async def run(self, code, stdin="", timeout=EXECUTION_TIMEOUT, limits=None, profile=False):
+        process, temp_dir, usage_fd = await self.acquire()
+        try:
+            source = code.encode("utf-8")
+            header = json.dumps({
+                "code_length": len(source),
+                "limits": limits or limits_for("python"),
+                "profile": PROFILE_TOP if profile else None,
+            })
+            start_time = time.time()
+            process.stdin.write(header.encode("utf-8") + b"\n" + source + stdin.encode("utf-8"))
+            await process.stdin.drain()
+            process.stdin.close()
+            run = await collect_process(process, timeout, usage_fd)
+            return execution_result(run, time.time() - start_time, timeout)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    async def run_batch(self, code, inputs, timeout_per_case, on_result, settle=False, baseline=None):
+        """
+        Run code once per input inside a single worker. For timing: with
+        settle, the replacement workers finish booting first, so they do not
+        compete for CPU with the cases; a baseline program runs just before
+        every case on the same input, and its time is reported as baseline_ms.
+
+        on_result(result) is awaited after every case with {"index",
+        "returncode", "stdout", "stderr", "truncated", "time_ms"}; returning
+        False stops the batch. Returns the number of cases that reported a
+        result: fewer than len(inputs) means the case at that index timed out
+        or killed the worker (or the batch was stopped).
+        """
+        process, temp_dir, usage_fd = await self.acquire()
+        if settle:
+            await asyncio.gather(*self._refills, return_exceptions=True)
+        nonce = f"@@{uuid.uuid4().hex}@@".encode("ascii")
+        limits = {
+            **limits_for("python"),
+            "cpu_seconds": int(timeout_per_case * len(inputs) * (2 if baseline else 1)) + 1,
+        }
+        drain = None
+        reported = 0
+        try:
+            source = code.encode("utf-8")
+            baseline_source = (baseline or "").encode("utf-8")
+            header = json.dumps({
+                "code_length": len(source),
+                "baseline_length": len(baseline_source),
+                "limits": limits,
+                "cases": inputs,
+                "nonce": nonce.decode("ascii"),
+                "output_limit": OUTPUT_LIMIT_BYTES,
+            })
+            process.stdin.write(header.encode("utf-8") + b"\n" + source + baseline_source)
+            await process.stdin.drain()
+            process.stdin.close()
+            # Whatever user code writes to the real stderr is discarded, capped
+            drain = asyncio.create_task(_read_capped(process.stderr, OUTPUT_LIMIT_BYTES, lambda: None))
+
+            while reported < len(inputs):
+                try:
+                    line = await asyncio.wait_for(process.stdout.readline(), timeout_per_case)
+                except (asyncio.TimeoutError, ValueError):
+                    break
+                if not line:
+                    break
+                if not line.startswith(nonce):
+                    # Written straight to sys.__stdout__ by user code
+                    continue
+                reported += 1
+                if await on_result(json.loads(line[len(nonce):])) is False:
+                    break
+            return reported
+        finally:
+            if process.returncode is None:
+                _kill_group(process)
+                await process.wait()
+            if drain is not None:
+                drain.cancel()
+            os.close(usage_fd)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+python_pool = PythonWorkerPool()
+
+
+async def run_python(code, stdin="", timeout=EXECUTION_TIMEOUT, profile=False):
+    try:
+        return await python_pool.run(code, stdin, timeout, profile=profile)
+    except Exception as e:
+        print(f"Debug - Python execution error: {str(e)}")
+        return {
+            "success": False,
+            "output": f"Error running Python code: {str(e)}",
+        }
+
+
+async def run_javascript(code, stdin="", timeout=EXECUTION_TIMEOUT):
+    if NODE_CMD is None:
+        return {
+            "success": False,
+            "output": "Error: Node.js not found. Please install Node.js to execute JavaScript code.",
+        }
+    temp_dir = _make_temp_dir()
+    try:
+        file_path = temp_dir / "code.js"
+        with open(file_path, "w") as f:
+            f.write(code)
+        command = [NODE_CMD, f"--max-old-space-size={SANDBOX_LIMITS['memory_mb']}", str(file_path)]
+        start_time = time.time()
+        run = await run_process(command, temp_dir, stdin, timeout, limits_for("javascript"))
+        return execution_result(run, time.time() - start_time, timeout)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+async def run_java(code, stdin="", timeout=EXECUTION_TIMEOUT):
+    # The compiled-class cache and the warm JVM workers live in services/java_runner.py
+    from services.java_runner import run_java_submission
+    return await run_java_submission(code, stdin, timeout)
+
+
+RUNNERS = {
+    "python": run_python,
+    "javascript": run_javascript,
+    "java": run_java,
+}
+# Whose version goes into the result cache key
+RUNTIME_COMMANDS = {
+    "python": PYTHON_CMD,
+    "javascript": NODE_CMD,
+    "java": JAVA_CMD,
+}
+
+
+async def execute_code_safely(code, language, stdin="", timeout=EXECUTION_TIMEOUT, user=None, profile=False):
+    """
+    Run a submission in the sandbox and return {"success", "output",
+    "execution_time"} plus "peak_memory_kb" / "cpu_time" when measured.
+    Deterministic runs are answered from the result cache when possible;
+    everything else waits for a fair execution slot (ExecutionQueueFull when
+    the queue is full). profile=True adds a cProfile / tracemalloc report
+    under "profile" for Python runs.
+    """
+    print(f"Debug - Execution request: {json.dumps({'language': language, 'code_length': len(code)})}")
+    runner = RUNNERS.get(language.lower())
+    if runner is None:
+        return {
+            "success": False,
+            "output": f"Unsupported language: {language}. Supported languages are Python, JavaScript, and Java.",
+        }
+    profile = profile and language.lower() == "python"
+    cache_key = None
+    if timeout == EXECUTION_TIMEOUT and not profile and is_deterministic(code, language):
+        cache_key = result_cache.key(language, runtime_version(RUNTIME_COMMANDS[language.lower()]), code, stdin)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    else:
+        result_cache.uncacheable += 1
+    try:
+        async with execution_scheduler.slot(user):
+            if profile:
+                result = await runner(code, stdin, timeout, profile=True)
+            else:
+                result = await runner(code, stdin, timeout)
+        if cache_key is not None and cacheable_result(result):
+            result_cache.put(cache_key, result)
+        return result
+    except ExecutionQueueFull:
+        raise
+    except Exception as e:
+        return {
+            "success": False,
+            "output": f"Execution error: {str(e)}",
+        }
+
+
+async def cancel_on_disconnect(request, awaitable, poll_interval=0.1):
+    """
+    Await a coroutine, cancelling it if the HTTP client goes away first.
+    Returns None when cancelled.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=poll_interval)
+            if not task.done() and await request.is_disconnected():
+                task.cancel()
+                print("Debug - Client disconnected, execution cancelled")
+                return None
+        return task.result()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,155 @@
+"""
+Fair, bounded scheduling for sandbox runs.
+
+At most EXECUTION_WORKERS submissions execute at once (one per core by
+default), and each user has at most EXECUTION_PER_USER of them in flight.
+Everything else waits in a bounded queue that is served round-robin across
+users, so one learner mashing Run cannot starve the rest of the class. Once the
+queue is full new runs are rejected straight away (the routers answer 429)
+rather than piling up behind the execution timeout.
+
+Interactive sessions last minutes rather than seconds and mostly wait on the
+learner's input, so they get their own interactive_scheduler (with no queue)
+instead of holding the slots /practice/execute and /practice/run_tests need.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+
+
+EXECUTION_WORKERS = int(os.getenv("EXECUTION_WORKERS", str(os.cpu_count() or 2)))
+EXECUTION_PER_USER = int(os.getenv("EXECUTION_PER_USER", "2"))
+EXECUTION_QUEUE_LIMIT = int(os.getenv("EXECUTION_QUEUE_LIMIT", str(EXECUTION_WORKERS * 8)))
+INTERACTIVE_SESSIONS = int(os.getenv("INTERACTIVE_SESSIONS", str(EXECUTION_WORKERS)))
+INTERACTIVE_PER_USER = int(os.getenv("INTERACTIVE_PER_USER", "1"))
+# Queue waits kept for the percentiles in stats()
+WAIT_SAMPLES = 1000
+
+
+class ExecutionQueueFull(Exception):
+    pass
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ExecutionScheduler:
+    def __init__(self, workers=EXECUTION_WORKERS, per_user=EXECUTION_PER_USER, queue_limit=EXECUTION_QUEUE_LIMIT):
+        self.workers = workers
+        self.per_user = per_user
+        self.queue_limit = queue_limit
+        self._running = 0
+        self._in_flight = defaultdict(int)
+        # user -> deque of (future, enqueued_at); key order is the round-robin order
+        self._waiting = OrderedDict()
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+
+    def _can_start(self, user):
+        return self._running < self.workers and self._in_flight[user] < self.per_user
+
+    def _start(self, user, enqueued_at):
+        self._running += 1
+        self._in_flight[user] += 1
+        self._admitted += 1
+        self._waits.append((time.perf_counter() - enqueued_at) * 1000)
+
+    def _dispatch(self):
+        # Hand free slots to waiting users in round-robin order
+        while self._running < self.workers:
+            user = next((user for user in self._waiting if self._in_flight[user] < self.per_user), None)
+            if user is None:
+                return
+            waiters = self._waiting.pop(user)
+            future, enqueued_at = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                # Back of the line for this user's next run
+                self._waiting[user] = waiters
+            if not future.done():
+                self._start(user, enqueued_at)
+                future.set_result(None)
+
+    async def acquire(self, user):
+        enqueued_at = time.perf_counter()
+        if user not in self._waiting and self._can_start(user):
+            self._start(user, enqueued_at)
+            return
+        if not self.queue_limit:
+            self._rejected += 1
+            raise ExecutionQueueFull(f"All {self.workers} slots are in use (at most {self.per_user} per user). Please retry shortly.")
+        if self._queued >= self.queue_limit:
+            self._rejected += 1
+            raise ExecutionQueueFull(f"Execution queue is full ({self._queued} runs waiting). Please retry shortly.")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(user, deque()).append((future, enqueued_at))
+        self._queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: give the slot back
+                self.release(user)
+            else:
+                self._forget(user, future)
+            raise
+
+    def _forget(self, user, future):
+        waiters = self._waiting.get(user)
+        if not waiters:
+            return
+        for entry in waiters:
+            if entry[0] is future:
+                waiters.remove(entry)
+                self._queued -= 1
+                break
+        if not waiters:
+            del self._waiting[user]
+
+    def release(self, user):
+        self._running -= 1
+        self._in_flight[user] -= 1
+        if not self._in_flight[user]:
+            del self._in_flight[user]
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user):
+        """
+        Hold one execution slot for user; raises ExecutionQueueFull when the queue is full
+        """
+        await self.acquire(user)
+        try:
+            yield
+        finally:
+            self.release(user)
+
+    def stats(self):
+        waits = sorted(self._waits)
+        return {
+            "workers": self.workers,
+            "per_user_limit": self.per_user,
+            "queue_limit": self.queue_limit,
+            "running": self._running,
+            "queued": self._queued,
+            "waiting_users": len(self._waiting),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "queue_wait_ms": {
+                "p50": round(_percentile(waits, 0.5), 2),
+                "p95": round(_percentile(waits, 0.95), 2),
+                "max": round(waits[-1], 2) if waits else 0.0,
+            },
+        }
+
+
+execution_scheduler = ExecutionScheduler()
+interactive_scheduler = ExecutionScheduler(INTERACTIVE_SESSIONS, INTERACTIVE_PER_USER, queue_limit=0)
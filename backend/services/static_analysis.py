@@ -0,0 +1,432 @@
+"""
+Local static checks for /practice/live_tracking.
+
+Many live hints are really "syntax error on line 4" or "this name is not
+defined", which do not need a model call. For Python this runs ast.parse, a
+small pyflakes-style scope pass (undefined names, local variables assigned but
+never used) and a check for obviously infinite while loops. For JavaScript and
+Java it checks that brackets are balanced; the tokenizer does not know
+JavaScript regex literals, so for JavaScript an imbalance is only a warning.
+Errors are answered locally in a few milliseconds; warnings are passed on to
+the model with the code.
+"""
+import ast
+import builtins
+
+from services.hints import _c_like_tokens
+
+
+MAX_LOCAL_FINDINGS = 3
+
+_builtin_functions = set(dir(builtins))
+_builtin_names = _builtin_functions | {
+    "__name__", "__file__", "__doc__", "__builtins__", "__spec__", "__loader__",
+    "__module__", "__qualname__", "__annotations__",
+}
+# Builtins that can end a loop: exiting, or raising once input / the iterator runs out
+_exit_calls = {"exit", "quit", "input", "next"}
+# Builtins that only read their arguments (and do not consume iterators)
+_reading_calls = {"print", "len", "str", "repr", "int", "float", "bool", "abs", "round", "format", "type", "isinstance", "chr", "ord"}
+
+
+def _finding(line, kind, message, severity="error"):
+    return {"line": line, "kind": kind, "message": message, "severity": severity}
+
+
+class _Scope:
+    def __init__(self, kind, parent=None):
+        self.kind = kind
+        self.parent = parent
+        self.bindings = set()
+        self.globals = set()
+        self.nonlocals = set()
+        # name -> line of the first plain assignment (unused-variable candidates)
+        self.assigned = {}
+        self.loads = []
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+
+    def module(self):
+        scope = self
+        while scope.parent is not None:
+            scope = scope.parent
+        return scope
+
+
+class _ScopeCollector(ast.NodeVisitor):
+    """
+    One pass over the tree recording bindings and loads per scope
+    """
+
+    def __init__(self):
+        self.scope = self.root = _Scope("module")
+        self.star_import = False
+        self.uses_locals = set()
+
+    def _bind(self, name, scope=None):
+        scope = scope or self.scope
+        if name in scope.globals:
+            scope.module().bindings.add(name)
+        elif name not in scope.nonlocals:
+            scope.bindings.add(name)
+
+    def _in_scope(self, kind, body):
+        self.scope = _Scope(kind, self.scope)
+        try:
+            body()
+        finally:
+            self.scope = self.scope.parent
+
+    def _bind_arguments(self, args):
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None:
+                self.scope.bindings.add(arg.arg)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.scope.loads.append((node.id, node.lineno))
+            if node.id == "locals":
+                self.uses_locals.add(self.scope)
+        else:
+            self._bind(node.id)
+
+    def visit_Global(self, node):
+        self.scope.globals.update(node.names)
+        self.root.bindings.update(node.names)
+
+    def visit_Nonlocal(self, node):
+        self.scope.nonlocals.update(node.names)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._bind(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_import = True
+            else:
+                self._bind(alias.asname or alias.name)
+
+    def _visit_function(self, node):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self._visit_defaults(node.args)
+        if getattr(node, "returns", None):
+            self.visit(node.returns)
+        self._bind(node.name)
+
+        def body():
+            self._bind_arguments(node.args)
+            for statement in node.body:
+                self.visit(statement)
+        self._in_scope("function", body)
+
+    visit_FunctionDef = visit_AsyncFunctionDef = _visit_function
+
+    def _visit_defaults(self, args):
+        for default in args.defaults + [default for default in args.kw_defaults if default is not None]:
+            self.visit(default)
+        for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+            if arg is not None and arg.annotation is not None:
+                self.visit(arg.annotation)
+
+    def visit_Lambda(self, node):
+        self._visit_defaults(node.args)
+
+        def body():
+            self._bind_arguments(node.args)
+            self.visit(node.body)
+        self._in_scope("function", body)
+
+    def visit_ClassDef(self, node):
+        for expression in node.decorator_list + node.bases + [keyword.value for keyword in node.keywords]:
+            self.visit(expression)
+        self._bind(node.name)
+
+        def body():
+            for statement in node.body:
+                self.visit(statement)
+        self._in_scope("class", body)
+
+    def _visit_comprehension(self, node):
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+
+        def body():
+            for index, generator in enumerate(node.generators):
+                if index:
+                    self.visit(generator.iter)
+                self.visit(generator.target)
+                for condition in generator.ifs:
+                    self.visit(condition)
+            for field in ("elt", "key", "value"):
+                if getattr(node, field, None) is not None:
+                    self.visit(getattr(node, field))
+        self._in_scope("comprehension", body)
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_comprehension
+
+    def visit_NamedExpr(self, node):
+        self.visit(node.value)
+        scope = self.scope
+        while scope.kind == "comprehension":
+            scope = scope.parent
+        self._bind(node.target.id, scope)
+        scope.assigned.setdefault(node.target.id, node.lineno)
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        for target in node.targets:
+            self._record_assignment(target)
+            self.visit(target)
+
+    def visit_AnnAssign(self, node):
+        self.visit(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+            self._record_assignment(node.target)
+        self.visit(node.target)
+
+    def _record_assignment(self, target):
+        # Like pyflakes: tuple unpacking targets are never reported as unused
+        if isinstance(target, ast.Name) and self.scope.kind == "function":
+            if target.id not in self.scope.globals | self.scope.nonlocals:
+                self.scope.assigned.setdefault(target.id, target.lineno)
+
+    def visit_AugAssign(self, node):
+        # x += 1 reads x as well
+        if isinstance(node.target, ast.Name):
+            self.scope.loads.append((node.target.id, node.target.lineno))
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self._bind(node.name)
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self._bind(node.rest)
+        self.generic_visit(node)
+
+
+def _resolves(name, scope):
+    current = scope
+    if name == "__class__":
+        # Implicitly defined in every function nested in a class body
+        while current is not None and current.kind != "class":
+            current = current.parent
+        return current is not None and current is not scope
+    while current is not None:
+        # Class bodies are only visible to their own statements
+        if (current is scope or current.kind != "class") and name in current.bindings:
+            return True
+        current = current.parent
+    return name in _builtin_names
+
+
+def _walk_scopes(scope):
+    yield scope
+    for child in scope.children:
+        yield from _walk_scopes(child)
+
+
+def _subtree_loads(scope):
+    return {name for nested in _walk_scopes(scope) for name, _ in nested.loads}
+
+
+def _name_findings(tree):
+    collector = _ScopeCollector()
+    collector.visit(tree)
+    findings, reported = [], set()
+    for scope in _walk_scopes(collector.root):
+        if not collector.star_import:
+            for name, line in scope.loads:
+                if name not in reported and not _resolves(name, scope):
+                    reported.add(name)
+                    findings.append(_finding(line, "undefined_name", f"'{name}' is used on line {line} but never defined."))
+        if scope.kind == "function" and scope not in collector.uses_locals:
+            used = _subtree_loads(scope)
+            for name, line in scope.assigned.items():
+                if name not in used and not name.startswith("_"):
+                    findings.append(_finding(
+                        line, "unused_variable", f"Local variable '{name}' is assigned on line {line} but never used.", "warning",
+                    ))
+    return findings, collector.root.bindings
+
+
+def _loop_body_nodes(loop):
+    # Everything the loop runs itself: nested functions and classes are not entered
+    stack = list(loop.body)
+    while stack:
+        node = stack.pop()
+        yield node
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            stack.extend(ast.iter_child_nodes(node))
+
+
+def _calls_builtin(call, bound_names):
+    """
+    Whether the call is known to be a builtin (not a user, library or renamed function)
+    """
+    func = call.func
+    return isinstance(func, ast.Name) and func.id in _builtin_functions and func.id not in bound_names
+
+
+def _can_leave(loop, bound_names):
+    for node in _loop_body_nodes(loop):
+        if isinstance(node, (ast.Return, ast.Raise, ast.Yield, ast.YieldFrom, ast.Await)):
+            return True
+        # Anything but a builtin may exit (sys.exit, "from sys import exit as bye") or raise
+        if isinstance(node, ast.Call) and (not _calls_builtin(node, bound_names) or node.func.id in _exit_calls):
+            return True
+    # A break only leaves this loop when it is not inside a nested loop
+    stack = list(loop.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Break):
+            return True
+        if not isinstance(node, (ast.While, ast.For, ast.AsyncFor, ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            stack.extend(ast.iter_child_nodes(node))
+    return False
+
+
+def _condition_is_frozen(loop, bound_names):
+    """
+    The condition only reads plain names, and nothing in the body can change them
+    """
+    allowed = (ast.Name, ast.Constant, ast.Compare, ast.BoolOp, ast.UnaryOp, ast.BinOp, ast.Load,
+               ast.cmpop, ast.boolop, ast.unaryop, ast.operator)
+    names = set()
+    for node in ast.walk(loop.test):
+        if not isinstance(node, allowed):
+            return False
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+    if not names:
+        return False
+    for node in _loop_body_nodes(loop):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            return False
+        if isinstance(node, ast.Name) and node.id in names and not isinstance(node.ctx, ast.Load):
+            return False
+        if isinstance(node, (ast.Attribute, ast.Subscript)) and isinstance(node.value, ast.Name) and node.value.id in names:
+            return False
+        if isinstance(node, ast.Call):
+            # heapq.heappop(h) empties h; any non-builtin may change what the condition reads
+            arguments = node.args + [keyword.value for keyword in node.keywords]
+            reads_only = _calls_builtin(node, bound_names) and node.func.id in _reading_calls
+            if not reads_only and any(isinstance(arg, ast.Name) and arg.id in names for arg in arguments):
+                return False
+            if not _calls_builtin(node, bound_names) or node.func.id in ("exec", "eval", "globals", "locals", "vars"):
+                return False
+    return True
+
+
+def _bound_names(tree):
+    """
+    Every name the code binds anywhere, so a shadowed builtin is not taken for the builtin
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+    return names
+
+
+def _loop_findings(tree, module_bindings):
+    findings = []
+    bound_names = _bound_names(tree) | module_bindings
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.While) or _can_leave(node, bound_names):
+            continue
+        if isinstance(node.test, ast.Constant) and node.test.value:
+            findings.append(_finding(
+                node.lineno, "infinite_loop",
+                f"The while loop on line {node.lineno} never ends: there is no break, return or exit inside it.",
+            ))
+        elif _condition_is_frozen(node, bound_names):
+            findings.append(_finding(
+                node.lineno, "infinite_loop",
+                f"The while loop on line {node.lineno} never ends: nothing inside it changes its condition "
+                f"({ast.unparse(node.test)}) and it never breaks out.",
+            ))
+    return findings
+
+
+def analyze_python(code):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as error:
+        line = error.lineno or 1
+        return [_finding(line, "syntax_error", f"Syntax error on line {line}: {error.msg}.")]
+    except ValueError as error:
+        return [_finding(1, "syntax_error", f"The code could not be parsed: {str(error)}.")]
+    findings, module_bindings = _name_findings(tree)
+    findings.extend(_loop_findings(tree, module_bindings))
+    return sorted(findings, key=lambda finding: finding["line"])
+
+
+def analyze_brackets(code, severity="error"):
+    pairs = {")": "(", "]": "[", "}": "{"}
+    stack = []
+    for match in _c_like_tokens.finditer(code):
+        token = match.group(0)
+        if token in "([{":
+            stack.append((token, match.start()))
+        elif token in pairs:
+            line = code.count("\n", 0, match.start()) + 1
+            if not stack or stack[-1][0] != pairs[token]:
+                return [_finding(line, "unbalanced_brackets", f"Unexpected '{token}' on line {line}.", severity)]
+            stack.pop()
+    if stack:
+        token, position = stack[-1]
+        line = code.count("\n", 0, position) + 1
+        return [_finding(line, "unbalanced_brackets", f"The '{token}' opened on line {line} is never closed.", severity)]
+    return []
+
+
+def analyze_code(code, language):
+    """
+    Findings [{"line", "kind", "message", "severity"}] for the code, severity error or warning
+    """
+    language = language.lower()
+    if language == "python":
+        return analyze_python(code)
+    if language == "javascript":
+        # "/\(/" is a regex literal, not a bracket: let the model judge
+        return analyze_brackets(code, "warning")
+    if language == "java":
+        return analyze_brackets(code)
+    return []
+
+
+def local_hint(findings):
+    """
+    Hint built from the error findings, or None when the model should be asked
+    """
+    errors = [finding for finding in findings if finding["severity"] == "error"]
+    if not errors:
+        return None
+    return " ".join(finding["message"] for finding in errors[:MAX_LOCAL_FINDINGS])
+
+
+def format_findings(findings):
+    return "\n".join(f"- {finding['message']}" for finding in findings)
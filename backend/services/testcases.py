@@ -0,0 +1,156 @@
+"""
+Batch test-case runner for coding problems.
+
+Python solutions run every case inside one pooled worker (fresh namespace,
+stdin and captured output per case). Java cases share the compiled-class cache
+and a warm JVM; JavaScript runs one sandboxed process per case. Outputs are
+compared with trailing whitespace ignored, and a failing case gets a unified
+diff of expected vs actual output.
+"""
+import difflib
+import time
+
+from services.java_runner import run_java_submission
+from services.sandbox import python_pool, run_javascript
+from services.scheduler import execution_scheduler
+
+
+DEFAULT_CASE_TIMEOUT = 2.0
+MAX_CASES = 50
+MAX_DIFF_LINES = 40
+
+
+def normalize_output(text):
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").split("\n")]
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def output_diff(expected, actual):
+    diff = list(difflib.unified_diff(
+        normalize_output(expected), normalize_output(actual),
+        "expected", "actual", lineterm="",
+    ))
+    if len(diff) > MAX_DIFF_LINES:
+        diff = diff[:MAX_DIFF_LINES] + [f"... {len(diff) - MAX_DIFF_LINES} more diff lines"]
+    return "\n".join(diff)
+
+
+def grade_case(index, case, outcome):
+    """
+    Case result from a raw outcome {"status", "stdout", "stderr", "time_ms"}
+    where status is ok, error, timeout or truncated
+    """
+    result = {
+        "index": index,
+        "status": outcome["status"],
+        "passed": False,
+        "stdout": outcome.get("stdout", ""),
+        "stderr": outcome.get("stderr", ""),
+        "expected_output": case["expected_output"],
+        "diff": "",
+        "time_ms": round(outcome.get("time_ms", 0.0), 2),
+    }
+    if outcome["status"] == "ok":
+        result["passed"] = normalize_output(result["stdout"]) == normalize_output(case["expected_output"])
+        result["status"] = "passed" if result["passed"] else "failed"
+        if not result["passed"]:
+            result["diff"] = output_diff(case["expected_output"], result["stdout"])
+    return result
+
+
+def _skipped(index, case):
+    return {
+        "index": index,
+        "status": "skipped",
+        "passed": False,
+        "stdout": "",
+        "stderr": "",
+        "expected_output": case["expected_output"],
+        "diff": "",
+        "time_ms": 0.0,
+    }
+
+
+def _outcome_from_execution(result, time_ms):
+    # execute_code_safely-style result -> raw outcome
+    if result.get("timed_out"):
+        return {"status": "timeout", "stderr": result["output"], "time_ms": time_ms}
+    if result.get("truncated"):
+        return {"status": "truncated", "stdout": result["output"], "time_ms": time_ms}
+    if result["success"]:
+        return {"status": "ok", "stdout": result["output"], "time_ms": time_ms}
+    return {"status": "error", "stderr": result["output"], "time_ms": time_ms}
+
+
+async def _run_python_cases(code, cases, timeout_per_case, stop_on_first_failure, results):
+    start = 0
+    while start < len(cases):
+        async def on_result(raw, offset=start):
+            index = offset + raw["index"]
+            if raw["truncated"]:
+                status = "truncated"
+            else:
+                status = "ok" if raw["returncode"] == 0 else "error"
+            results[index] = grade_case(index, cases[index], {**raw, "status": status})
+            return not (stop_on_first_failure and not results[index]["passed"])
+
+        reported = await python_pool.run_batch(
+            code, [case["stdin"] for case in cases[start:]], timeout_per_case, on_result,
+        )
+        index = start + reported
+        if index > start and not results[index - 1]["passed"] and stop_on_first_failure:
+            return
+        if index < len(cases):
+            # That case hung or took the worker down; carry on in a fresh worker
+            results[index] = grade_case(index, cases[index], {
+                "status": "timeout",
+                "stderr": f"Timed out or crashed (>{timeout_per_case:g} seconds).",
+                "time_ms": timeout_per_case * 1000,
+            })
+            if stop_on_first_failure:
+                return
+        start = index + 1
+
+
+async def _run_process_cases(run, code, cases, timeout_per_case, stop_on_first_failure, results):
+    for index, case in enumerate(cases):
+        start_time = time.perf_counter()
+        result = await run(code, case["stdin"], timeout_per_case)
+        outcome = _outcome_from_execution(result, (time.perf_counter() - start_time) * 1000)
+        results[index] = grade_case(index, case, outcome)
+        if stop_on_first_failure and not results[index]["passed"]:
+            return
+
+
+async def run_test_cases(code, language, cases, stop_on_first_failure=False, timeout_per_case=DEFAULT_CASE_TIMEOUT, user=None):
+    """
+    Run a solution against [{"stdin", "expected_output"}] cases and return a summary
+    with per-case pass/fail, diff and timing. The whole batch holds one execution slot.
+    """
+    if len(cases) > MAX_CASES:
+        raise ValueError(f"At most {MAX_CASES} test cases per run.")
+    language = language.lower()
+    if language not in ("python", "java", "javascript"):
+        raise ValueError(f"Unsupported language: {language}. Supported languages are Python, JavaScript, and Java.")
+    results = [None] * len(cases)
+
+    async with execution_scheduler.slot(user):
+        start_time = time.time()
+        if language == "python":
+            await _run_python_cases(code, cases, timeout_per_case, stop_on_first_failure, results)
+        elif language == "java":
+            await _run_process_cases(run_java_submission, code, cases, timeout_per_case, stop_on_first_failure, results)
+        else:
+            await _run_process_cases(run_javascript, code, cases, timeout_per_case, stop_on_first_failure, results)
+
+    results = [result or _skipped(index, cases[index]) for index, result in enumerate(results)]
+    passed = sum(result["passed"] for result in results)
+    return {
+        "passed": passed,
+        "total": len(cases),
+        "all_passed": passed == len(cases),
+        "cases": results,
+        "execution_time": f"{time.time() - start_time:.3f}s",
+    }
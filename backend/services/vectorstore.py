@@ -0,0 +1,220 @@
+"""
+Quantized in-memory vector store.
+
+Selected with VECTOR_STORE_DTYPE (see services/ingestion.py):
+- "float32" (default): plain Chroma, as before
+- "float16": vectors halved to 2 bytes per dimension
+- "int8": 1 byte per dimension plus one float32 scale per vector
+
+Search is a blocked NumPy matrix-vector product over the quantized codes. With
+VECTOR_STORE_RESCORE=1 the float32 vectors are also written to an on-disk
+memmap (not kept in RAM) and the top candidates are re-scored exactly.
+Embeddings are assumed to be unit length (OpenAI, hashing and the
+sentence-transformers backend all are), so the dot product is the cosine.
+
+Refresh jobs write to a store from a worker thread while requests search it,
+so every read and write of the arrays holds the store's lock; embedding
+happens outside it.
+"""
+import os
+import tempfile
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+
+QUANTIZED_DTYPES = ("float16", "int8")
+SEARCH_BLOCK_ROWS = 8192
+RESCORE_OVERSAMPLE = 4
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", os.path.join(tempfile.gettempdir(), "codementor_vectors"))
+
+
+def quantize(vectors, dtype):
+    """
+    Returns (codes, scales) for a float32 matrix
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def approximate_scores(codes, scales, query, block_rows=SEARCH_BLOCK_ROWS):
+    """
+    Dot products of the query with every quantized row, computed in row blocks
+    so the float32 upcast never materializes the whole matrix
+    """
+    query = np.asarray(query, dtype=np.float32)
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), block_rows):
+        block = codes[start:start + block_rows].astype(np.float32)
+        scores[start:start + block_rows] = block @ query
+    return scores * scales
+
+
+def top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class QuantizedVectorStore(VectorStore):
+    def __init__(self, collection_name, embedding_function, dtype="int8", rescore=False):
+        if dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Unsupported quantized dtype: {dtype}")
+        self.collection_name = collection_name
+        self._embedding = embedding_function
+        self.dtype = dtype
+        self.rescore = rescore
+
+        self._codes = None
+        self._scales = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._ids, self._texts, self._metadatas = [], [], []
+        self._rows = {}
+        # Reentrant: add_texts deletes the rows it upserts, search rescoring reads _full
+        self._lock = threading.RLock()
+
+        self._full_path = None
+        self._full = None
+        if rescore:
+            os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+            self._full_path = os.path.join(VECTOR_STORE_DIR, f"{collection_name}-{uuid.uuid4().hex}.f32")
+            open(self._full_path, "wb").close()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __del__(self):
+        if getattr(self, "_full_path", None) and os.path.exists(self._full_path):
+            self._full = None
+            os.remove(self._full_path)
+
+    def memory_bytes(self):
+        """
+        RAM held by the quantized codes and scales
+        """
+        with self._lock:
+            codes = self._codes.nbytes if self._codes is not None else 0
+            return codes + self._scales.nbytes
+
+    def _full_vectors(self):
+        if self._full is None or len(self._full) != len(self._ids):
+            self._full = np.memmap(self._full_path, dtype=np.float32, mode="r").reshape(len(self._ids), -1)
+        return self._full
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        codes, scales = quantize(vectors, self.dtype)
+
+        with self._lock:
+            # Upsert: drop rows whose ids are being written again
+            self.delete(ids=[doc_id for doc_id in ids if doc_id in self._rows])
+
+            start = len(self._ids)
+            self._codes = codes if self._codes is None else np.concatenate([self._codes, codes])
+            self._scales = np.concatenate([self._scales, scales])
+            self._alive = np.concatenate([self._alive, np.ones(len(texts), dtype=bool)])
+            for offset, doc_id in enumerate(ids):
+                self._rows[doc_id] = start + offset
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+
+            if self.rescore:
+                with open(self._full_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                self._full = None
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        with self._lock:
+            for doc_id in ids or []:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self._alive[row] = False
+            if len(self._alive) and (~self._alive).sum() > len(self._alive) // 2:
+                self._compact()
+        return True
+
+    def _compact(self):
+        keep = np.flatnonzero(self._alive)
+        if self.rescore:
+            full = np.array(self._full_vectors()[keep])
+            self._full = None
+            with open(self._full_path, "wb") as f:
+                f.write(full.tobytes())
+        self._codes = self._codes[keep]
+        self._scales = self._scales[keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._ids = [self._ids[row] for row in keep]
+        self._texts = [self._texts[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+    def search_vector(self, query, k=4):
+        """
+        Rows and scores of the k best matches for an embedded query. Rows are
+        only meaningful while the caller still holds the lock.
+        """
+        with self._lock:
+            if not self._rows:
+                return [], np.empty(0, dtype=np.float32)
+            query = np.asarray(query, dtype=np.float32)
+            scores = approximate_scores(self._codes, self._scales, query)
+            scores[~self._alive] = -np.inf
+
+            candidates = top_k(scores, k * RESCORE_OVERSAMPLE if self.rescore else k)
+            candidates = candidates[np.isfinite(scores[candidates])]
+            if self.rescore:
+                exact = self._full_vectors()[candidates] @ query
+                order = np.argsort(-exact)[:k]
+                return candidates[order], exact[order]
+            return candidates, scores[candidates]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        query = self._embedding.embed_query(query)
+        # A compaction between the search and the lookup would renumber the rows
+        with self._lock:
+            rows, scores = self.search_vector(query, k)
+            return [
+                (Document(page_content=self._texts[row], metadata=self._metadatas[row]), float(score))
+                for row, score in zip(rows, scores)
+            ]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def get(self, ids=None, include=None, **kwargs):
+        """
+        Same shape as Chroma.get: parallel lists of ids, documents and metadatas
+        """
+        with self._lock:
+            rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows] if ids else sorted(self._rows.values())
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._texts[row] for row in rows],
+                "metadatas": [self._metadatas[row] for row in rows],
+            }
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, collection_name="langchain", **kwargs):
+        store = cls(collection_name, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store